@@ -36,6 +36,10 @@ def create_app():
     app.config.from_object('config.Config')
     db.init_app(app)
     migrate.init_app(app, db)
+
+    # 每个请求的 SQL 条数和耗时写进响应头
+    from app.utils import query_stats
+    query_stats.init_app(app)
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
     login_manager = LoginManager()
@@ -73,4 +77,14 @@ def create_app():
     from app.routes.teacher import teacher_bp
     app.register_blueprint(teacher_bp)
 
+    # 上传资料的后台处理队列
+    from app.utils.job_queue import job_queue
+    job_queue.init_app(app)
+
+    # 命令行工具：flask synth ... / flask perf ... / flask rollup ...
+    from app.commands import synth_cli, perf_cli, rollup_cli
+    app.cli.add_command(synth_cli)
+    app.cli.add_command(perf_cli)
+    app.cli.add_command(rollup_cli)
+
     return app
\ No newline at end of file
@@ -0,0 +1,300 @@
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import click
+import numpy as np
+from flask.cli import AppGroup
+from sqlalchemy import func
+
+from app.models import db, User, Teacher, Student, CourseMaterial, Question, StudentAnswerRecord, Submission
+from app.utils import analytics, rollups
+
+# 命令行工具，在 create_app 里注册到 flask 命令下
+
+synth_cli = AppGroup("synth", help="生成压测用的模拟数据（教师、学生、标准题库、答题记录）")
+perf_cli = AppGroup("perf", help="性能检查")
+rollup_cli = AppGroup("rollup", help="统计汇总表")
+
+KNOWLEDGE_TAGS = ["数学", "物理", "化学", "生物", "编程", "英语词汇", "英语语法", "历史常识", "地理", "阅读理解"]
+COMMENTS = ["回答正确。", "思路基本正确，但关键步骤的说明不够完整。", "概念理解有偏差，请对照教材复习。",
+            "回答错误，请注意题干中的限定条件。", "回答准确，条理清晰。"]
+RECOMMENDATIONS = ["继续保持，可以尝试更有挑战的题目。", "请复习本题相关知识点", "复习本题涉及的定义，并完成两道同类练习。",
+                   "回看资料中对应的例题。"]
+
+# 一周内各天（周一起）和一天内各小时的作答量权重：工作日晚上最多
+WEEKDAY_WEIGHTS = np.array([1.0, 1.0, 1.0, 1.0, 0.8, 0.5, 0.7])
+HOUR_WEIGHTS = np.array([0.2, 0.1, 0.05, 0.05, 0.05, 0.1, 0.3, 0.6, 1.0, 1.2, 1.2, 1.0,
+                         0.7, 0.8, 1.0, 1.1, 1.2, 1.0, 0.9, 1.4, 1.8, 1.9, 1.3, 0.6])
+
+
+def _material_questions(index, count, tags, rng):
+    """
+    第 index 套模拟题库的题目（与 parse_questions 的格式相同）及各题的知识点、难度
+    """
+    questions = []
+    question_tags = []
+    for q in range(1, count + 1):
+        tag = tags[(q - 1) % len(tags)]
+        correct = "ABCD"[int(rng.integers(4))]
+        questions.append({
+            "question": f"[模拟题库 {index}] 第 {q} 题：关于{tag}的下列说法，哪一项是正确的？",
+            "options": [f"{letter}. {tag}相关选项 {letter}" for letter in "ABCD"],
+            "answer": f"正确答案：{correct}"
+        })
+        question_tags.append(tag)
+    difficulty = rng.normal(0.0, 0.8, size=count)
+    return questions, question_tags, difficulty
+
+
+def _next_id(model):
+    return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+
+def _insert_users(table_model, role, names, password, batch_size):
+    """
+    批量插入 User + 子表（Teacher/Student）行，预先分配 id，返回 id 数组
+    """
+    first_id = _next_id(User)
+    ids = np.arange(first_id, first_id + len(names))
+    for start in range(0, len(names), batch_size):
+        chunk = range(start, min(start + batch_size, len(names)))
+        db.session.execute(User.__table__.insert(),
+                           [{"id": int(ids[i]), "role": role, "name": names[i], "password": password} for i in chunk])
+        db.session.execute(table_model.__table__.insert(), [{"id": int(ids[i])} for i in chunk])
+    db.session.commit()
+    return ids
+
+
+def _random_timestamps(rng, size, days, end):
+    """
+    最近 days 天内按星期 / 小时权重分布的时间
+    """
+    start = (end - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+    day_offsets = np.arange(days)
+    weekday = (start.weekday() + day_offsets) % 7
+    # 越接近现在活跃度越高（模拟用户增长）
+    day_weights = WEEKDAY_WEIGHTS[weekday] * np.linspace(0.6, 1.4, days)
+    picked_days = rng.choice(day_offsets, size=size, p=day_weights / day_weights.sum())
+    picked_hours = rng.choice(24, size=size, p=HOUR_WEIGHTS / HOUR_WEIGHTS.sum())
+    seconds = picked_days * 86400 + picked_hours * 3600 + rng.integers(0, 3600, size=size)
+    return start, seconds
+
+
+@synth_cli.command("generate")
+@click.option("--teachers", default=10, show_default=True)
+@click.option("--students", default=1000, show_default=True)
+@click.option("--materials", default=50, show_default=True, help="标准题库套数")
+@click.option("--questions", default=10, show_default=True, help="每套题库的题目数")
+@click.option("--records", default=1_000_000, show_default=True, help="答题记录总行数")
+@click.option("--days", default=180, show_default=True, help="答题时间分布在最近多少天内")
+@click.option("--batch-size", default=20_000, show_default=True, help="每批插入的行数")
+@click.option("--prefix", default="synth", show_default=True, help="模拟用户名前缀，clear 时按它删除")
+@click.option("--password", default="123456", show_default=True)
+@click.option("--seed", default=42, show_default=True)
+def generate(teachers, students, materials, questions, records, days, batch_size, prefix, password, seed):
+    """
+    批量生成模拟数据。答题记录按“一次提交 = 某学生做完一套题”成组生成：
+    同一次提交的各题时间相邻，得分由学生能力、知识点强弱和题目难度决定（0~10 分，二项分布）
+    """
+    rng = np.random.default_rng(seed)
+    began = time.perf_counter()
+
+    teacher_ids = _insert_users(Teacher, "Teacher", [f"{prefix}_teacher_{i}" for i in range(teachers)],
+                                password, batch_size)
+    student_ids = _insert_users(Student, "Student", [f"{prefix}_student_{i}" for i in range(students)],
+                                password, batch_size)
+    click.echo(f"users: {teachers} teachers, {students} students ({time.perf_counter() - began:.1f}s)")
+
+    # 标准题库：每套覆盖 1~3 个知识点
+    first_material_id = _next_id(CourseMaterial)
+    material_ids = np.arange(first_material_id, first_material_id + materials)
+    next_question_id = _next_id(Question)
+    bank_questions = []
+    material_rows = []
+    question_rows = []
+    for i in range(materials):
+        tags = list(rng.choice(KNOWLEDGE_TAGS, size=int(rng.integers(1, 4)), replace=False))
+        qs, q_tags, difficulty = _material_questions(i + 1, questions, tags, rng)
+        q_ids = list(range(next_question_id, next_question_id + len(qs)))
+        next_question_id += len(qs)
+        bank_questions.append(([q["question"] for q in qs], q_tags, difficulty, q_ids))
+        material_rows.append({
+            "id": int(material_ids[i]),
+            "filename": f"{prefix}_bank_{i + 1}.pdf",
+            "filepath": "",
+            "is_standard": True,
+            "teacher_id": int(teacher_ids[i % teachers]) if teachers else None,
+            "created_at": datetime.utcnow() - timedelta(days=days),
+        })
+        for position, (q, q_id) in enumerate(zip(qs, q_ids), start=1):
+            question_rows.append({
+                "id": q_id,
+                "material_id": int(material_ids[i]),
+                "position": position,
+                "stem": q["question"],
+                "options": q["options"],
+                "answer": q["answer"],
+                "content_hash": Question.hash_content(q["question"], q["options"], q["answer"]),
+            })
+    db.session.execute(CourseMaterial.__table__.insert(), material_rows)
+    db.session.execute(Question.__table__.insert(), question_rows)
+    db.session.commit()
+
+    # 学生整体能力、各知识点强弱（logit 尺度）
+    ability = rng.normal(0.6, 0.9, size=students)
+    tag_skill = rng.normal(0.0, 0.6, size=(students, len(KNOWLEDGE_TAGS)))
+    tag_index = {tag: i for i, tag in enumerate(KNOWLEDGE_TAGS)}
+    bank_tag_idx = [np.array([tag_index[t] for t in q_tags]) for _, q_tags, _, _ in bank_questions]
+
+    # 活跃度长尾：少数学生做题很多
+    activity = rng.pareto(1.5, size=students) + 1
+    activity /= activity.sum()
+
+    table = StudentAnswerRecord.__table__
+    end = datetime.utcnow()
+    submissions = -(-records // questions)
+    next_submission_id = _next_id(Submission)
+    inserted = 0
+    per_batch = max(1, batch_size // questions)
+    with click.progressbar(length=records, label="answer records") as bar:
+        for start in range(0, submissions, per_batch):
+            n = min(per_batch, submissions - start)
+            sub_students = rng.choice(students, size=n, p=activity)
+            sub_materials = rng.integers(0, materials, size=n)
+            base_time, sub_seconds = _random_timestamps(rng, n, days, end)
+
+            headers = []
+            rows = []
+            for s, m, sec in zip(sub_students.tolist(), sub_materials.tolist(), sub_seconds.tolist()):
+                q_texts, q_tags, difficulty, q_ids = bank_questions[m]
+                logits = ability[s] + tag_skill[s, bank_tag_idx[m]] - difficulty
+                scores = rng.binomial(10, 1 / (1 + np.exp(-logits)))
+                answers = rng.integers(0, 4, size=questions)
+                durations = rng.integers(15, 120, size=questions).cumsum()
+                count = min(questions, records - inserted - len(rows))
+                submitted = base_time + timedelta(seconds=int(sec + durations[count - 1]))
+                headers.append({
+                    "id": next_submission_id,
+                    "token": str(uuid.uuid4()),
+                    "student_id": int(student_ids[s]),
+                    "material_id": int(material_ids[m]),
+                    "status": Submission.DONE,
+                    "question_count": count,
+                    "graded_count": count,
+                    "total_score": int(scores[:count].sum()),
+                    "duration_seconds": int(durations[count - 1]),
+                    "created_at": submitted,
+                    "finished_at": submitted,
+                })
+                for q in range(count):
+                    when = base_time + timedelta(seconds=int(sec + durations[q]))
+                    score = int(scores[q])
+                    rows.append({
+                        "student_id": int(student_ids[s]),
+                        "material_id": int(material_ids[m]),
+                        "submission_id": next_submission_id,
+                        "question_id": q_ids[q],
+                        "question": q_texts[q],
+                        "student_answer": "ABCD"[answers[q]],
+                        "score": score,
+                        "comment": COMMENTS[min(score // 2, len(COMMENTS) - 1)],
+                        "recommendation": RECOMMENDATIONS[score % len(RECOMMENDATIONS)],
+                        "timestamp": when,
+                        "created_at": when,
+                        "knowledge_tag": q_tags[q],
+                    })
+                next_submission_id += 1
+            db.session.execute(Submission.__table__.insert(), headers)
+            db.session.execute(table.insert(), rows)
+            db.session.commit()
+            inserted += len(rows)
+            bar.update(len(rows))
+
+    elapsed = time.perf_counter() - began
+    click.echo(f"inserted {inserted} answer records for {materials} banks in {elapsed:.1f}s "
+               f"({inserted / elapsed:,.0f} rows/s)")
+    _rebuild_rollups()
+
+
+@synth_cli.command("clear")
+@click.option("--prefix", default="synth", show_default=True)
+def clear(prefix):
+    """
+    删除 generate 生成的模拟用户及其题库、答题记录
+    """
+    users = db.session.query(User.id, User.role).filter(User.name.like(f"{prefix}\\_%", escape="\\")).all()
+    teacher_ids = [u.id for u in users if u.role == "Teacher"]
+    student_ids = [u.id for u in users if u.role == "Student"]
+    material_ids = [m.id for m in CourseMaterial.query.with_entities(CourseMaterial.id)
+                    .filter(CourseMaterial.teacher_id.in_(teacher_ids)).all()] if teacher_ids else []
+
+    deleted = 0
+    for ids, column in ((student_ids, StudentAnswerRecord.student_id), (material_ids, StudentAnswerRecord.material_id)):
+        for start in range(0, len(ids), 500):
+            deleted += StudentAnswerRecord.query.filter(column.in_(ids[start:start + 500])) \
+                .delete(synchronize_session=False)
+            db.session.commit()
+    for ids, column in ((student_ids, Submission.student_id), (material_ids, Submission.material_id)):
+        for start in range(0, len(ids), 500):
+            Submission.query.filter(column.in_(ids[start:start + 500])).delete(synchronize_session=False)
+            db.session.commit()
+    # 汇总表引用了这些学生、题库，先按剩下的答题记录重建
+    _rebuild_rollups()
+    if material_ids:
+        Question.query.filter(Question.material_id.in_(material_ids)).delete(synchronize_session=False)
+        CourseMaterial.query.filter(CourseMaterial.id.in_(material_ids)).delete(synchronize_session=False)
+    for model, ids in ((Teacher, teacher_ids), (Student, student_ids)):
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            db.session.execute(model.__table__.delete().where(model.__table__.c.id.in_(chunk)))
+            db.session.execute(User.__table__.delete().where(User.__table__.c.id.in_(chunk)))
+    db.session.commit()
+    click.echo(f"deleted {len(teacher_ids)} teachers, {len(student_ids)} students, "
+               f"{len(material_ids)} banks, {deleted} answer records")
+
+
+def _rebuild_rollups():
+    began = time.perf_counter()
+    counts = rollups.rebuild()
+    click.echo("rebuilt rollups in {:.1f}s: {}".format(
+        time.perf_counter() - began, ", ".join(f"{table} {count}" for table, count in counts.items())))
+
+
+@rollup_cli.command("rebuild")
+def rebuild():
+    """
+    清空并从答题记录全量重建统计汇总表（批量导入数据或修复数据后执行）
+    """
+    _rebuild_rollups()
+
+
+@perf_cli.command("explain")
+@click.option("--material-id", type=int, default=None, help="默认取第一份有答题记录的资料")
+@click.option("--student-id", type=int, default=None, help="默认取第一个有答题记录的学生")
+@click.option("--verbose", "-v", is_flag=True, help="打印完整执行计划")
+def explain(material_id, student_id, verbose):
+    """
+    对统计页面用到的每条查询执行 EXPLAIN，有全表扫描时以非零状态退出（可放进 CI）
+    """
+    first = StudentAnswerRecord.query.order_by(StudentAnswerRecord.id).first()
+    material_id = material_id or (first.material_id if first else 1)
+    student_id = student_id or (first.student_id if first else 1)
+
+    failed = []
+    for route, build in analytics.ROUTE_QUERIES.items():
+        for i, query in enumerate(build(material_id, student_id), 1):
+            try:
+                lines, scans = analytics.explain(query)
+            except ValueError as e:
+                raise click.ClickException(str(e))
+            name = f"{route}#{i}"
+            click.echo(f"{'FULL SCAN' if scans else 'ok':9} {name}")
+            for line in (lines if verbose else scans):
+                click.echo(f"          {line}")
+            if scans:
+                failed.append(name)
+
+    if failed:
+        raise click.ClickException(f"{len(failed)} 条查询做了全表扫描：" + ", ".join(failed))
+    click.echo("all queries use an index")
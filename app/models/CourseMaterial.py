@@ -1,13 +1,40 @@
 from .base import db
-from datetime import datetime
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import GenericFunction
+
+
+class stored_now(GenericFunction):
+    """
+    数据库当前时间，与 func.now() 相同（MySQL 上仍是会话时区的本地时间）；
+    sqlite 上写成带微秒的格式，与 Python 写入的时间格式一致，游标分页直接比较列值时顺序才对
+    """
+    type = db.DateTime()
+    inherit_cache = True
+
+
+@compiles(stored_now)
+def _stored_now(element, compiler, **kw):
+    return "now()"
+
+
+@compiles(stored_now, "sqlite")
+def _stored_now_sqlite(element, compiler, **kw):
+    return "strftime('%Y-%m-%d %H:%M:%f000', 'now')"
+
+
 class CourseMaterial(db.Model):
     __tablename__ = 'course_material'
+    # 列表页按上传时间倒序分页：标准题库列表、学生自己的上传记录
+    __table_args__ = (
+        db.Index('ix_course_material_standard_created', 'is_standard', 'created_at'),
+        db.Index('ix_course_material_student_created', 'student_id', 'created_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(255))
     filepath = db.Column(db.String(255))
-    created_at = db.Column(db.DateTime, default=db.func.now())
-    ai_generated_questions = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=stored_now())
+    content_hash = db.Column(db.String(64))  # 文件内容 sha256，对应 cache/text 下的提取文本
 
     student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     student = db.relationship('User', backref='materials', foreign_keys=[student_id])
@@ -15,3 +42,44 @@ class CourseMaterial(db.Model):
 
     teacher_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     teacher = db.relationship('User', backref='uploaded_materials', foreign_keys=[teacher_id])
+
+    # 题目在 question 表中（self.questions，按题号排序）
+
+    def question_list(self):
+        """
+        题目列表，每题为 {"id", "question", "options", "answer"}
+        """
+        return [q.to_dict() for q in self.questions]
+
+    def set_questions(self, questions):
+        """
+        用 parse_questions 格式的题目列表替换本资料的题目：
+        同一题号原地更新（题目 id 不变），多出的题号删除。
+        题干或选项改了就已经是另一道题：旧的答题记录不再关联到它、它的统计清零，
+        难度页不会把新旧两道题的得分混在一起（只改答案时保留）
+        """
+        from .question import Question
+        from .student_answer_record import StudentAnswerRecord
+        from .rollup import QuestionStat
+
+        existing = {q.position: q for q in self.questions}
+        detached = []
+        for position, q in enumerate(questions, start=1):
+            stem, options, answer = q["question"], list(q["options"]), q["answer"]
+            content_hash = Question.hash_content(stem, options, answer)
+            row = existing.pop(position, None)
+            if row is None:
+                self.questions.append(Question(position=position, stem=stem, options=options, answer=answer,
+                                               content_hash=content_hash))
+            elif row.content_hash != content_hash:
+                if row.id is not None and (row.stem != stem or list(row.options or []) != options):
+                    detached.append(row.id)
+                row.stem, row.options, row.answer, row.content_hash = stem, options, answer, content_hash
+
+        detached += [row.id for row in existing.values() if row.id is not None]
+        if detached:
+            StudentAnswerRecord.query.filter(StudentAnswerRecord.question_id.in_(detached)) \
+                .update({StudentAnswerRecord.question_id: None}, synchronize_session=False)
+            QuestionStat.query.filter(QuestionStat.question_id.in_(detached)).delete(synchronize_session=False)
+        for row in existing.values():
+            self.questions.remove(row)
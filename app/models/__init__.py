@@ -1,4 +1,9 @@
 from .base import db, User
 from .user_role import Teacher, Student
 from .Quiz import Quiz
-from .student_answer_record import StudentAnswerRecord
\ No newline at end of file
+from .student_answer_record import StudentAnswerRecord
+from .CourseMaterial import CourseMaterial
+from .question import Question
+from .material_job import MaterialJob
+from .submission import Submission
+from .rollup import StudentDayStat, StudentTagStat, MaterialStudentStat, QuestionStat
@@ -0,0 +1,42 @@
+from .base import db
+from datetime import datetime
+
+
+class MaterialJob(db.Model):
+    """
+    上传资料的后台处理任务：保存 → 提取文本 → AI 出题 → 解析入库
+    """
+    __tablename__ = 'material_job'
+
+    # 处理阶段，按顺序推进；重启恢复时从已完成的阶段之后继续
+    STAGES = ['saved', 'extracted', 'generated', 'parsed']
+    # status: queued 排队中 / running 处理中 / done 完成 / failed 失败
+    UNFINISHED = ('queued', 'running')
+
+    id = db.Column(db.Integer, primary_key=True)
+    material_id = db.Column(db.Integer, db.ForeignKey('course_material.id'), nullable=False)
+    status = db.Column(db.String(16), nullable=False, default='queued', index=True)
+    stage = db.Column(db.String(16), nullable=False, default='saved')
+    progress = db.Column(db.Integer, nullable=False, default=0)  # 0~100
+    raw_output = db.Column(db.Text)  # AI 出题原文，generated 阶段之后重启可直接解析
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    lease_expires_at = db.Column(db.DateTime)  # running 时有效：过期说明执行它的 worker 已不在
+
+    material = db.relationship('CourseMaterial', backref='jobs')
+
+    def to_dict(self):
+        data = {
+            "id": self.id,
+            "material_id": self.material_id,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": self.progress,
+            "error": self.error
+        }
+        if self.status in self.UNFINISHED and self.raw_output:
+            # 流式出题时已经完整收到的题目，进度页先行展示
+            from app.utils.question_utils import QuestionStreamParser
+            data["questions"] = QuestionStreamParser().feed(self.raw_output)
+        return data
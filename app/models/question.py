@@ -0,0 +1,45 @@
+import hashlib
+import json
+
+from .base import db
+from datetime import datetime
+
+
+class Question(db.Model):
+    """
+    资料的一道题。答题记录通过 question_id 关联到题目，
+    题目编辑后按题号原地更新；题干或选项变化时旧记录不再关联到它（见 CourseMaterial.set_questions）
+    """
+    __tablename__ = 'question'
+    __table_args__ = (
+        db.UniqueConstraint('material_id', 'position', name='uq_question_material_position'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    material_id = db.Column(db.Integer, db.ForeignKey('course_material.id'), nullable=False)
+    position = db.Column(db.Integer, nullable=False)  # 题号，从 1 开始
+    stem = db.Column(db.Text, nullable=False)
+    options = db.Column(db.JSON, nullable=False, default=list)
+    answer = db.Column(db.Text, nullable=False, default='')
+    content_hash = db.Column(db.String(64), nullable=False, index=True)  # 题干 + 选项 + 答案的 sha256
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    material = db.relationship('CourseMaterial',
+                               backref=db.backref('questions', order_by='Question.position',
+                                                  cascade='all, delete-orphan'))
+
+    @staticmethod
+    def hash_content(stem, options, answer):
+        payload = json.dumps([stem, list(options), answer], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def to_dict(self):
+        """
+        与 parse_questions 相同的格式（出题、批改、模板都按这个格式使用），另带题目 id
+        """
+        return {
+            "id": self.id,
+            "question": self.stem,
+            "options": list(self.options or []),
+            "answer": self.answer
+        }
@@ -0,0 +1,51 @@
+from .base import db
+
+# 答题记录的汇总表：每组保存 次数 / 得分和 / 得分平方和，与答题记录在同一事务里增量更新，
+# 统计页面只读这些行（行数与分组数有关，与历史记录多少无关）。
+# 可用 `flask rollup rebuild` 从答题记录全量重建
+
+
+class ScoreStats:
+    answer_count = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.BigInteger, nullable=False, default=0)
+    score_sumsq = db.Column(db.BigInteger, nullable=False, default=0)
+    first_at = db.Column(db.DateTime)  # 该组最早一条记录的时间，页面按它排序
+
+    STAT_COLUMNS = ('answer_count', 'score_sum', 'score_sumsq')
+
+    @property
+    def mean(self):
+        return self.score_sum / self.answer_count if self.answer_count else 0.0
+
+    @property
+    def variance(self):
+        if not self.answer_count:
+            return 0.0
+        return max(self.score_sumsq / self.answer_count - self.mean ** 2, 0.0)
+
+
+class StudentDayStat(ScoreStats, db.Model):
+    __tablename__ = 'rollup_student_day'
+
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)  # 按 timestamp 的日期（UTC）
+
+
+class StudentTagStat(ScoreStats, db.Model):
+    __tablename__ = 'rollup_student_tag'
+
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    knowledge_tag = db.Column(db.String(100), primary_key=True)
+
+
+class MaterialStudentStat(ScoreStats, db.Model):
+    __tablename__ = 'rollup_material_student'
+
+    material_id = db.Column(db.Integer, db.ForeignKey('course_material.id'), primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+
+
+class QuestionStat(ScoreStats, db.Model):
+    __tablename__ = 'rollup_question'
+
+    question_id = db.Column(db.Integer, db.ForeignKey('question.id'), primary_key=True)
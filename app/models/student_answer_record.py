@@ -3,6 +3,14 @@ from datetime import datetime
 
 class StudentAnswerRecord(db.Model):
     __tablename__ = 'student_answer_record'
+    # 对应统计页面的查询：按资料（再按学生排序/分组）、按资料 + 时间（记录页分页）、按学生 + 时间、按学生 + 知识点
+    __table_args__ = (
+        db.Index('ix_answer_record_material_student', 'material_id', 'student_id'),
+        db.Index('ix_answer_record_material_created', 'material_id', 'created_at'),
+        db.Index('ix_answer_record_student_created', 'student_id', 'created_at'),
+        db.Index('ix_answer_record_student_timestamp', 'student_id', 'timestamp'),
+        db.Index('ix_answer_record_student_tag', 'student_id', 'knowledge_tag'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('user.id'))
@@ -19,3 +27,6 @@ class StudentAnswerRecord(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)  # ✅ 新增时间字段
 
     knowledge_tag = db.Column(db.String(100))  # 示例：'数学', '编程', '英语词汇'
+
+    submission_id = db.Column(db.Integer, db.ForeignKey('submission.id'), index=True)  # 所属的整卷提交
+    question_id = db.Column(db.Integer, db.ForeignKey('question.id'), index=True)  # question 为作答时的题干快照
@@ -0,0 +1,33 @@
+from .base import db
+from datetime import datetime
+
+
+class Submission(db.Model):
+    """
+    学生的一次整卷提交（答题记录的表头）：总分、用时等汇总值，统计时不必扫描每条答题记录
+    """
+    __tablename__ = 'submission'
+    __table_args__ = (
+        db.Index('ix_submission_material_student', 'material_id', 'student_id'),
+        db.Index('ix_submission_student_created', 'student_id', 'created_at'),
+    )
+
+    # status: grading 批改中 / done 已保存
+    GRADING = 'grading'
+    DONE = 'done'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # 答题页面生成的提交 id，重复提交（双击、刷新重发）时据此识别
+    token = db.Column(db.String(36), nullable=False, unique=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    material_id = db.Column(db.Integer, db.ForeignKey('course_material.id'), nullable=False)
+    status = db.Column(db.String(16), nullable=False, default=GRADING)
+    question_count = db.Column(db.Integer, nullable=False, default=0)
+    graded_count = db.Column(db.Integer, nullable=False, default=0)  # 不含 AI 没能评分的题目
+    total_score = db.Column(db.Integer, nullable=False, default=0)
+    duration_seconds = db.Column(db.Integer)  # 从打开答题页到提交
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    student = db.relationship('User', foreign_keys=[student_id])
+    material = db.relationship('CourseMaterial')
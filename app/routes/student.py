@@ -1,13 +1,24 @@
 
-from flask import Blueprint, render_template, request, redirect, url_for, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, current_app, jsonify
+from flask import Response, stream_with_context
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
 import os
 from app.models.CourseMaterial import CourseMaterial
-from app.models.student_answer_record import StudentAnswerRecord
+from app.models.submission import Submission
+from app.models.question import Question
 from app.models import db
-from app.utils.file_utils import extract_text_from_file
-from app.utils.ai_utils import generate_questions_with_ai, evaluate_student_answers
+from app.utils import submissions
+from app.utils.file_utils import load_extracted_text
+from app.utils.pagination import keyset_page, page_size
+from app.utils.question_utils import parse_questions
+from app.utils.retrieval import load_chunk_index, build_chunk_index
+from app.utils.job_queue import job_queue, QueueFull
+from app.models.material_job import MaterialJob
+from app.utils.ai_utils import evaluate_student_answers
+from app.utils.ai_utils import CHAT_CONTEXT_CHARS, SUMMARY_CONTEXT_CHARS
+from app.utils.ai_utils import stream_chat_about_material, stream_summary_sheet
+from app.utils.llm_client import LLMError
 import json
 student_bp = Blueprint('student', __name__)
 
@@ -28,38 +39,28 @@ def upload_material():
         if file:
             filename = secure_filename(file.filename)
 
+            # 后台队列已满时直接拒绝，不再接收新文件
+            if not job_queue.has_capacity():
+                return render_template('student_upload_material.html',
+                                       message="系统繁忙，请稍后再上传。"), 503
+
             # ✅ 使用 app.config 中统一配置的上传路径
             filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
 
             # 保存文件
             file.save(filepath)
 
-            # 提取文本
-            content = extract_text_from_file(filepath)
-
-            # AI 生成题目
-            questions = generate_questions_with_ai(content) if content else "无法识别文件内容。"
-
-            # # 存入数据库
-            # new_material = CourseMaterial(
-            #     filename=filename,
-            #     filepath=filepath,
-            #     student_id=current_user.id,
-            #     ai_generated_questions=questions
-            # )
-            # 解析原始题目串为结构化列表
-            parsed_questions = parse_questions(questions)
-
-            # 保存为 JSON 字符串（方便未来读取/打分）
+            # 提取文本、AI 出题、解析入库都放到后台任务里，页面轮询任务进度
             new_material = CourseMaterial(
                 filename=filename,
                 filepath=filepath,
-                student_id=current_user.id,
-                ai_generated_questions=json.dumps(parsed_questions, ensure_ascii=False)
+                student_id=current_user.id
             )
-
-            db.session.add(new_material)
-            db.session.commit()
+            try:
+                job_queue.enqueue_material(new_material)
+            except QueueFull:
+                return render_template('student_upload_material.html',
+                                       message="系统繁忙，请稍后再上传。"), 503
 
             return redirect(url_for('student.view_material', material_id=new_material.id))
 
@@ -67,30 +68,29 @@ def upload_material():
 
 
 
-import re  # 开头确保有引入
-
-def parse_questions(raw_text):
-    raw_questions = re.split(r"(?:题目\d*[:：]|Question\s*\d*[:：])", raw_text)[1:]
-    parsed = []
-    for q in raw_questions:
-        lines = q.strip().split("\n")
-        question_text = []
-        options = []
-        answer = ""
-        for line in lines:
-            line = line.strip()
-            if re.match(r"[A-Da-d][\.\、，：:]", line):  # 匹配 A. A、 A:
-                options.append(line)
-            elif "正确答案" in line or "答案" in line or "Answer" in line:
-                answer = line
-            else:
-                question_text.append(line)
-        parsed.append({
-            "question": " ".join(question_text),
-            "options": options,
-            "answer": answer
-        })
-    return parsed
+def load_material_text(material, max_chars=None):
+    """
+    读取资料的提取文本（优先读存档），最多 max_chars 个字符；文件内容变化时顺带更新 content_hash
+    """
+    if not material.filepath or not os.path.exists(material.filepath):
+        return None
+    content, content_hash = load_extracted_text(material.filepath, material.content_hash, max_chars=max_chars)
+    if content_hash != material.content_hash:
+        material.content_hash = content_hash
+        db.session.commit()
+    return content
+
+def retrieve_material_context(material, question):
+    """
+    从资料的分块索引中检索与问题相关的片段（不超过 CHAT_CONTEXT_CHARS 字），索引不存在时现建
+    """
+    index = load_chunk_index(material.content_hash)
+    if index is None:
+        content = load_material_text(material)
+        if not content:
+            return None
+        index = build_chunk_index(material.content_hash, content)
+    return index.context_for(question, CHAT_CONTEXT_CHARS)
 
 @student_bp.route("/view_material/<int:material_id>")
 @login_required
@@ -101,11 +101,17 @@ def view_material(material_id):
     # import json
     # questions = json.loads(material.ai_generated_questions or "[]")
     # return render_template("view_material.html", material=material, questions=questions)
-    try:
-        questions = json.loads(material.ai_generated_questions or "[]")
-    except Exception as e:
-        questions = []
-    return render_template("student_view_material.html", material=material, questions=questions)
+    questions = material.question_list()
+    # 题目还在后台生成时，页面显示进度并轮询 job_status
+    job = MaterialJob.query.filter_by(material_id=material.id).order_by(MaterialJob.id.desc()).first()
+    return render_template("student_view_material.html", material=material, questions=questions, job=job,
+                           submission=submissions.form_fields())
+
+@student_bp.route("/job_status/<int:job_id>")
+@login_required
+def job_status(job_id):
+    job = MaterialJob.query.get_or_404(job_id)
+    return jsonify(job.to_dict())
 
 from flask import send_file
 from io import BytesIO
@@ -115,8 +121,8 @@ from io import BytesIO
 def download_material(material_id):
     material = CourseMaterial.query.get_or_404(material_id)
 
-    # 解析题目（和 view_material 用一样的逻辑）
-    questions = json.loads(material.ai_generated_questions or "[]")
+    # 题目（和 view_material 用一样的逻辑）
+    questions = material.question_list()
 
     # 构建文本内容
     output = ""
@@ -142,8 +148,16 @@ def download_material(material_id):
 @student_bp.route("/materials")
 @login_required
 def view_all_materials():
-    materials = CourseMaterial.query.filter_by(student_id=current_user.id).order_by(CourseMaterial.created_at.desc()).all()
-    return render_template("student_materials.html", materials=materials)
+    # 按上传时间倒序分页
+    page = keyset_page(CourseMaterial.query.filter_by(student_id=current_user.id),
+                       CourseMaterial.created_at, CourseMaterial.id,
+                       request.args.get("cursor"), page_size(request.args.get("per_page")))
+    materials = page.items
+    # 本页已生成题目的资料 id（一条查询，不逐个加载题目）
+    with_questions = {row.material_id for row in db.session.query(Question.material_id)
+                      .filter(Question.material_id.in_([m.id for m in materials])).distinct()}
+    return render_template("student_materials.html", materials=materials, with_questions=with_questions,
+                           page=page)
 
 @student_bp.route('/submit_answers/<int:material_id>', methods=['POST'])
 @login_required
@@ -154,33 +168,8 @@ def submit_answers(material_id):
     # questions = material.generated_questions
     # if isinstance(questions, str):
     #     questions = json.loads(questions)
-    # 从 material 中获取题目列表（原始 JSON）
-    questions = json.loads(material.ai_generated_questions or "[]")  # ✅ 字段名改成 ai_generated_questions
-
-    # 收集所有答案
-    answers = []
-    for idx in range(1, len(questions) + 1):
-        answer = request.form.get(f'answer_{idx}', '')
-        answers.append(answer)
-
-    # 调用 AI 模块打分与点评
-    feedback = evaluate_student_answers(questions, answers)
-    # feedback: {'scores': [...], 'comments': [...], 'recommendations': [...]}
-
-    # ✅ 保存记录到数据库
-    for i, q in enumerate(questions):
-        record = StudentAnswerRecord(
-            student_id=current_user.id,
-            material_id=material.id,
-            question=q["question"],
-            student_answer=answers[i],
-            score=feedback["scores"][i],
-            comment=feedback["comments"][i],
-            recommendation=feedback["recommendations"][i]
-        )
-
-
-    db.session.commit()
+    # 从 material 中获取题目列表
+    questions = material.question_list()
 
     # return render_template('student_answer_result.html',
     #                        questions=questions,
@@ -188,76 +177,128 @@ def submit_answers(material_id):
     #                        scores=feedback['scores'],
     #                        comments=feedback['comments'],
     #                        recommendations=feedback['recommendations'])
+    return grade_submission(material, questions)
+
+def grade_submission(material, questions):
+    """
+    批改并保存一次整卷提交；同一个提交 id 重复提交时不再批改，转到已保存的结果
+    """
+    submission, created = submissions.begin(request.form.get("submission_id"),
+                                            current_user.id,
+                                            material.id,
+                                            len(questions),
+                                            request.form.get("started_at"))
+    if not created:
+        return redirect(url_for("student.submission_result", token=submission.token))
+
+    # 收集所有答案
+    answers = [request.form.get(f'answer_{i + 1}', '') for i in range(len(questions))]
+
+    try:
+        # 调用 AI 模块打分与点评
+        feedback = evaluate_student_answers(questions, answers)
+        # feedback: {'scores': [...], 'comments': [...], 'recommendations': [...]}
+
+        # ✅ 保存记录到数据库：全部记录一次批量插入
+        submissions.save(submission, questions, answers, feedback)
+    except Exception:
+        submissions.abandon(submission)
+        raise
+
     # ✅ 提前打包 zip，用于模板循环
     zipped_result = zip(questions, answers, feedback['scores'], feedback['comments'], feedback['recommendations'])
 
     # ✅ 渲染模板时传入 zipped_result
     return render_template('student_answer_result.html',
                            zipped_result=zipped_result,
-                           material=material)  # 如果你还想在模板中显示上传文件名
+                           material=material,
+                           degraded=any(feedback['degraded']))  # 如果你还想在模板中显示上传文件名
+
+@student_bp.route('/submission/<token>')
+@login_required
+def submission_result(token):
+    submission = Submission.query.filter_by(token=token, student_id=current_user.id).first_or_404()
+    if submission.status != Submission.DONE:
+        # 第一次提交还在批改，页面定时刷新
+        return render_template('student_answer_result.html', zipped_result=[], material=submission.material,
+                               pending=True)
+    return render_template('student_answer_result.html',
+                           zipped_result=submissions.result_rows(submission),
+                           material=submission.material,
+                           degraded=submission.graded_count < submission.question_count)
 
 @student_bp.route('/standard_list')
 @login_required
 def standard_material_list():
-    materials = CourseMaterial.query.filter_by(is_standard=True).order_by(CourseMaterial.created_at.desc()).all()
-    return render_template('student_standard_list.html', materials=materials)
+    page = keyset_page(CourseMaterial.query.filter_by(is_standard=True),
+                       CourseMaterial.created_at, CourseMaterial.id,
+                       request.args.get("cursor"), page_size(request.args.get("per_page")))
+    return render_template('student_standard_list.html', materials=page.items, page=page)
 
 @student_bp.route('/answer_standard/<int:material_id>', methods=['GET', 'POST'])
 @login_required
 def answer_standard(material_id):
     material = CourseMaterial.query.filter_by(id=material_id, is_standard=True).first_or_404()
-    questions = json.loads(material.ai_generated_questions or "[]")
+    questions = material.question_list()
 
     if request.method == 'POST':
-        answers = [request.form.get(f'answer_{i+1}', '') for i in range(len(questions))]
-
-        feedback = evaluate_student_answers(questions, answers)
-
-        # 保存答题记录
-        for i, q in enumerate(questions):
-            record = StudentAnswerRecord(
-                student_id=current_user.id,
-                material_id=material.id,
-                question=q["question"],
-                student_answer=answers[i],
-                score=feedback["scores"][i],
-                comment=feedback["comments"][i],
-                recommendation=feedback["recommendations"][i]
-            )
-            db.session.add(record)
-
-        db.session.commit()
-
-        zipped_result = zip(questions, answers, feedback["scores"], feedback["comments"], feedback["recommendations"])
-        return render_template("student_answer_result.html", zipped_result=zipped_result, material=material)
+        return grade_submission(material, questions)
 
-    return render_template("student_answer_standard.html", questions=questions, material=material)
+    return render_template("student_answer_standard.html", questions=questions, material=material,
+                           submission=submissions.form_fields())
 
 @student_bp.route("/chat_material/<int:material_id>", methods=["GET", "POST"])
 @login_required
 def chat_material(material_id):
     material = CourseMaterial.query.get_or_404(material_id)
-    content = extract_text_from_file(material.filepath)
     answer = None
     user_question = None
 
     if request.method == "POST":
         user_question = request.form.get("question", "")
         from app.utils.ai_utils import chat_about_material
-        answer = chat_about_material(content, user_question)
+        content = retrieve_material_context(material, user_question)
+        answer = chat_about_material(content or "", user_question)
 
     return render_template("student_chat_material.html",
                            material=material,
                            question=user_question,
                            answer=answer)
 
+def _sse(event=None, **data):
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _sse_response(chunks, error_text):
+    """
+    把 AI 流式输出转成 Server-Sent Events：每段文本一个 data 事件，结束发 done，失败发 error
+    """
+    def generate():
+        try:
+            for delta in chunks:
+                yield _sse(delta=delta)
+            yield _sse("done")
+        except LLMError as e:
+            yield _sse("error", message=f"{error_text}：{e.status}")
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@student_bp.route("/chat_material/<int:material_id>/stream")
+@login_required
+def chat_material_stream(material_id):
+    material = CourseMaterial.query.get_or_404(material_id)
+    user_question = request.args.get("question", "")
+    content = retrieve_material_context(material, user_question)
+    return _sse_response(stream_chat_about_material(content or "", user_question), "❌ AI 问答失败")
+
 @student_bp.route('/learning_path')
 @login_required
 def learning_path():
-    from app.models.student_answer_record import StudentAnswerRecord
     from app.utils.ai_utils import recommend_learning_path
+    from app.utils.analytics import student_recent_records
 
-    records = StudentAnswerRecord.query.filter_by(student_id=current_user.id).order_by(StudentAnswerRecord.created_at.desc()).limit(20).all()
+    records = student_recent_records(current_user.id).all()
 
     if not records:
         return render_template("student_learning_path.html", path=None, message="你还没有答题记录，暂无法生成学习路径。")
@@ -268,35 +309,47 @@ def learning_path():
 @student_bp.route("/material_summary/<int:material_id>")
 @login_required
 def material_summary(material_id):
-    from app.utils.ai_utils import generate_summary_sheet
     material = CourseMaterial.query.get_or_404(material_id)
-    content = extract_text_from_file(material.filepath)
+    content = load_material_text(material, max_chars=SUMMARY_CONTEXT_CHARS)
 
     if not content:
         return render_template("student_summary.html", summary="❌ 无法提取资料内容。请确认上传的是PDF或PPT。", material=material)
 
-    summary = generate_summary_sheet(content)
-    return render_template("student_summary.html", summary=summary, material=material)
+    # 页面先返回，总结内容由浏览器通过 SSE 流式拉取；?refresh=1 跳过缓存重新生成
+    stream_url = url_for('student.material_summary_stream', material_id=material.id,
+                         refresh=request.args.get("refresh"))
+    return render_template("student_summary.html", summary=None, stream_url=stream_url, material=material)
+
+@student_bp.route("/material_summary/<int:material_id>/stream")
+@login_required
+def material_summary_stream(material_id):
+    material = CourseMaterial.query.get_or_404(material_id)
+    content = load_material_text(material, max_chars=SUMMARY_CONTEXT_CHARS)
+
+    if not content:
+        return _sse_response(iter(["❌ 无法提取资料内容。请确认上传的是PDF或PPT。"]), "❌ AI 总结失败")
+
+    chunks = stream_summary_sheet(content, use_cache=request.args.get("refresh") != "1")
+    return _sse_response(chunks, "❌ AI 总结失败")
 
 @student_bp.route("/radar_chart")
 @login_required
 def radar_chart():
-    from app.models.student_answer_record import StudentAnswerRecord
     import matplotlib.pyplot as plt
     import numpy as np
     from io import BytesIO
     import base64
+    from app.utils.analytics import student_tag_scores
 
-    records = StudentAnswerRecord.query.filter_by(student_id=current_user.id).all()
+    # 读学生 × 知识点汇总表，按每个知识点最早作答的时间排序
+    rows = student_tag_scores(current_user.id).all()
 
     tag_scores = {}
     tag_counts = {}
 
-    for r in records:
-        tag = getattr(r, 'knowledge_tag', None)
-        if tag:
-            tag_scores[tag] = tag_scores.get(tag, 0) + r.score
-            tag_counts[tag] = tag_counts.get(tag, 0) + 1
+    for tag, total, count in rows:
+        tag_scores[tag] = int(total or 0)
+        tag_counts[tag] = count
 
     labels = list(tag_scores.keys())
     scores = [round(tag_scores[tag] / tag_counts[tag] * 10, 2) for tag in labels]  # 统一为 0~100 分
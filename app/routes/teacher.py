@@ -4,33 +4,48 @@ from flask_login import login_required, current_user
 from app.models.base import User
 from app.decorators import teacher_required  # 你可以自定义角色验证装饰器
 import os
-import json
-from flask import Blueprint, request, render_template, redirect, url_for, flash
+from flask import Blueprint, request, render_template, redirect, url_for, flash, abort
+from flask import Response, stream_with_context
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
 
 from app.models import db
 from app.models import StudentAnswerRecord
 from app.models.CourseMaterial import CourseMaterial
-from app.routes.student import parse_questions
-
-
-from app.utils.ai_utils import generate_questions_with_ai  # 根据你AI函数所在位置调整路径
+from app.models.material_job import MaterialJob
+from app.utils.job_queue import job_queue, QueueFull
+from app.utils import analytics
+from app.utils.export import EXPORT_FORMATS, iter_rows
+from app.utils.pagination import keyset_page, page_size
+from app.utils.query_stats import query_budget
+from sqlalchemy.orm import joinedload, load_only
 
 teacher_bp = Blueprint("teacher", __name__, url_prefix="/teacher")
 
 @teacher_bp.route("/")
+@query_budget(1)
 @login_required
 @teacher_required
 def teacher_home():
     return render_template("teacher_home.html")
 
 @teacher_bp.route("/materials")
+@query_budget(3)
 @login_required
 @teacher_required
 def view_all_uploads():
-    materials = CourseMaterial.query.filter_by(is_standard=True).order_by(CourseMaterial.created_at.desc()).all()
-    return render_template("teacher_materials.html", materials=materials)
+    # 只加载列表显示的列；按上传时间倒序分页
+    query = CourseMaterial.query.filter_by(is_standard=True) \
+        .options(load_only(CourseMaterial.filename, CourseMaterial.created_at, CourseMaterial.is_standard,
+                           CourseMaterial.student_id, CourseMaterial.teacher_id))
+    page = keyset_page(query, CourseMaterial.created_at, CourseMaterial.id,
+                       request.args.get("cursor"), page_size(request.args.get("per_page")))
+    # 本页还在后台处理的资料显示进度（一条查询取本页的未完成任务），刚上传的资料在第一页
+    ids = [material.id for material in page.items]
+    jobs = {job.material_id: job for job in MaterialJob.query
+            .filter(MaterialJob.status.in_(MaterialJob.UNFINISHED), MaterialJob.material_id.in_(ids))
+            .order_by(MaterialJob.id)} if ids else {}
+    return render_template("teacher_materials.html", materials=page.items, page=page, jobs=jobs)
 
 @teacher_bp.route('/upload_standard', methods=['GET', 'POST'])
 @login_required
@@ -39,41 +54,59 @@ def upload_standard_material():
         file = request.files['material']
         if file:
             filename = secure_filename(file.filename)
-            filepath = os.path.join('uploads', filename)
-            file.save(filepath)
-
-            # # 调用 AI 接口生成题目
-            # questions = generate_questions_with_ai(filepath)
-
-            raw_text = generate_questions_with_ai(filepath)
-            questions = parse_questions(raw_text)
 
+            # 后台队列已满时直接拒绝，不再接收新文件
+            if not job_queue.has_capacity():
+                return render_template('teacher_upload_standard.html',
+                                       message="系统繁忙，请稍后再上传。"), 503
 
+            filepath = os.path.join('uploads', filename)
+            file.save(filepath)
 
-            # 保存到数据库
+            # 提取文本、AI 出题、解析入库放到后台任务里执行
             material = CourseMaterial(
                 filename=filename,
                 filepath=filepath,
-                ai_generated_questions=json.dumps(questions, ensure_ascii=False),
                 teacher_id=current_user.id,
                 is_standard=True  # 关键标志
             )
-            db.session.add(material)
-            db.session.commit()
-
-            flash("上传成功并已生成标准题库！", "success")
-            # ✅ 上传成功后跳转到查看该资料作答记录页面
+            try:
+                job_queue.enqueue_material(material)
+            except QueueFull:
+                return render_template('teacher_upload_standard.html',
+                                       message="系统繁忙，请稍后再上传。"), 503
 
-            redirect(url_for('teacher.teacher_home'))
+            flash("上传成功，正在后台生成标准题库！", "success")
+            return redirect(url_for('teacher.view_all_uploads'))
 
     return render_template('teacher_upload_standard.html')
 
 @teacher_bp.route('/material_records/<int:material_id>')
+@query_budget(3)
 @login_required
 def view_material_records(material_id):
     material = CourseMaterial.query.filter_by(id=material_id, is_standard=True).first_or_404()
-    records = StudentAnswerRecord.query.filter_by(material_id=material_id).order_by(StudentAnswerRecord.student_id).all()
-    return render_template('teacher_view_records.html', material=material, records=records)
+    # 只取页面显示的列，不逐行构造 ORM 对象；按提交时间倒序分页
+    page = keyset_page(analytics.material_record_rows(material_id),
+                       StudentAnswerRecord.created_at, StudentAnswerRecord.id,
+                       request.args.get("cursor"), page_size(request.args.get("per_page")))
+    return render_template('teacher_view_records.html', material=material, records=page.items, page=page)
+
+@teacher_bp.route('/material_records/<int:material_id>/export')
+@query_budget(2)
+@login_required
+@teacher_required
+def export_material_records(material_id):
+    fmt = request.args.get("format", "csv")
+    if fmt not in EXPORT_FORMATS:
+        abort(400)
+    material = CourseMaterial.query.filter_by(id=material_id, is_standard=True).first_or_404()
+
+    # 边查边写：响应体由生成器逐行产生（查询在开始发送响应后才执行）
+    rows = iter_rows(analytics.material_export_rows(material.id), fmt)
+    return Response(stream_with_context(rows), mimetype=EXPORT_FORMATS[fmt],
+                    headers={"Content-Disposition": f'attachment; filename="material_{material.id}_records.{fmt}"',
+                             "X-Accel-Buffering": "no"})
 
 # @teacher_bp.route('/material_stats/<int:material_id>')
 # @login_required
@@ -94,26 +127,21 @@ def view_material_records(material_id):
 from collections import defaultdict
 
 @teacher_bp.route('/material_stats/<int:material_id>')
+@query_budget(3)
 @login_required
 @teacher_required
 def material_stats(material_id):
     material = CourseMaterial.query.get_or_404(material_id)
 
-    # 查询该资料下的所有学生答题记录
-    records = StudentAnswerRecord.query.filter_by(material_id=material_id).all()
-
-    # 构造 学生名 → 分数字典
-    score_dict = defaultdict(list)
-    for record in records:
-        if record.student:  # 安全判断
-            score_dict[record.student.name].append(record.score)
+    # 读资料 × 学生汇总表，按学生名合并；按每个学生最早作答的时间排序
+    rows = analytics.material_student_scores(material_id).all()
 
     # 构造图表数据
     student_names = []
     average_scores = []
-    for name, scores in score_dict.items():
+    for name, total, count in rows:
         student_names.append(name)
-        average_scores.append(round(sum(scores) / len(scores), 2))
+        average_scores.append(round(int(total or 0) / int(count), 2))
 
     return render_template('teacher_material_stats.html',
                            material=material,
@@ -121,10 +149,13 @@ def material_stats(material_id):
                            average_scores=average_scores)
 
 @teacher_bp.route('/edit_material/<int:material_id>', methods=['GET', 'POST'])
+@query_budget(3)
 @login_required
 @teacher_required
 def edit_material(material_id):
-    material = CourseMaterial.query.filter_by(id=material_id, is_standard=True).first_or_404()
+    # 资料和题目一条查询取回
+    material = CourseMaterial.query.filter_by(id=material_id, is_standard=True) \
+        .options(joinedload(CourseMaterial.questions)).first_or_404()
 
     if request.method == 'POST':
         # 获取所有题目数据
@@ -141,21 +172,20 @@ def edit_material(material_id):
             })
 
         # 存入数据库
-        material.ai_generated_questions = json.dumps(updated_questions, ensure_ascii=False)
+        # 同一题号原地更新，已有答题记录仍关联到对应的题目
+        material.set_questions(updated_questions)
         db.session.commit()
 
         flash("题目已更新成功！", "success")
-        return redirect(url_for('teacher.view_all_uploads', material_id=material.id))
+        return redirect(url_for('teacher.view_all_uploads', material_id=material_id))
 
     # GET 请求：加载原始题库
-    try:
-        questions = json.loads(material.ai_generated_questions or "[]")
-    except Exception:
-        questions = []
+    questions = material.question_list()
 
     return render_template('teacher_edit_material.html', material=material, questions=questions)
 
 @teacher_bp.route('/student_progress', methods=['GET', 'POST'])
+@query_budget(3)
 @login_required
 @teacher_required
 def student_progress():
@@ -163,8 +193,8 @@ def student_progress():
     from collections import defaultdict
     import datetime
 
-    # 获取所有学生（假设用角色区分）
-    students = User.query.filter_by(role='Student').all()
+    # 获取所有学生（假设用角色区分），下拉框只用到 id 和姓名
+    students = db.session.query(User.id, User.name).filter(User.role == 'Student').order_by(User.id).all()
 
     selected_student_id = request.form.get('student_id')
     chart_data = []
@@ -172,19 +202,11 @@ def student_progress():
     if request.method == 'POST' and selected_student_id:
         from app.models.student_answer_record import StudentAnswerRecord
 
-        # 获取该学生所有答题记录
-        records = StudentAnswerRecord.query.filter_by(student_id=selected_student_id).order_by(StudentAnswerRecord.timestamp).all()
-
-        # 分组计算每个时间点的平均得分
-        date_scores = defaultdict(list)
-        for r in records:
-            date = r.timestamp.strftime('%Y-%m-%d')
-            date_scores[date].append(r.score)
+        # 按日汇总表（时间 → 平均分）
+        rows = analytics.student_daily_scores(selected_student_id).all()
 
-        # 构建图表数据（时间 → 平均分）
-        for date in sorted(date_scores):
-            avg = sum(date_scores[date]) / len(date_scores[date])
-            chart_data.append((date, round(avg, 2)))
+        for date, total, count in ((str(d)[:10], t, c) for d, t, c in rows):
+            chart_data.append((date, round(int(total or 0) / count, 2)))
 
     return render_template('teacher_student_progress.html',
                            students=students,
@@ -192,28 +214,21 @@ def student_progress():
                            selected_student_id=selected_student_id)
 
 @teacher_bp.route('/material_difficulty/<int:material_id>')
+@query_budget(3)
 @login_required
 @teacher_required
 def material_difficulty(material_id):
     material = CourseMaterial.query.filter_by(id=material_id, is_standard=True).first_or_404()
-    questions = json.loads(material.ai_generated_questions or "[]")
 
-    # 查找该题库下所有答题记录
-    from app.models.student_answer_record import StudentAnswerRecord
-    records = StudentAnswerRecord.query.filter_by(material_id=material_id).all()
-
-    # 每题内容 → 得分列表
-    from collections import defaultdict
-    score_map = defaultdict(list)
-    for r in records:
-        score_map[r.question.strip()].append(r.score)
+    # 题目和每题汇总一条查询取回：(题干, 总分, 次数)，按题号排序
+    rows = analytics.material_question_scores(material_id).all()
 
     # 生成统计数据：[(题目序号, 题干前30字, 平均得分)]
     analysis_data = []
-    for idx, q in enumerate(questions, start=1):
-        q_text = q['question'].strip()
-        scores = score_map.get(q_text, [])
-        avg_score = round(sum(scores) / len(scores), 2) if scores else 0.0
+    for idx, (stem, total, count) in enumerate(rows, start=1):
+        q_text = stem.strip()
+        total, count = int(total or 0), int(count or 0)
+        avg_score = round(total / count, 2) if count else 0.0
         preview = q_text[:30] + ("..." if len(q_text) > 30 else "")
         analysis_data.append((f"题目 {idx}", preview, avg_score))
 
@@ -222,23 +237,25 @@ def material_difficulty(material_id):
                            analysis_data=analysis_data)
 
 @teacher_bp.route("/material_report/<int:material_id>")
+@query_budget(6)
 @login_required
 @teacher_required
 def material_report(material_id):
-    from app.models.student_answer_record import StudentAnswerRecord
     from app.utils.ai_utils import generate_teacher_feedback_summary
 
     material = CourseMaterial.query.get_or_404(material_id)
-    records = StudentAnswerRecord.query.filter_by(material_id=material.id).all()
+    total, count = analytics.material_score_total(material.id).one()
 
-    if not records:
+    if not count:
         return render_template("teacher_material_report.html", material=material, message="暂无答题记录")
 
-    avg_score = round(sum([r.score for r in records]) / len(records), 2)
-    best = max(records, key=lambda r: r.score)
-    worst = min(records, key=lambda r: r.score)
+    avg_score = round(int(total or 0) / count, 2)
+    # 得分最高 / 最低的记录，并列时取最早的一条；页面只用到题干和得分
+    best = analytics.material_best_record(material.id).first()
+    worst = analytics.material_worst_record(material.id).first()
 
-    ai_feedback = generate_teacher_feedback_summary(records)
+    # AI 报告只用到前 20 条记录的题干、答案、得分、点评、建议
+    ai_feedback = generate_teacher_feedback_summary(analytics.material_recent_records(material.id).all())
 
     return render_template("teacher_material_report.html",
                            material=material,
@@ -246,3 +263,23 @@ def material_report(material_id):
                            best=best,
                            worst=worst,
                            ai_feedback=ai_feedback)
+
+@teacher_bp.route("/ai_metrics")
+@query_budget(1)
+@login_required
+@teacher_required
+def ai_metrics():
+    from flask import jsonify
+    from app.utils.llm_cache import llm_cache
+    from app.utils.llm_scheduler import scheduler
+    from app.utils.llm_breaker import breaker
+    from app.utils.single_flight import single_flight
+
+    # AI 调度排队深度 / 等待时间、熔断与并发状态、合并的重复请求、缓存命中情况、上传任务队列长度
+    return jsonify({
+        "scheduler": scheduler.stats(),
+        "breaker": breaker.stats(),
+        "single_flight": single_flight.stats(),
+        "cache": llm_cache.stats(),
+        "job_queue": job_queue.qsize()
+    })
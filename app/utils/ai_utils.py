@@ -1,27 +1,61 @@
 import json
+import math
 import os
-import requests
-from dotenv import load_dotenv
+import re
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed, TimeoutError as FuturesTimeout
+
+from app.utils.llm_client import chat_completion, stream_chat_completion, invalidate_cached, LLMError, AIDegraded
+from app.utils.llm_scheduler import INTERACTIVE, GRADING, BACKGROUND, bound_to_requester, current_requester
+from app.utils.choice_utils import grade_choice
+from app.utils.question_utils import parse_questions
+from app.utils.retrieval import tokenize
+
+# 各函数实际放进 prompt 的资料字数，调用方按此提取，不必解析整份文件
+QUESTION_CONTEXT_CHARS = 1000
+CHAT_CONTEXT_CHARS = 1500
+SUMMARY_CONTEXT_CHARS = 2000
+
+# 各函数的缓存有效期（秒），相同 model + prompt 在有效期内直接读本地缓存
+CACHE_TTL = {
+    "generate_questions_with_ai": 24 * 3600,
+    "evaluate_student_answers": 7 * 24 * 3600,
+    "chat_about_material": 7 * 24 * 3600,
+    "recommend_learning_path": 3600,
+    "generate_summary_sheet": 30 * 24 * 3600,
+    "generate_teacher_feedback_summary": 3600,
+}
 
-load_dotenv()
+# 各函数的调度优先级：学生在线等待的问答、批改优先于后台出题和报告
+PRIORITY = {
+    "chat_about_material": INTERACTIVE,
+    "generate_summary_sheet": INTERACTIVE,
+    "evaluate_student_answers": GRADING,
+    "generate_questions_with_ai": BACKGROUND,
+    "recommend_learning_path": BACKGROUND,
+    "generate_teacher_feedback_summary": BACKGROUND,
+}
 
-API_KEY = os.getenv("OPENROUTER_API_KEY")
 
-headers = {
-    "Authorization": f"Bearer {API_KEY}",
-    "Content-Type": "application/json"
-}
+def _ask(prompt, namespace, use_cache=True):
+    return chat_completion(prompt, cache_ttl=CACHE_TTL.get(namespace),
+                           namespace=namespace, use_cache=use_cache,
+                           priority=PRIORITY.get(namespace, BACKGROUND))
 
-API_URL = "https://openrouter.ai/api/v1/chat/completions"
 
-print("[DEBUG] OpenRouter KEY:", API_KEY[:10], "..." if API_KEY else "❌ 没加载成功")
+def _stream(prompt, namespace, use_cache=True):
+    # 生成器在响应流里才开始执行，用户身份在这里先取好
+    return stream_chat_completion(prompt, cache_ttl=CACHE_TTL.get(namespace),
+                                  namespace=namespace, use_cache=use_cache,
+                                  priority=PRIORITY.get(namespace, BACKGROUND),
+                                  user=current_requester())
 
-def generate_questions_with_ai(content):
-    prompt = f"""
-你是一名教育AI，请根据以下资料生成5道选择题，每题含4个选项，并标出正确答案：
+
+def _question_prompt(content, count):
+    return f"""
+你是一名教育AI，请根据以下资料生成{count}道选择题，每题含4个选项，并标出正确答案：
 
 资料内容：
-{content[:1000]}
+{content[:QUESTION_CONTEXT_CHARS]}
 
 请按照以下格式输出：
 题目：
@@ -32,30 +66,196 @@ D.
 正确答案：
     """
 
-    payload = {
-        "model": "mistralai/mixtral-8x7b-instruct",  # 免费、效果强
-        "messages": [
-            {"role": "user", "content": prompt}
-        ]
-    }
 
-    response = requests.post(API_URL, headers=headers, json=payload)
+def generate_questions_with_ai(content, use_cache=True, count=5):
+    prompt = _question_prompt(content, count)
+    try:
+        return _ask(prompt, "generate_questions_with_ai", use_cache)
+    except AIDegraded:
+        # 熔断中：交给调用方（上传任务）标记失败，不能把错误文本当成出题结果
+        raise
+    except LLMError as e:
+        return f"❌ OpenRouter 调用失败：{e.status} - {e.detail}"
 
-    if response.status_code == 200:
-        return response.json()['choices'][0]['message']['content']
-    else:
-        return f"❌ OpenRouter 调用失败：{response.status_code} - {response.text}"
+def stream_questions_with_ai(content, use_cache=True, count=5):
+    """
+    generate_questions_with_ai 的流式版本，逐段产出出题文本，配合 QuestionStreamParser 边收边解析；
+    失败时抛出 LLMError
+    """
+    return _stream(_question_prompt(content, count), "generate_questions_with_ai", use_cache)
+
+# 出题模式：map_reduce = 全文分段并发出题后合并去重，single = 只用资料开头出题
+QUESTION_GENERATION_MODE = os.getenv("AI_QUESTION_GENERATION_MODE", "map_reduce")
+QUESTION_COUNT = 5
+GENERATION_MAX_SECTIONS = int(os.getenv("AI_GENERATION_MAX_SECTIONS", 5))
+GENERATION_CONCURRENCY = int(os.getenv("AI_GENERATION_CONCURRENCY", 4))
+GENERATION_DEADLINE = float(os.getenv("AI_GENERATION_DEADLINE", 120))
+
+_generation_pool = ThreadPoolExecutor(max_workers=GENERATION_CONCURRENCY, thread_name_prefix="ai-generation")
+
+
+def _split_sections(content):
+    """
+    把全文均匀切成若干段（每段 QUESTION_CONTEXT_CHARS 字），段数不超过 GENERATION_MAX_SECTIONS；
+    文档再长也只发固定数量的请求，每段取自文档的不同位置
+    """
+    if len(content) <= QUESTION_CONTEXT_CHARS:
+        return [content]
+    n = min(GENERATION_MAX_SECTIONS, math.ceil(len(content) / QUESTION_CONTEXT_CHARS))
+    span = len(content) / n
+    return [content[int(i * span):int(i * span) + QUESTION_CONTEXT_CHARS] for i in range(n)]
+
+
+def _question_key(question):
+    return re.sub(r"[\W_]+", "", question.get("question", "")).lower()
 
-def evaluate_student_answers(questions, answers):
-    scores = []
-    comments = []
-    recommendations = []
 
-    for q, a in zip(questions, answers):
-        prompt = f"""
+def _is_duplicate(question, selected):
+    key = _question_key(question)
+    tokens = set(tokenize(question.get("question", "")))
+    for other in selected:
+        if key and key == _question_key(other):
+            return True
+        other_tokens = set(tokenize(other.get("question", "")))
+        union = tokens | other_tokens
+        if union and len(tokens & other_tokens) / len(union) >= 0.8:
+            return True
+    return False
+
+
+def _select_questions(candidates_by_section, count):
+    """
+    合并各段的候选题：去掉不完整和重复的题，各段轮流取一道，保证题目覆盖全文
+    """
+    pools = [[q for q in qs if q["question"] and len(q["options"]) >= 2 and q["answer"]]
+             for qs in candidates_by_section]
+    selected = []
+    while len(selected) < count and any(pools):
+        for pool in pools:
+            while pool:
+                q = pool.pop(0)
+                if not _is_duplicate(q, selected):
+                    selected.append(q)
+                    break
+            if len(selected) >= count:
+                break
+    return selected
+
+
+def _format_questions(questions):
+    # 还原成模型输出的文本格式，后续仍由 parse_questions 解析
+    blocks = []
+    for idx, q in enumerate(questions, start=1):
+        lines = [f"题目{idx}：{q['question']}"] + q["options"] + [q["answer"]]
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks)
+
+
+def generate_questions_map_reduce(content, count=QUESTION_COUNT, use_cache=True, on_section=None, first_section=None):
+    """
+    全文分段并发出题（map），再合并、去重、挑出 count 道（reduce）。
+    总耗时约等于一次出题请求；只有一段时等同于 generate_questions_with_ai。
+    on_section(raw_text, done, total)：每完成一段，用已完成各段合并出的题目（与最终结果格式相同）回调一次，
+    在调用方线程里执行，进度页可以先显示这些题目。
+    first_section：第一段（资料开头）已经出好的题目文本，不再重复请求
+    """
+    sections = _split_sections(content)
+    if len(sections) == 1:
+        return first_section if first_section is not None else generate_questions_with_ai(content, use_cache, count)
+
+    # 每段多出几道，去重和筛掉不完整的题之后仍够 count 道
+    per_section = max(2, math.ceil(count * 1.5 / len(sections)))
+    futures = {_generation_pool.submit(bound_to_requester(generate_questions_with_ai), section, use_cache,
+                                       per_section): index
+               for index, section in enumerate(sections) if index or first_section is None}
+
+    # 按段的顺序合并（与完成先后无关），结果是确定的
+    parsed = {}
+    errors = []
+    degraded = None
+    done = 0
+    if first_section is not None:
+        done = 1
+        if first_section.startswith("❌"):
+            errors.append(first_section)
+        else:
+            parsed[0] = parse_questions(first_section)
+    try:
+        for future in as_completed(futures, timeout=GENERATION_DEADLINE):
+            done += 1
+            if isinstance(future.exception(), AIDegraded):
+                degraded = future.exception()
+                continue
+            if future.exception() is not None:
+                continue
+            raw_text = future.result()
+            if raw_text.startswith("❌"):
+                errors.append(raw_text)
+                continue
+            parsed[futures[future]] = parse_questions(raw_text)
+            if on_section:
+                preview = _select_questions([parsed[i] for i in sorted(parsed)], count)
+                on_section(_format_questions(preview), done, len(sections))
+    except FuturesTimeout:
+        pass  # 超过时限还没返回的段不再等待
+
+    candidates = [parsed[i] for i in sorted(parsed)]
+    selected = _select_questions(candidates, count)
+    if not selected:
+        if degraded is not None:
+            raise degraded  # 一道题也没出成且有段被熔断拒绝：按降级处理，由上传任务标记失败
+        return errors[0] if errors else "❌ OpenRouter 调用失败：None - 出题超时"
+    return _format_questions(selected)
+
+# 批改并发度：同时在途的单题评分请求数
+GRADING_CONCURRENCY = int(os.getenv("AI_GRADING_CONCURRENCY", 5))
+# 批改模式：batch = 整份答卷一次请求（失败题目回退逐题），per_question = 逐题并发
+GRADING_MODE = os.getenv("AI_GRADING_MODE", "batch")
+# 整份答卷的批改时限（秒），超时未返回的题目按请求失败处理
+GRADING_DEADLINE = float(os.getenv("AI_GRADING_DEADLINE", 90))
+
+
+
+class Degraded:
+    """
+    AI 没能给出评分（请求失败、熔断、超时或回复无法解析）。
+    这不是分数，调用方不能把它当成 0 分保存
+    """
+    __slots__ = ("reason",)
+
+    def __init__(self, reason):
+        self.reason = reason
+
+    def __repr__(self):
+        return f"Degraded({self.reason!r})"
+
+
+REQUEST_FAILED = Degraded("AI 批改暂时不可用")
+PARSE_FAILED = Degraded("AI 评分结果无法解析")
+
+_grading_pool = ThreadPoolExecutor(max_workers=GRADING_CONCURRENCY, thread_name_prefix="ai-grading")
+
+
+def _grading_question(q):
+    """
+    评分 prompt 里的题目：只放题干和选项。不带参考答案（不把答案键交给评分模型），
+    也不带题目 id（不同资料里的相同题目共用缓存）
+    """
+    if not isinstance(q, dict):
+        return str(q)
+    options = q.get("options") or []
+    text = q.get("question", "")
+    return f"{text}\nOptions: {' / '.join(options)}" if options else text
+
+
+def _evaluate_one(q, a):
+    """
+    单题评分，返回 (score, comment, recommendation)，失败时返回 Degraded
+    """
+    prompt = f"""
 You are an AI tutor. Evaluate the student's answer to the following question.
 
-Question: {q}
+Question: {_grading_question(q)}
 Answer: {a}
 
 Please give:
@@ -67,46 +267,225 @@ Respond in JSON format like:
 {{"score": 7, "comment": "Good effort but lacks detail.", "recommendation": "Review examples related to this concept."}}
 """
 
-        payload = {
-            "model": "mistralai/mixtral-8x7b-instruct",
-            "messages": [
-                {"role": "user", "content": prompt}
-            ]
-        }
-
-        response = requests.post(API_URL, headers=headers, json=payload)
-        print("[DEBUG] Response status:", response.status_code)
-
-        if response.status_code == 200:
-            try:
-                result_text = response.json()["choices"][0]["message"]["content"]
-                result_json = json.loads(result_text.strip())
-                scores.append(result_json.get("score", 0))
-                comments.append(result_json.get("comment", "无"))
-                recommendations.append(result_json.get("recommendation", "无"))
-            except Exception as e:
-                scores.append(0)
-                comments.append("AI 解析失败")
-                recommendations.append("请手动复习本题")
+    try:
+        result_text = _ask(prompt, "evaluate_student_answers")
+    except LLMError:
+        return REQUEST_FAILED
+
+    try:
+        result_json = _load_json(result_text)
+    except ValueError:
+        result_json = None
+    # 与批量评分同样校验；点评、建议缺省时用“无”
+    grade = _valid_grade(dict({"comment": "无", "recommendation": "无"}, **result_json)) \
+        if isinstance(result_json, dict) else None
+    if grade is None:
+        # 解析失败的回复不留在缓存里，下次重新请求
+        invalidate_cached(prompt)
+        return PARSE_FAILED
+    return grade
+
+
+def _load_json(text):
+    """
+    解析模型返回的 JSON，兼容 ```json 代码块包裹和前后多余说明文字
+    """
+    text = text.strip()
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    match = re.search(r"(\[.*\]|\{.*\})", text, re.S)
+    if not match:
+        raise ValueError("未找到 JSON")
+    return json.loads(match.group(1))
+
+
+def _valid_grade(item):
+    """
+    校验一项评分，合法则返回 (score, comment, recommendation)，否则返回 None。
+    分数可以是数字或数字字符串（模型常回 "7"），取整后保存（答题记录的 score 为整数列）
+    """
+    if not isinstance(item, dict):
+        return None
+    score = item.get("score")
+    comment = item.get("comment")
+    recommendation = item.get("recommendation")
+    if isinstance(score, str):
+        try:
+            score = float(score.strip())
+        except ValueError:
+            return None
+    if isinstance(score, bool) or not isinstance(score, (int, float)) or not 0 <= score <= 10:
+        return None
+    if not isinstance(comment, str) or not isinstance(recommendation, str):
+        return None
+    return round(score), comment, recommendation
+
+
+def _evaluate_batch(questions, answers):
+    """
+    一次请求批改整份答卷，返回与题目等长的列表，缺失或不合法的项为 None
+    """
+    items = ""
+    for idx, (q, a) in enumerate(zip(questions, answers), start=1):
+        items += f"""
+[{idx}]
+Question: {_grading_question(q)}
+Answer: {a}
+"""
+
+    prompt = f"""
+You are an AI tutor. Evaluate each of the student's answers below.
+
+{items}
+For every answer give:
+1. A score from 0 to 10
+2. A short feedback comment (1~2 sentences)
+3. One recommended question or topic for improvement
+
+Respond with ONLY a JSON array of exactly {len(questions)} objects, in the same order as the questions, like:
+[{{"index": 1, "score": 7, "comment": "Good effort but lacks detail.", "recommendation": "Review examples related to this concept."}}]
+"""
+
+    results = [None] * len(questions)
+    try:
+        data = _load_json(_ask(prompt, "evaluate_student_answers"))
+    except AIDegraded:
+        # 熔断中逐题回退也会立即失败，整份直接降级
+        return [REQUEST_FAILED] * len(questions)
+    except LLMError:
+        return results
+    except ValueError:
+        invalidate_cached(prompt)
+        return results
+    if not isinstance(data, list):
+        invalidate_cached(prompt)
+        return results
+
+    for pos, item in enumerate(data):
+        # 优先按模型给出的 index 对齐，没有则按数组位置
+        idx = item.get("index", pos + 1) if isinstance(item, dict) else pos + 1
+        if not isinstance(idx, int) or not 1 <= idx <= len(questions) or results[idx - 1] is not None:
+            continue
+        results[idx - 1] = _valid_grade(item)
+    return results
+
+
+def _evaluate_concurrently(questions, answers):
+    # 每题并发评分，总耗时约等于最慢的一题
+    futures = [_grading_pool.submit(bound_to_requester(_evaluate_one), q, a) for q, a in zip(questions, answers)]
+    wait(futures, timeout=GRADING_DEADLINE)
+
+    # 按题目顺序收集结果，单题失败或超时不影响其他题
+    results = []
+    for future in futures:
+        if not future.done():
+            future.cancel()
+            results.append(REQUEST_FAILED)
+        elif future.exception() is not None:
+            results.append(REQUEST_FAILED)
         else:
-            scores.append(0)
-            comments.append("❌ AI 请求失败")
-            recommendations.append("❌ 无推荐")
+            results.append(future.result())
+    return results
 
-    return {
-        "scores": scores,
-        "comments": comments,
-        "recommendations": recommendations
-    }
 
-def chat_about_material(content, question):
+def _explain_choice(q, a, correct, chosen):
     """
-    基于学生上传资料内容和提问生成 AI 回复
+    选择题分数已在本地判定，这里只请 AI 写点评和推荐，返回 (comment, recommendation)
     """
+    verdict = "correct" if correct == chosen else f"wrong (the correct option is {correct})"
     prompt = f"""
-你是一个智能学习助手。以下是学生上传的学习资料内容（不一定完整）：
+You are an AI tutor. A student answered a multiple-choice question.
+
+Question: {q.get("question", "")}
+Options: {" / ".join(q.get("options", []))}
+Student's choice: {chosen}
+The student's choice is {verdict}.
+
+Please give:
+1. A short feedback comment (1~2 sentences) explaining the key point
+2. One recommended question or topic for improvement
+
+Respond in JSON format like:
+{{"comment": "The concept of ... is ...", "recommendation": "Review examples related to this concept."}}
+"""
+    try:
+        result_json = _load_json(_ask(prompt, "evaluate_student_answers"))
+        return (result_json.get("comment") or "无", result_json.get("recommendation") or "无")
+    except Exception:
+        return None
+
+
+def _grade_choices_locally(questions, answers, explain_correct):
+    """
+    本地批改能识别的选择题，返回与题目等长的列表，不能本地判分的项为 None。
+    只有答错（或 explain_correct=True）的题目才调用 AI 生成点评
+    """
+    results = [None] * len(questions)
+    to_explain = {}
+    for i, (q, a) in enumerate(zip(questions, answers)):
+        graded = grade_choice(q, a)
+        if graded is None:
+            continue
+        score, correct, chosen = graded
+        if score:
+            results[i] = (score, "回答正确。", "继续保持，可以尝试更有挑战的题目。")
+        else:
+            results[i] = (score, f"回答错误，正确答案是 {correct}。", "请复习本题相关知识点")
+        if not score or explain_correct:
+            to_explain[i] = _grading_pool.submit(bound_to_requester(_explain_choice), q, a, correct, chosen)
+
+    wait(list(to_explain.values()), timeout=GRADING_DEADLINE)
+    for i, future in to_explain.items():
+        if not future.done():
+            future.cancel()  # 超时的点评不再等，还在排队的直接取消
+            continue
+        explained = future.result() if future.exception() is None else None
+        if explained:
+            results[i] = (results[i][0],) + explained
+    return results
+
+
+def evaluate_student_answers(questions, answers, mode=None, explain_correct=False):
+    mode = mode or GRADING_MODE
+    questions = list(questions)[:len(answers)]
+    answers = list(answers)[:len(questions)]
+
+    # 选择题先本地判分，剩下的主观题 / 无法识别的作答再交给 AI
+    results = _grade_choices_locally(questions, answers, explain_correct)
+    pending = [i for i, r in enumerate(results) if r is None]
+    pending_q = [questions[i] for i in pending]
+    pending_a = [answers[i] for i in pending]
+
+    if mode == "batch" and pending:
+        graded = _evaluate_batch(pending_q, pending_a)
+        # 批量结果中缺失或格式不对的题目，回退到逐题评分
+        missing = [j for j, r in enumerate(graded) if r is None]
+        if missing:
+            retried = _evaluate_concurrently([pending_q[j] for j in missing], [pending_a[j] for j in missing])
+            for j, r in zip(missing, retried):
+                graded[j] = r
+    else:
+        graded = _evaluate_concurrently(pending_q, pending_a)
+
+    for i, r in zip(pending, graded):
+        results[i] = r
+
+    # 没能评分的题目分数为 None，degraded 标出这些题，调用方不应保存为成绩
+    degraded = [isinstance(r, Degraded) for r in results]
+    return {
+        "scores": [None if d else r[0] for r, d in zip(results, degraded)],
+        "comments": [r.reason if d else r[1] for r, d in zip(results, degraded)],
+        "recommendations": [None if d else r[2] for r, d in zip(results, degraded)],
+        "degraded": degraded
+    }
+
+def _chat_prompt(content, question):
+    return f"""
+你是一个智能学习助手。以下是学生上传的学习资料中与问题相关的片段（不一定完整）：
 ----------------
-{content[:1500]}
+{content[:CHAT_CONTEXT_CHARS]}
 ----------------
 
 学生的问题是：
@@ -115,22 +494,25 @@ def chat_about_material(content, question):
 请你基于以上资料内容，尽量简洁清晰地回答问题。如果资料中没有明确内容，也请说明。
 """
 
-    payload = {
-        "model": "mistralai/mixtral-8x7b-instruct",
-        "messages": [
-            {"role": "user", "content": prompt}
-        ]
-    }
 
-    response = requests.post(API_URL, headers=headers, json=payload)
-    print("[DEBUG] Chat response status:", response.status_code)
+def chat_about_material(content, question, use_cache=True):
+    """
+    基于学生上传资料内容和提问生成 AI 回复，content 为检索出的与问题相关的资料片段
+    """
+    prompt = _chat_prompt(content, question)
+    try:
+        return _ask(prompt, "chat_about_material", use_cache)
+    except LLMError as e:
+        return f"❌ AI 问答失败：{e.status}"
 
-    if response.status_code == 200:
-        return response.json()["choices"][0]["message"]["content"]
-    else:
-        return f"❌ AI 问答失败：{response.status_code}"
 
-def recommend_learning_path(student_records):
+def stream_chat_about_material(content, question, use_cache=True):
+    """
+    chat_about_material 的流式版本，逐段产出回答文本；失败时抛出 LLMError
+    """
+    return _stream(_chat_prompt(content, question), "chat_about_material", use_cache)
+
+def recommend_learning_path(student_records, use_cache=True):
     """
     根据学生答题记录，调用 AI 生成学习路径
     """
@@ -158,21 +540,12 @@ AI 点评：{r.comment}
 请用简洁中文回答，结构清晰。
 """
 
-    payload = {
-        "model": "mistralai/mixtral-8x7b-instruct",
-        "messages": [{"role": "user", "content": prompt}]
-    }
-
-    response = requests.post(API_URL, headers=headers, json=payload)
-    if response.status_code == 200:
-        return response.json()["choices"][0]["message"]["content"]
-    else:
-        return f"❌ AI 生成失败：{response.status_code}"
-def generate_summary_sheet(content):
-    """
-    用 AI 生成一页纸总结，包括概念、定义、要点、公式等
-    """
-    prompt = f"""
+    try:
+        return _ask(prompt, "recommend_learning_path", use_cache)
+    except LLMError as e:
+        return f"❌ AI 生成失败：{e.status}"
+def _summary_prompt(content):
+    return f"""
 你是一名教育AI助教，请根据以下学习资料内容，提炼成一页纸总结，内容包括但不限于：
 
 1. 核心知识点
@@ -183,22 +556,29 @@ def generate_summary_sheet(content):
 
 资料内容如下：
 ------------------
-{content[:2000]}
+{content[:SUMMARY_CONTEXT_CHARS]}
 ------------------
 
 请用简洁中文，结构清晰分段输出，不要超出一页。
 """
 
-    payload = {
-        "model": "mistralai/mixtral-8x7b-instruct",
-        "messages": [{"role": "user", "content": prompt}]
-    }
 
-    response = requests.post(API_URL, headers=headers, json=payload)
-    if response.status_code == 200:
-        return response.json()["choices"][0]["message"]["content"]
-    else:
-        return f"❌ AI 总结失败：{response.status_code}"
+def generate_summary_sheet(content, use_cache=True):
+    """
+    用 AI 生成一页纸总结，包括概念、定义、要点、公式等
+    """
+    prompt = _summary_prompt(content)
+    try:
+        return _ask(prompt, "generate_summary_sheet", use_cache)
+    except LLMError as e:
+        return f"❌ AI 总结失败：{e.status}"
+
+
+def stream_summary_sheet(content, use_cache=True):
+    """
+    generate_summary_sheet 的流式版本，逐段产出总结文本；失败时抛出 LLMError
+    """
+    return _stream(_summary_prompt(content), "generate_summary_sheet", use_cache)
 # def classify_knowledge_tag(question, student_answer=""):
 #     """
 #     用 AI 判断题目的知识点归属，例如：数学、英语语法、计算机基础等
@@ -222,7 +602,7 @@ def generate_summary_sheet(content):
 #         return "未知"
 
 
-def generate_teacher_feedback_summary(records):
+def generate_teacher_feedback_summary(records, use_cache=True):
     formatted = ""
     for r in records[:20]:
         formatted += f"""
@@ -247,13 +627,7 @@ def generate_teacher_feedback_summary(records):
 请用中文输出一段清晰简洁的教学报告。
 """
 
-    payload = {
-        "model": "mistralai/mixtral-8x7b-instruct",
-        "messages": [{"role": "user", "content": prompt}]
-    }
-
-    response = requests.post(API_URL, headers=headers, json=payload)
-    if response.status_code == 200:
-        return response.json()["choices"][0]["message"]["content"]
-    else:
+    try:
+        return _ask(prompt, "generate_teacher_feedback_summary", use_cache)
+    except LLMError:
         return "❌ AI 生成失败"
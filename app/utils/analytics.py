@@ -0,0 +1,167 @@
+from datetime import datetime
+
+from sqlalchemy import func, text
+from sqlalchemy.orm import load_only
+
+from app.models import db, User, Question, StudentAnswerRecord
+from app.models import StudentDayStat, StudentTagStat, MaterialStudentStat, QuestionStat
+from app.utils.pagination import encode_cursor, keyset_query
+
+# 统计页面用到的查询（分组统计读汇总表，明细读答题记录）。这里只构造查询、不执行，
+# 路由负责 .all() / .first()，`flask perf explain` 和执行计划测试用同样的函数构造查询检查是否走索引
+
+R = StudentAnswerRecord
+DS = StudentDayStat
+TS = StudentTagStat
+MS = MaterialStudentStat
+QS = QuestionStat
+
+# 执行计划检查的表：不允许全表扫描
+CHECKED_TABLES = (R.__tablename__, DS.__tablename__, TS.__tablename__, MS.__tablename__, QS.__tablename__)
+
+
+def material_student_scores(material_id):
+    """
+    某资料下每个学生（按姓名）的 (姓名, 总分, 次数)，按该学生最早作答的先后排序（读汇总表）
+    """
+    return db.session.query(User.name, func.sum(MS.score_sum), func.sum(MS.answer_count)) \
+        .join(User, User.id == MS.student_id) \
+        .filter(MS.material_id == material_id) \
+        .group_by(User.name) \
+        .order_by(func.min(MS.first_at), User.name)
+
+
+def material_question_scores(material_id):
+    """
+    某资料每道题的 (题干, 总分, 次数)，按题号排序；没人作答的题为 (题干, 0, 0)（题目表左连接汇总表）
+    """
+    return db.session.query(Question.stem,
+                            func.coalesce(QS.score_sum, 0),
+                            func.coalesce(QS.answer_count, 0)) \
+        .outerjoin(QS, QS.question_id == Question.id) \
+        .filter(Question.material_id == material_id) \
+        .order_by(Question.position)
+
+
+def material_score_total(material_id):
+    """
+    某资料下全部记录的 (总分, 次数)
+    """
+    return db.session.query(func.sum(R.score), func.count(R.id)) \
+        .filter(R.material_id == material_id)
+
+
+def material_records(material_id, *columns):
+    """
+    某资料下的答题记录；给出 columns 时只加载这些列
+    """
+    query = R.query.filter_by(material_id=material_id)
+    return query.options(load_only(*columns)) if columns else query
+
+
+def material_best_record(material_id):
+    """
+    得分最高的记录，并列时取最早的一条；只加载题干和得分
+    """
+    return material_records(material_id, R.question, R.score).order_by(R.score.desc(), R.id).limit(1)
+
+
+def material_worst_record(material_id):
+    """
+    得分最低的记录，并列时取最早的一条；只加载题干和得分
+    """
+    return material_records(material_id, R.question, R.score).order_by(R.score, R.id).limit(1)
+
+
+def material_recent_records(material_id, limit=20):
+    """
+    AI 报告用到的前 limit 条记录，只加载题干、答案、得分、点评、建议
+    """
+    return material_records(material_id, R.question, R.student_answer, R.score, R.comment, R.recommendation) \
+        .order_by(R.id).limit(limit)
+
+
+def material_record_rows(material_id):
+    """
+    答题记录页面显示的列（不构造 ORM 对象）；不排序，由 keyset_page 按 (created_at, id) 分页
+    """
+    return db.session.query(R.id, R.created_at, R.student_id, R.question, R.student_answer, R.score, R.comment,
+                            R.recommendation, R.timestamp) \
+        .filter(R.material_id == material_id)
+
+
+def material_export_rows(material_id):
+    """
+    导出用的列（带学生姓名），按记录 id 顺序
+    """
+    return db.session.query(R.id, R.student_id, User.name.label("student_name"), R.question, R.student_answer, R.score, R.comment,
+                            R.recommendation, R.knowledge_tag, R.timestamp) \
+        .outerjoin(User, User.id == R.student_id) \
+        .filter(R.material_id == material_id) \
+        .order_by(R.id)
+
+
+def student_daily_scores(student_id):
+    """
+    某学生每天的 (日期, 总分, 次数)（读汇总表）
+    """
+    return db.session.query(DS.day, DS.score_sum, DS.answer_count) \
+        .filter(DS.student_id == student_id) \
+        .order_by(DS.day)
+
+
+def student_tag_scores(student_id):
+    """
+    某学生每个知识点的 (知识点, 总分, 次数)，按该知识点最早作答的先后排序（读汇总表）
+    """
+    return db.session.query(TS.knowledge_tag, TS.score_sum, TS.answer_count) \
+        .filter(TS.student_id == student_id) \
+        .order_by(TS.first_at, TS.knowledge_tag)
+
+
+def student_recent_records(student_id, limit=20):
+    return R.query.filter_by(student_id=student_id).order_by(R.created_at.desc()).limit(limit)
+
+
+# 路由 → 它对答题记录 / 汇总表执行的查询（参数为资料 id、学生 id），供执行计划检查使用。
+# 与路由调用同一个函数构造；tests/test_query_plans.py 核对路由实际执行的 SQL 都在这里
+ROUTE_QUERIES = {
+    "teacher.view_material_records": lambda m, s: [
+        keyset_query(material_record_rows(m), R.created_at, R.id),
+        keyset_query(material_record_rows(m), R.created_at, R.id, encode_cursor(datetime.utcnow(), 0)),
+    ],
+    "teacher.export_material_records": lambda m, s: [material_export_rows(m)],
+    "teacher.material_stats": lambda m, s: [material_student_scores(m)],
+    "teacher.material_difficulty": lambda m, s: [material_question_scores(m)],
+    "teacher.material_report": lambda m, s: [
+        material_score_total(m),
+        material_best_record(m),
+        material_worst_record(m),
+        material_recent_records(m),
+    ],
+    "teacher.student_progress": lambda m, s: [student_daily_scores(s)],
+    "student.radar_chart": lambda m, s: [student_tag_scores(s)],
+    "student.learning_path": lambda m, s: [student_recent_records(s)],
+}
+
+
+def explain(query):
+    """
+    返回 (执行计划各行的文字描述, 对答题记录 / 汇总表做了全表扫描的行)；
+    只支持 sqlite 和 MySQL，其他数据库抛 ValueError
+    """
+    dialect = db.engine.dialect
+    sql = str(query.statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+    if dialect.name == "sqlite":
+        rows = db.session.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+        lines = [row[-1] for row in rows]
+        # 走索引时为 "SEARCH ... USING INDEX"，"SCAN ... USING COVERING INDEX" 也是扫整个索引
+        scans = [line for line in lines if line.startswith("SCAN ") and line.split()[1] in CHECKED_TABLES]
+    elif dialect.name == "mysql":
+        rows = db.session.execute(text(f"EXPLAIN {sql}")).mappings().all()
+        lines = [f"{row['table']}: type={row['type']} key={row['key']} rows={row['rows']}" for row in rows]
+        scans = [line for row, line in zip(rows, lines)
+                 if row["table"] in CHECKED_TABLES and row["type"] in ("ALL", "index")]
+    else:
+        raise ValueError(f"不支持的数据库：{dialect.name}")
+    return lines, scans
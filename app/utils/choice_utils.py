@@ -0,0 +1,72 @@
+import re
+
+# 选择题本地判分：从 parse_questions 得到的 options / answer 中取出正确选项字母，
+# 与学生作答归一化后直接比较，无需调用 AI
+
+FULL_SCORE = 10
+
+_ANSWER_PREFIX = re.compile(r"^.*?(?:正确答案|答案|Answer)\s*(?:是|为|is)?\s*[:：]?", re.I)
+_LETTER = re.compile(r"^[\(（【\[]?\s*([A-Da-d])\s*[\)）】\]]?(?=$|[\s\.\、，,：:;；。])")
+_STUDENT_PREFIX = re.compile(r"^(?:我选|选择|选|答案\s*(?:是|为)?\s*[:：]?)\s*")
+_OPTION_PREFIX = re.compile(r"^[A-Da-d][\.\、，：:]\s*")
+_ANY_LETTER = re.compile(r"(?<![A-Za-z])[A-Da-d](?![A-Za-z])")
+
+
+def _normalize_text(text):
+    return re.sub(r"\s+", "", text or "").rstrip("。.").lower()
+
+
+def correct_letter(question):
+    """
+    从 "正确答案：B" / "Answer: b. xxx" 这类答案行中取出大写选项字母，取不到返回 None
+    """
+    answer = (question.get("answer") or "").strip()
+    answer = _ANSWER_PREFIX.sub("", answer, count=1).strip()
+    match = _LETTER.match(answer)
+    if match:
+        return match.group(1).upper()
+
+    # 答案行只写了选项内容时，按选项文本反查字母
+    return _letter_by_option_text(answer, question.get("options") or [])
+
+
+def student_letter(answer, options):
+    """
+    归一化学生的选择："B"、"b."、"(B)"、"选B"、"B. 选项内容" 或直接抄写选项内容，均识别为 "B"；
+    写了不止一个选项字母（"A B"、"A,B"）时返回 None，不替学生挑一个
+    """
+    answer = (answer or "").strip()
+    answer = _STUDENT_PREFIX.sub("", answer, count=1)
+    match = _LETTER.match(answer)
+    if match:
+        letter = match.group(1).upper()
+        rest = answer[match.end():].lstrip(" .、，,：:;；。")
+        if _ANY_LETTER.search(rest) and _letter_by_option_text(rest, options) != letter:
+            return None
+        return letter
+    return _letter_by_option_text(answer, options)
+
+
+def _letter_by_option_text(text, options):
+    target = _normalize_text(text)
+    if not target:
+        return None
+    for option in options:
+        letter = option.strip()[:1].upper()
+        if letter in "ABCD" and _normalize_text(_OPTION_PREFIX.sub("", option.strip())) == target:
+            return letter
+    return None
+
+
+def grade_choice(question, answer):
+    """
+    本地判分，返回 (score, correct_letter, chosen_letter)；
+    不是选择题或无法识别作答时返回 None，交给 AI 批改
+    """
+    if not isinstance(question, dict) or not question.get("options"):
+        return None
+    correct = correct_letter(question)
+    chosen = student_letter(answer, question["options"])
+    if correct is None or chosen is None:
+        return None
+    return (FULL_SCORE if chosen == correct else 0), correct, chosen
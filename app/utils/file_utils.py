@@ -1,22 +1,194 @@
+import gzip
+import hashlib
+import multiprocessing
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
 from pptx import Presentation
 import fitz  # PyMuPDF
 
-def extract_text_from_file(filepath):
-    if filepath.endswith('.pdf'):
-        doc = fitz.open(filepath)
-        text = ""
-        for page in doc:
-            text += page.get_text()
-        return text
+from app.utils.single_flight import single_flight
+
+# 提取出的文本按文件内容哈希存为 gzip 文件，避免每次请求都重新解析 PDF/PPT
+TEXT_STORE_DIR = os.getenv("TEXT_STORE_DIR", os.path.join(os.getcwd(), "cache", "text"))
+
+# 页数不少于该值的 PDF 按页段分给多个进程并行解析
+PARALLEL_MIN_PAGES = int(os.getenv("EXTRACT_PARALLEL_MIN_PAGES", 40))
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", min(4, os.cpu_count() or 1)))
+
+# 单页提取结果：页码（从 0 开始）、文本、耗时（秒）
+PageText = namedtuple("PageText", ["index", "text", "seconds"])
+
+_process_pool = None
+
+
+def _get_process_pool():
+    global _process_pool
+    if _process_pool is None:
+        # spawn 避免在多线程的 Web 进程里 fork
+        _process_pool = ProcessPoolExecutor(max_workers=EXTRACT_WORKERS,
+                                            mp_context=multiprocessing.get_context("spawn"))
+    return _process_pool
+
 
+def _extract_pdf_range(filepath, start, stop):
+    """
+    在子进程中解析 [start, stop) 页，返回 PageText 列表
+    """
+    pages = []
+    with fitz.open(filepath) as doc:
+        for index in range(start, stop):
+            began = time.perf_counter()
+            text = doc[index].get_text()
+            pages.append(PageText(index, text, time.perf_counter() - began))
+    return pages
+
+
+def _iter_pdf_pages(filepath, parallel, pages=None):
+    with fitz.open(filepath) as doc:
+        page_count = doc.page_count
+        if pages is not None:
+            # 只解析指定页段，按需打开页面，不走进程池
+            for index in range(page_count)[pages.start:pages.stop:pages.step]:
+                began = time.perf_counter()
+                text = doc[index].get_text()
+                yield PageText(index, text, time.perf_counter() - began)
+            return
+        if not parallel or page_count < PARALLEL_MIN_PAGES or EXTRACT_WORKERS < 2:
+            for index in range(page_count):
+                began = time.perf_counter()
+                text = doc[index].get_text()
+                yield PageText(index, text, time.perf_counter() - began)
+            return
+
+    # 大文件：按页段切分给进程池，map 保证按页段顺序返回
+    step = -(-page_count // EXTRACT_WORKERS)
+    ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+    chunks = _get_process_pool().map(_extract_pdf_range,
+                                     [filepath] * len(ranges),
+                                     [r[0] for r in ranges],
+                                     [r[1] for r in ranges])
+    for chunk in chunks:
+        yield from chunk
+
+
+def _iter_pptx_slides(filepath, pages=None):
+    prs = Presentation(filepath)
+    indexes = range(len(prs.slides))
+    if pages is not None:
+        indexes = indexes[pages.start:pages.stop:pages.step]
+    for index in indexes:
+        slide = prs.slides[index]
+        began = time.perf_counter()
+        parts = []
+        for shape in slide.shapes:
+            if hasattr(shape, "text"):
+                parts.append(shape.text)
+                parts.append("\n")
+        yield PageText(index, "".join(parts), time.perf_counter() - began)
+
+
+def iter_pages(filepath, parallel=True, pages=None):
+    """
+    逐页（PPT 为逐张幻灯片）产出 PageText，不支持的文件类型不产出任何内容。
+    pages 为 range 时只解析其中的页（页码从 0 开始）
+    """
+    if filepath.endswith('.pdf'):
+        yield from _iter_pdf_pages(filepath, parallel, pages)
     elif filepath.endswith('.pptx'):
-        prs = Presentation(filepath)
-        text = ""
-        for slide in prs.slides:
-            for shape in slide.shapes:
-                if hasattr(shape, "text"):
-                    text += shape.text + "\n"
-        return text
-
-    else:
+        yield from _iter_pptx_slides(filepath, pages)
+
+
+def extract_text_from_file(filepath, max_chars=None, pages=None):
+    """
+    提取文件文本。传入 max_chars 时凑够字数即停止打开后续页面，返回前 max_chars 个字符；
+    pages 为 range 时只提取这些页
+    """
+    if not filepath.endswith(('.pdf', '.pptx')):
+        return None
+
+    parts = []
+    total = 0
+    slowest = None
+    # 有字数预算时逐页顺序解析，够了就停，不启动进程池
+    for page in iter_pages(filepath, parallel=max_chars is None, pages=pages):
+        parts.append(page.text)
+        total += len(page.text)
+        if slowest is None or page.seconds > slowest.seconds:
+            slowest = page
+        if max_chars is not None and total >= max_chars:
+            break
+    if slowest is not None:
+        print(f"[DEBUG] Extracted {len(parts)} pages from {os.path.basename(filepath)}, "
+              f"slowest page {slowest.index + 1}: {slowest.seconds * 1000:.1f} ms")
+    text = "".join(parts)
+    return text[:max_chars] if max_chars is not None else text
+
+
+def file_content_hash(filepath):
+    sha = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def _text_store_path(content_hash):
+    return os.path.join(TEXT_STORE_DIR, f"{content_hash}.txt.gz")
+
+
+def _read_stored_text(content_hash, max_chars=None):
+    path = _text_store_path(content_hash)
+    if not os.path.exists(path):
         return None
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        # 只解压需要的前 max_chars 个字符
+        return f.read(max_chars if max_chars is not None else -1)
+
+
+def _write_stored_text(content_hash, text):
+    os.makedirs(TEXT_STORE_DIR, exist_ok=True)
+    path = _text_store_path(content_hash)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def load_extracted_text(filepath, content_hash=None, max_chars=None, store=True):
+    """
+    读取文件的提取文本，返回 (text, content_hash)，max_chars 限制返回的字符数。
+    已知哈希且文件在存储之后没有被改动时直接读 gzip 文件；
+    否则重新计算哈希，只有哈希对应的文本不存在时才重新解析文件：
+    给了 max_chars 或 store=False 时只按 max_chars 解析开头几页（不存档），
+    否则完整解析并存档
+    """
+    if content_hash:
+        path = _text_store_path(content_hash)
+        if os.path.exists(path) and os.path.getmtime(filepath) <= os.path.getmtime(path):
+            return _read_stored_text(content_hash, max_chars), content_hash
+
+    content_hash = file_content_hash(filepath)
+    text = _read_stored_text(content_hash, max_chars)
+    if text is not None:
+        return text, content_hash
+
+    # 同一文件同时被多个请求 / 进程读取时只解析一次；
+    # 只要开头时不为此解析整份文件，全文由上传任务解析存档
+    if not store or max_chars is not None:
+        text = single_flight.do(f"extract:{content_hash}:{max_chars}",
+                                lambda: extract_text_from_file(filepath, max_chars=max_chars))
+        return text, content_hash
+
+    text = single_flight.do(f"extract:{content_hash}", lambda: _extract_and_store(filepath, content_hash),
+                            recheck=lambda: _read_stored_text(content_hash), cross_process=True)
+    return text, content_hash
+
+
+def _extract_and_store(filepath, content_hash):
+    text = extract_text_from_file(filepath)
+    if text is not None:
+        _write_stored_text(content_hash, text)
+    return text
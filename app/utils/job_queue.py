@@ -0,0 +1,342 @@
+import queue
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import or_
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.models import db
+from app.models.material_job import MaterialJob
+from app.utils.ai_utils import generate_questions_map_reduce, stream_questions_with_ai
+from app.utils.ai_utils import QUESTION_CONTEXT_CHARS, QUESTION_GENERATION_MODE
+from app.utils.file_utils import load_extracted_text
+from app.utils.llm_client import LLMError, AIDegraded
+from app.utils.llm_scheduler import on_behalf_of, SYSTEM_USER
+from app.utils.question_utils import parse_questions, QuestionStreamParser
+from app.utils.retrieval import build_chunk_index
+
+
+# 分段出题时在后台解析全文（与第一段出题同时进行）
+_parse_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="material-parse")
+
+
+class QueueFull(Exception):
+    """任务队列已满，调用方应提示用户稍后再试"""
+
+
+def run_material_job(job_id):
+    """
+    执行（或从中断处继续执行）一个资料处理任务。
+    每完成一个阶段就提交一次，进程崩溃后重新执行只会重做未完成的阶段
+    """
+    job = db.session.get(MaterialJob, job_id)
+    if job is None or job.status != 'queued':
+        return
+    material = job.material
+
+    # 原子地认领任务：只认领排队中的，已被其他 worker 认领（running）的不会再执行一次
+    lease_seconds = current_app.config.get('JOB_LEASE_SECONDS', 60)
+    now = datetime.utcnow()
+    claimed = MaterialJob.query.filter(MaterialJob.id == job_id, MaterialJob.status == 'queued') \
+        .update({"status": "running", "updated_at": now,
+                 "lease_expires_at": now + timedelta(seconds=lease_seconds)}, synchronize_session=False)
+    db.session.commit()
+    if not claimed:
+        return
+    db.session.refresh(job)
+
+    # 上传者的出题请求在调度器里按同一用户轮转，一次大批量上传不会挤占其他用户
+    owner = material.teacher_id or material.student_id
+    with _Lease(current_app._get_current_object(), job_id, lease_seconds), \
+            on_behalf_of(f"user:{owner}" if owner else SYSTEM_USER):
+        try:
+            stage_index = MaterialJob.STAGES.index(job.stage)
+
+            if stage_index < MaterialJob.STAGES.index('generated'):
+                # 先只提取出题用的开头一段，第一批题目的等待时间与文件页数无关
+                head, content_hash = load_extracted_text(material.filepath, max_chars=QUESTION_CONTEXT_CHARS)
+                material.content_hash = content_hash
+                _advance(job, 'extracted', 25)
+
+                if not head:
+                    raw_text = "无法识别文件内容。"
+                elif QUESTION_GENERATION_MODE == "map_reduce":
+                    raw_text = _generate_map_reduce(job, material, head)
+                else:
+                    raw_text = _stream_questions(job, head)
+                job.raw_output = raw_text
+                _advance(job, 'generated', 70)
+
+            if stage_index < MaterialJob.STAGES.index('parsed'):
+                questions = parse_questions(job.raw_output or "")
+                material.set_questions(questions)
+                _advance(job, 'parsed', 90)
+
+            # 顺带把全文解析存档并建立分块检索索引，学生之后问答/总结直接读取
+            full_text, _ = load_extracted_text(material.filepath, material.content_hash)
+            if full_text:
+                build_chunk_index(material.content_hash, full_text)
+
+            job.status = 'done'
+            job.progress = 100
+            job.lease_expires_at = None
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            traceback.print_exc()
+            job = db.session.get(MaterialJob, job_id)
+            job.status = 'failed'
+            # 熔断中：请求没有发出，提示稍后重试，而不是当作空题库完成
+            job.error = f"AI 服务暂时不可用，请稍后重试（{e.detail}）" if isinstance(e, AIDegraded) else str(e)[:500]
+            job.lease_expires_at = None
+            db.session.commit()
+
+
+class _Lease:
+    """
+    任务执行期间在后台线程里定期续租（每 1/3 个租期一次）。
+    AI 出题可能持续好几分钟，不能只靠阶段提交时更新；进程退出后不再续租，租约过期后由巡检重新入队
+    """
+
+    def __init__(self, app, job_id, seconds):
+        self.app = app
+        self.job_id = job_id
+        self.seconds = seconds
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, name=f"material-job-lease-{self.job_id}", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+    def _run(self):
+        while not self._stop.wait(self.seconds / 3):
+            with self.app.app_context():
+                try:
+                    MaterialJob.query.filter_by(id=self.job_id, status='running') \
+                        .update({"lease_expires_at": datetime.utcnow() + timedelta(seconds=self.seconds)},
+                                synchronize_session=False)
+                    db.session.commit()
+                except SQLAlchemyError:
+                    # 这次没续上，下一轮再试；一直失败时租约过期，任务会被重新执行
+                    db.session.rollback()
+
+
+def _stream_questions(job, content):
+    """
+    流式出题：每解析出一道完整的题就把已收到的文本写回任务，进度页可以先显示已生成的题目
+    """
+    raw_text = ""
+    parser = QuestionStreamParser()
+    try:
+        for delta in stream_questions_with_ai(content):
+            raw_text += delta
+            if parser.feed(delta):
+                job.raw_output = raw_text
+                job.progress = min(65, 25 + 8 * len(parser.questions))
+                db.session.commit()
+    except AIDegraded:
+        # 熔断中：任务标记失败，不把空题库当作出题结果保存
+        raise
+    except LLMError as e:
+        return f"❌ OpenRouter 调用失败：{e.status} - {e.detail}"
+    return raw_text
+
+
+def _generate_map_reduce(job, material, head):
+    """
+    分段出题：开头一段先流式出题（进度页马上能看到题目），同时在后台线程解析全文并存档；
+    全文不止一段时，其余各段再并发出题，与第一段的题目合并
+    """
+    parsing = _parse_pool.submit(load_extracted_text, material.filepath, material.content_hash)
+    first = _stream_questions(job, head)
+    content, _ = parsing.result()
+    if not content or len(content) <= QUESTION_CONTEXT_CHARS:
+        return first
+    return generate_questions_map_reduce(content, on_section=_section_preview(job), first_section=first)
+
+
+def _section_preview(job):
+    """
+    分段出题时每完成一段，把已合并出的题目写回任务，进度页先行展示
+    """
+    def on_section(raw_text, done, total):
+        if raw_text:
+            job.raw_output = raw_text + "\n"  # 补上换行，最后一道题的答案行才算收完整
+        job.progress = min(65, 25 + 40 * done // total)
+        db.session.commit()
+    return on_section
+
+
+def _advance(job, stage, progress):
+    job.stage = stage
+    job.progress = progress
+    db.session.commit()
+
+
+class JobQueue:
+    """
+    进程内的有界任务队列 + worker 线程池。
+    任务状态持久化在 material_job 表，队列里只放任务 id
+    """
+
+    def __init__(self):
+        self.app = None
+        self._queue = None
+        self._started = False
+        self._lock = threading.Lock()
+        self._pending = set()  # 已放进本进程队列、还没被 worker 取走的任务 id
+        self._workers = []
+        self._sweeper_thread = None
+        self._stopping = threading.Event()
+
+    def init_app(self, app):
+        self.app = app
+        self._queue = queue.Queue(maxsize=app.config.get('JOB_QUEUE_SIZE', 20))
+
+        # worker 在第一个请求到来时才启动，避免 flask db 等命令行操作也去跑任务
+        @app.before_request
+        def _start_job_workers():
+            if not self._started:
+                self.start()
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            self._workers = [threading.Thread(target=self._worker, name=f"material-job-{i}", daemon=True)
+                             for i in range(self.app.config.get('JOB_WORKERS', 2))]
+            # 启动时先巡检一次（恢复重启前未完成的任务），之后定期巡检
+            self._sweeper_thread = threading.Thread(target=self._sweeper, name="material-job-sweeper", daemon=True)
+            for thread in self._workers + [self._sweeper_thread]:
+                thread.start()
+
+    def stop(self, timeout=60):
+        """
+        停止 worker 和巡检线程：还在队列里的任务留在 queued 状态（下次启动时由巡检恢复），
+        正在执行的任务做完当前这个再退出。删除数据库之前（如压测结束清理临时库）先调用，
+        否则后台线程还会往已删除的库里写。返回是否在 timeout 秒内全部退出；停止后不会再启动
+        """
+        with self._lock:
+            if not self._started or self._stopping.is_set():
+                return True
+            self._stopping.set()
+            while True:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                self._queue.task_done()
+            self._pending.clear()
+        for _ in self._workers:
+            self._queue.put(None)  # 每个 worker 一个结束标记
+
+        threads = self._workers + [self._sweeper_thread]
+        deadline = time.monotonic() + timeout
+        for thread in threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        stopped = not any(thread.is_alive() for thread in threads)
+        if not stopped:
+            print("[DEBUG] 上传任务线程未能在时限内退出")
+        return stopped
+
+    def has_capacity(self):
+        return not self._queue.full()
+
+    def qsize(self):
+        return self._queue.qsize()
+
+    def submit(self, job_id):
+        with self._lock:
+            if self._stopping.is_set():
+                raise QueueFull()
+            try:
+                self._queue.put_nowait(job_id)
+            except queue.Full:
+                raise QueueFull()
+            self._pending.add(job_id)
+
+    def enqueue_material(self, material):
+        """
+        为新上传的资料创建处理任务并入队，返回 MaterialJob；队列已满时抛出 QueueFull
+        """
+        job = MaterialJob(material=material, status='queued', stage='saved', progress=5)
+        db.session.add(material)
+        db.session.add(job)
+        db.session.commit()
+        try:
+            self.submit(job.id)
+        except QueueFull:
+            job.status = 'failed'
+            job.error = '系统繁忙，任务队列已满'
+            db.session.commit()
+            raise
+        return job
+
+    def sweep(self):
+        """
+        把该执行的任务放回队列：租约已过期的处理中任务（执行它的 worker 已经不在了）改回排队，
+        再把不在本进程队列里的排队任务（重启前入队的、当时队列已满的）入队。
+        多个进程同时巡检时同一任务可能被各自入队，认领是原子的，只会执行一次
+        """
+        now = datetime.utcnow()
+        with self.app.app_context():
+            try:
+                MaterialJob.query.filter(MaterialJob.status == 'running',
+                                         or_(MaterialJob.lease_expires_at.is_(None),
+                                             MaterialJob.lease_expires_at < now)) \
+                    .update({"status": "queued", "lease_expires_at": None}, synchronize_session=False)
+                db.session.commit()
+                job_ids = [job_id for (job_id,) in db.session.query(MaterialJob.id)
+                           .filter(MaterialJob.status == 'queued').order_by(MaterialJob.id)]
+            except SQLAlchemyError:
+                # 表还没建（尚未执行迁移）时跳过
+                db.session.rollback()
+                return
+
+        for job_id in job_ids:
+            if job_id in self._pending:
+                continue
+            try:
+                self.submit(job_id)
+            except QueueFull:
+                # 放不下的留在 queued 状态，下次巡检再入队
+                break
+
+    def _sweeper(self):
+        while not self._stopping.is_set():
+            try:
+                self.sweep()
+            except Exception:
+                traceback.print_exc()
+            self._stopping.wait(self.app.config.get('JOB_SWEEP_SECONDS', 30))
+
+    def _worker(self):
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                self._queue.task_done()
+                return
+            with self._lock:
+                self._pending.discard(job_id)
+            try:
+                with self.app.app_context():
+                    run_material_job(job_id)
+            except Exception:
+                traceback.print_exc()
+            finally:
+                self._queue.task_done()
+
+
+job_queue = JobQueue()
@@ -0,0 +1,156 @@
+import os
+import threading
+import time
+from collections import deque
+
+# OpenRouter 熔断 + 自适应并发：
+# - 最近一段时间内失败（含过慢）的比例超过阈值就熔断，熔断期间直接失败不再发请求，
+#   冷却后放一个试探请求，成功才恢复
+# - 同时在途的请求数按 AIMD 调整：延迟正常时每轮加 1，出错或变慢时减半
+
+FAILURE_RATE = float(os.getenv("AI_BREAKER_FAILURE_RATE", 0.5))
+MIN_CALLS = int(os.getenv("AI_BREAKER_MIN_CALLS", 5))        # 窗口内至少这么多次调用才判断失败率
+WINDOW_SECONDS = 60
+OPEN_SECONDS = float(os.getenv("AI_BREAKER_OPEN_SECONDS", 30))  # 熔断后多久放试探请求
+SLOW_CALL_SECONDS = float(os.getenv("AI_BREAKER_SLOW_SECONDS", 30))  # 超过这个耗时按失败计
+
+TARGET_LATENCY = float(os.getenv("AI_TARGET_LATENCY", 10))  # 低于该延迟时逐步放开并发
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", os.getenv("AI_POOL_SIZE", 16)))
+INITIAL_CONCURRENCY = 4
+CONCURRENCY_WAIT = 10  # 等待并发名额的最长时间（秒），超时按降级处理
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class BreakerRejected(Exception):
+    """熔断中或并发名额已满，请求没有发出"""
+
+
+class _Call:
+    """
+    一次已放行的调用：record() 记录结果和延迟，release() 归还并发名额，都只生效一次
+    """
+
+    def __init__(self, breaker, probe):
+        self.breaker = breaker
+        self.probe = probe
+        self.started = time.monotonic()
+        self._recorded = False
+        self._released = False
+
+    def record(self, ok):
+        if not self._recorded:
+            self._recorded = True
+            self.breaker._record(self, ok, time.monotonic() - self.started)
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.breaker._release()
+
+    def finish(self, ok):
+        self.record(ok)
+        self.release()
+
+
+class CircuitBreaker:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._outcomes = deque()  # (时间, 是否成功)
+        self.limit = float(INITIAL_CONCURRENCY)
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._rejected = 0
+        self._opened = 0
+
+    def before_call(self):
+        """
+        申请一次调用，返回 _Call；熔断中或等不到并发名额时抛出 BreakerRejected
+        """
+        with self._cond:
+            probe = False
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < OPEN_SECONDS:
+                    self._rejected += 1
+                    raise BreakerRejected("AI 服务暂时不可用（熔断中）")
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN:
+                if self._probing:
+                    self._rejected += 1
+                    raise BreakerRejected("AI 服务暂时不可用（正在试探恢复）")
+                self._probing = probe = True
+
+            deadline = time.monotonic() + CONCURRENCY_WAIT
+            while self.in_flight >= int(self.limit):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    if probe:
+                        self._probing = False
+                    self._rejected += 1
+                    raise BreakerRejected("AI 服务繁忙（并发已满）")
+                self._cond.wait(timeout=remaining)
+            self.in_flight += 1
+            return _Call(self, probe)
+
+    def stats(self):
+        with self._cond:
+            self._trim(time.monotonic())
+            failures = sum(1 for _, ok in self._outcomes if not ok)
+            return {
+                "state": self.state,
+                "concurrency_limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "window_calls": len(self._outcomes),
+                "window_failures": failures,
+                "rejected": self._rejected,
+                "opened": self._opened,
+            }
+
+    def _record(self, call, ok, latency):
+        now = time.monotonic()
+        success = ok and latency <= SLOW_CALL_SECONDS
+        with self._cond:
+            # AIMD：延迟正常则每个“往返”加 1，出错或超过目标延迟则减半（一个往返内只减一次）
+            if ok and latency <= TARGET_LATENCY:
+                self.limit = min(MAX_CONCURRENCY, self.limit + 1.0 / self.limit)
+            elif now - self._last_decrease >= latency:
+                self.limit = max(float(MIN_CONCURRENCY), self.limit / 2)
+                self._last_decrease = now
+
+            if call.probe:
+                self._probing = False
+                if success:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._open(now)
+            elif self.state == CLOSED:
+                self._outcomes.append((now, success))
+                self._trim(now)
+                failures = sum(1 for _, passed in self._outcomes if not passed)
+                if len(self._outcomes) >= MIN_CALLS and failures / len(self._outcomes) >= FAILURE_RATE:
+                    self._open(now)
+            self._cond.notify_all()
+
+    def _release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def _open(self, now):
+        print("[DEBUG] AI circuit breaker opened")
+        self.state = OPEN
+        self._opened_at = now
+        self._opened += 1
+        self._outcomes.clear()
+
+    def _trim(self, now):
+        while self._outcomes and now - self._outcomes[0][0] > WINDOW_SECONDS:
+            self._outcomes.popleft()
+
+
+breaker = CircuitBreaker()
@@ -0,0 +1,134 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+# AI 回复缓存：以 model + prompt 的哈希为键存在本地 SQLite，
+# 按命名空间（调用函数名）设置 TTL，超出容量时按最近访问时间淘汰（LRU）
+
+CACHE_PATH = os.getenv("AI_CACHE_PATH", os.path.join(os.getcwd(), "cache", "llm_cache.sqlite3"))
+CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", 5000))
+CACHE_ENABLED = os.getenv("AI_CACHE_ENABLED", "1") != "0"
+
+
+def cache_key(model, prompt):
+    return hashlib.sha256(f"{model}\0{prompt}".encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    def __init__(self, path=CACHE_PATH, max_entries=CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._hits = defaultdict(int)
+        self._misses = defaultdict(int)
+        self._ready = False
+
+    def _connect(self):
+        if not self._ready:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5)
+        if not self._ready:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    namespace TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_last_access ON llm_cache (last_access)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_namespace ON llm_cache (namespace)")
+            conn.commit()
+            self._ready = True
+        return conn
+
+    def get(self, key, namespace="default"):
+        now = time.time()
+        try:
+            conn = self._connect()
+        except sqlite3.Error:
+            # 缓存不可用时按未命中处理，不影响正常调用
+            self._count(self._misses, namespace)
+            return None
+        try:
+            row = conn.execute("SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row and row[1] > now:
+                conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+                conn.commit()
+                self._count(self._hits, namespace)
+                return row[0]
+            if row:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                conn.commit()
+        except sqlite3.Error:
+            pass
+        finally:
+            conn.close()
+        self._count(self._misses, namespace)
+        return None
+
+    def set(self, key, value, ttl, namespace="default"):
+        now = time.time()
+        try:
+            conn = self._connect()
+        except sqlite3.Error:
+            return
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, namespace, value, expires_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, namespace, value, now + ttl, now)
+            )
+            # 超出容量时淘汰最久未访问的条目
+            conn.execute(
+                "DELETE FROM llm_cache WHERE key IN "
+                "(SELECT key FROM llm_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            conn.commit()
+        except sqlite3.Error:
+            pass
+        finally:
+            conn.close()
+
+    def invalidate(self, key=None, namespace=None):
+        """
+        删除指定 key、某个命名空间下的全部条目，或（都不传时）清空缓存；
+        缓存文件不可用（被锁、损坏）时与 get / set 一样忽略，不影响调用方
+        """
+        try:
+            conn = self._connect()
+        except sqlite3.Error as e:
+            print(f"[DEBUG] AI 缓存失效失败：{e}")
+            return
+        try:
+            if key is not None:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            elif namespace is not None:
+                conn.execute("DELETE FROM llm_cache WHERE namespace = ?", (namespace,))
+            else:
+                conn.execute("DELETE FROM llm_cache")
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"[DEBUG] AI 缓存失效失败：{e}")
+        finally:
+            conn.close()
+
+    def stats(self):
+        with self._lock:
+            namespaces = set(self._hits) | set(self._misses)
+            return {
+                ns: {"hits": self._hits[ns], "misses": self._misses[ns]}
+                for ns in sorted(namespaces)
+            }
+
+    def _count(self, counter, namespace):
+        with self._lock:
+            counter[namespace] += 1
+
+
+llm_cache = LLMCache()
@@ -0,0 +1,286 @@
+import json
+import math
+import os
+import random
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+from app.utils.llm_cache import llm_cache, cache_key, CACHE_ENABLED
+from app.utils.llm_scheduler import scheduler, estimate_tokens, current_requester, RateLimited, BACKGROUND
+from app.utils.llm_scheduler import CHARS_PER_TOKEN
+from app.utils.llm_breaker import breaker, BreakerRejected
+from app.utils.single_flight import single_flight
+
+load_dotenv()
+
+API_KEY = os.getenv("OPENROUTER_API_KEY")
+# 压测 / 离线开发时可指向本地的 benchmarks/fake_openrouter.py
+API_URL = os.getenv("OPENROUTER_API_URL", "https://openrouter.ai/api/v1/chat/completions")
+MODEL = "mistralai/mixtral-8x7b-instruct"  # 免费、效果强
+
+# (连接超时, 读取超时)，单位秒
+REQUEST_TIMEOUT = (
+    float(os.getenv("AI_CONNECT_TIMEOUT", 5)),
+    float(os.getenv("AI_READ_TIMEOUT", 60)),
+)
+MAX_RETRIES = int(os.getenv("AI_MAX_RETRIES", 2))
+RETRY_BACKOFF = 0.5  # 首次重试的基准等待时间（秒），之后指数增长
+RETRY_STATUS = {429, 500, 502, 503, 504}
+POOL_SIZE = int(os.getenv("AI_POOL_SIZE", 16))
+
+print("[DEBUG] OpenRouter KEY:", API_KEY[:10] if API_KEY else "", "..." if API_KEY else "❌ 没加载成功")
+
+
+class LLMError(Exception):
+    """
+    AI 调用失败。status 为 HTTP 状态码，网络错误或返回格式异常时为 None
+    """
+
+    def __init__(self, status=None, detail=""):
+        super().__init__(f"{status} - {detail}")
+        self.status = status
+        self.detail = detail
+
+
+class AIDegraded(LLMError):
+    """
+    熔断中或并发已满，请求没有发出。调用方应走降级逻辑，稍后再试
+    """
+
+    def __init__(self, detail=""):
+        super().__init__(503, detail)
+
+
+def _build_session():
+    # 全局共享一个 Session，复用 TCP/TLS 连接（keep-alive）
+    session = requests.Session()
+    session.headers.update({
+        "Authorization": f"Bearer {API_KEY}",
+        "Content-Type": "application/json"
+    })
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_session = _build_session()
+
+
+def _retry_delay(attempt, retry_after=None):
+    # 优先遵守服务端的 Retry-After，否则指数退避 + 全抖动
+    if retry_after:
+        try:
+            return min(float(retry_after), 30.0)
+        except ValueError:
+            pass
+    return random.uniform(0, RETRY_BACKOFF * (2 ** attempt))
+
+
+def parse_completion(data):
+    """
+    统一解析 chat/completions 的返回，取出第一条回复文本
+    """
+    try:
+        return data["choices"][0]["message"]["content"]
+    except (KeyError, IndexError, TypeError):
+        raise LLMError(None, f"返回格式异常：{str(data)[:200]}")
+
+
+def chat_completion(prompt, model=MODEL, timeout=REQUEST_TIMEOUT,
+                    cache_ttl=None, namespace="default", use_cache=True,
+                    priority=BACKGROUND, user=None):
+    """
+    发送一条 user 消息并返回模型回复文本。
+    429/5xx 和网络错误会带抖动重试，最终失败抛出 LLMError。
+    传入 cache_ttl（秒）时结果写入本地缓存；use_cache=False 跳过读缓存并用新结果覆盖。
+    未命中缓存的请求先经 llm_scheduler 按 priority / user 排队限流；
+    相同 prompt 的并发调用只发一次请求（进程内合并，启用缓存时跨进程也合并）
+    """
+    caching = CACHE_ENABLED and cache_ttl
+    key = cache_key(model, prompt)
+    if caching and use_cache:
+        cached = llm_cache.get(key, namespace)
+        if cached is not None:
+            return cached
+
+    user = user or current_requester()
+
+    def request():
+        content = _request_completion(prompt, model, timeout, priority, user)
+        if caching:
+            llm_cache.set(key, content, cache_ttl, namespace)
+        return content
+
+    return single_flight.do(f"llm:{key}", request,
+                            recheck=(lambda: llm_cache.get(key, namespace)) if caching else None,
+                            cross_process=bool(caching))
+
+
+def invalidate_cached(prompt=None, namespace=None, model=MODEL):
+    """
+    失效某条 prompt 的缓存，或某个命名空间（函数名）下的全部缓存
+    """
+    if prompt is not None:
+        llm_cache.invalidate(key=cache_key(model, prompt))
+    else:
+        llm_cache.invalidate(namespace=namespace)
+
+
+def _payload(prompt, model, stream=False):
+    payload = {
+        "model": model,
+        "messages": [
+            {"role": "user", "content": prompt}
+        ]
+    }
+    if stream:
+        payload["stream"] = True
+    return payload
+
+
+def _post_with_retry(payload, timeout, priority, user, stream=False):
+    """
+    发送请求，429/5xx 和网络错误带抖动重试，返回 (状态码 200 的 response, 预留的 token 数, 熔断器调用记录)。
+    每次尝试（包括重试）都要先从调度器取得额度、再经熔断器放行；
+    熔断中直接抛出 AIDegraded，不再发请求。
+    没有拿到 200 的尝试都在这里退还预留的额度；返回后由调用方负责 settle
+    """
+    tokens = estimate_tokens(payload["messages"][-1]["content"])
+    for attempt in range(MAX_RETRIES + 1):
+        last_try = attempt == MAX_RETRIES
+        try:
+            reserved = scheduler.acquire(priority, user, tokens)
+        except RateLimited as e:
+            raise LLMError(429, str(e))
+        sent = handed_off = False
+        try:
+            try:
+                call = breaker.before_call()
+            except BreakerRejected as e:
+                raise AIDegraded(str(e))
+            sent = True
+            try:
+                response = _session.post(API_URL, json=payload, timeout=timeout, stream=stream)
+            except requests.RequestException as e:
+                call.finish(False)
+                if last_try:
+                    raise LLMError(None, str(e))
+                time.sleep(_retry_delay(attempt))
+                continue
+
+            print("[DEBUG] Response status:", response.status_code)
+
+            if response.status_code == 200:
+                handed_off = True
+                return response, reserved, call
+
+            # 429/5xx 说明服务端有问题，计入失败率；其他 4xx 是请求本身的问题
+            call.finish(response.status_code not in RETRY_STATUS)
+            if response.status_code in RETRY_STATUS and not last_try:
+                response.close()
+                time.sleep(_retry_delay(attempt, response.headers.get("Retry-After")))
+                continue
+
+            raise LLMError(response.status_code, response.text)
+        finally:
+            if not handed_off:
+                scheduler.refund(reserved, sent=sent)
+
+
+def _used_tokens(prompt, completion, usage=None):
+    """
+    实际用量：优先用返回的 usage，没有时按 prompt 和已收到的回复长度估算
+    """
+    total = usage.get("total_tokens") if isinstance(usage, dict) else None
+    if total is not None:
+        return total
+    return math.ceil((len(prompt) + len(completion)) / CHARS_PER_TOKEN)
+
+
+def _request_completion(prompt, model, timeout, priority, user):
+    response, reserved, call = _post_with_retry(_payload(prompt, model), timeout, priority, user)
+    data = None
+    content = ""
+    try:
+        try:
+            data = response.json()
+        except (ValueError, requests.RequestException):
+            call.finish(False)
+            raise LLMError(None, response.text[:200])
+        call.finish(True)
+        content = parse_completion(data)
+        return content
+    finally:
+        # 已收到 200：无论解析是否成功都按实际（或估算的）用量结算预留的额度
+        usage = data.get("usage") if isinstance(data, dict) else None
+        scheduler.settle(reserved, _used_tokens(prompt, content, usage))
+
+
+def stream_chat_completion(prompt, model=MODEL, timeout=REQUEST_TIMEOUT,
+                           cache_ttl=None, namespace="default", use_cache=True,
+                           priority=BACKGROUND, user=None):
+    """
+    流式调用，返回逐段产出模型回复文本（SSE 的 delta.content）的迭代器。
+    只在收到第一个字节之前重试；命中缓存时一次性产出缓存内容；
+    完整收到后把全文写入缓存，之后普通调用也能直接命中。
+    相同 prompt 的并发流式调用共享同一个上游请求
+    """
+    caching = CACHE_ENABLED and cache_ttl
+    key = cache_key(model, prompt)
+    if caching and use_cache:
+        cached = llm_cache.get(key, namespace)
+        if cached is not None:
+            return iter([cached])
+
+    user = user or current_requester()
+    return single_flight.stream(
+        f"llm:{key}",
+        lambda: _stream_completion(prompt, model, timeout, priority, user,
+                                   key if caching else None, cache_ttl, namespace),
+        recheck=(lambda: llm_cache.get(key, namespace)) if caching else None,
+        cross_process=bool(caching)
+    )
+
+
+def _stream_completion(prompt, model, timeout, priority, user, key, cache_ttl, namespace):
+    response, reserved, call = _post_with_retry(_payload(prompt, model, stream=True), timeout,
+                                                priority, user, stream=True)
+    # 流式调用的延迟按首字节计，并发名额一直占到流结束
+    call.record(True)
+    parts = []
+    usage = None
+    finished = False
+    try:
+        for line in response.iter_lines(decode_unicode=True):
+            # 空行是事件分隔，":" 开头的是服务端心跳注释
+            if not line or line.startswith(":") or not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                finished = True
+                break
+            try:
+                chunk = json.loads(data)
+            except ValueError:
+                continue
+            if "error" in chunk:
+                raise LLMError(None, str(chunk["error"])[:200])
+            usage = chunk.get("usage") or usage  # 最后一个片段可能带 usage
+            delta = (chunk.get("choices") or [{}])[0].get("delta", {}).get("content")
+            if delta:
+                parts.append(delta)
+                yield delta
+    except requests.RequestException as e:
+        raise LLMError(None, str(e))
+    finally:
+        response.close()
+        call.release()
+        # 流正常结束、出错或被调用方提前关闭，都按已收到的内容结算预留的额度
+        scheduler.settle(reserved, _used_tokens(prompt, "".join(parts), usage))
+
+    if key and finished:
+        llm_cache.set(key, "".join(parts), cache_ttl, namespace)
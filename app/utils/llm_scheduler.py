@@ -0,0 +1,249 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+# AI 调用的本地调度：所有请求共用一个 OpenRouter key，发出前先在这里排队。
+# 按每分钟请求数 / 每分钟 token 数做令牌桶限流；桶里不够时按优先级放行，
+# 同一优先级内按用户轮转，避免某个用户（或一批上传）占满额度
+
+REQUESTS_PER_MINUTE = int(os.getenv("AI_RATE_REQUESTS_PER_MINUTE", 60))   # 0 表示不限
+TOKENS_PER_MINUTE = int(os.getenv("AI_RATE_TOKENS_PER_MINUTE", 100000))   # 0 表示不限
+CHARS_PER_TOKEN = 2           # 中英混合文本的粗略估算
+EXPECTED_COMPLETION_TOKENS = 500  # 发出前按这个数预留回复的 token，收到 usage 后再多退少补
+
+# 优先级：数字越小越先放行
+INTERACTIVE = 0   # 学生在线等待的问答 / 总结
+GRADING = 1       # 提交答卷后的批改
+BACKGROUND = 2    # 后台出题、学习路径和教师报告
+PRIORITY_NAMES = {INTERACTIVE: "interactive", GRADING: "grading", BACKGROUND: "background"}
+
+# 各优先级最长排队时间（秒），超时抛出 RateLimited；None 表示一直等
+MAX_WAIT = {
+    INTERACTIVE: float(os.getenv("AI_MAX_WAIT_INTERACTIVE", 30)),
+    GRADING: float(os.getenv("AI_MAX_WAIT_GRADING", 60)),
+    BACKGROUND: None,
+}
+
+SYSTEM_USER = "system"
+
+
+class RateLimited(Exception):
+    """本地排队超时，请求没有发出"""
+
+
+def estimate_tokens(prompt):
+    return math.ceil(len(prompt) / CHARS_PER_TOKEN) + EXPECTED_COMPLETION_TOKENS
+
+
+class TokenBucket:
+    """
+    每分钟补充 per_minute 个令牌，最多攒一分钟的量。per_minute 为 0 时不限流
+    """
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """
+        取出 amount 个令牌还需等待的秒数，0 表示现在就够
+        """
+        if not self.capacity:
+            return 0.0
+        self._refill()
+        amount = min(amount, self.capacity)  # 单次超过桶容量的请求等桶满即可放行
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount):
+        if self.capacity:
+            self.tokens -= min(amount, self.capacity)
+
+    def give_back(self, amount):
+        """
+        按实际用量修正：amount 为正表示退还多预留的，为负表示补扣
+        """
+        if self.capacity:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class _Waiter:
+    __slots__ = ("priority", "user", "tokens", "enqueued")
+
+    def __init__(self, priority, user, tokens):
+        self.priority = priority
+        self.user = user
+        self.tokens = tokens
+        self.enqueued = time.monotonic()
+
+
+class LLMScheduler:
+    def __init__(self, requests_per_minute=REQUESTS_PER_MINUTE, tokens_per_minute=TOKENS_PER_MINUTE):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self._cond = threading.Condition()
+        # 每个优先级一个按用户轮转的队列：user -> 该用户排队中的请求
+        self._queues = {p: OrderedDict() for p in PRIORITY_NAMES}
+        self._depth = {p: 0 for p in PRIORITY_NAMES}
+        self._max_depth = {p: 0 for p in PRIORITY_NAMES}
+        self._granted = {p: 0 for p in PRIORITY_NAMES}
+        self._timed_out = {p: 0 for p in PRIORITY_NAMES}
+        self._wait_total = {p: 0.0 for p in PRIORITY_NAMES}
+        self._wait_max = {p: 0.0 for p in PRIORITY_NAMES}
+
+    def acquire(self, priority=BACKGROUND, user=None, tokens=0):
+        """
+        排队直到限流额度允许且轮到本请求，返回实际预留的 token 数（用于之后 settle）。
+        超过该优先级的最长排队时间抛出 RateLimited
+        """
+        waiter = _Waiter(priority, user or SYSTEM_USER, tokens)
+        max_wait = MAX_WAIT.get(priority)
+        with self._cond:
+            self._enqueue(waiter)
+            try:
+                while True:
+                    delay = 1.0
+                    if self._head() is waiter:
+                        delay = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+                        if delay == 0:
+                            self.requests.take(1)
+                            self.tokens.take(tokens)
+                            self._record_grant(waiter)
+                            return tokens
+                    waited = time.monotonic() - waiter.enqueued
+                    if max_wait is not None:
+                        if waited >= max_wait:
+                            self._timed_out[priority] += 1
+                            raise RateLimited(f"AI 请求排队超过 {max_wait:.0f} 秒")
+                        delay = min(delay, max_wait - waited)
+                    self._cond.wait(timeout=delay)
+            finally:
+                self._dequeue(waiter)
+                self._cond.notify_all()
+
+    def settle(self, reserved, used):
+        """
+        收到回复后按实际 token 用量修正令牌桶
+        """
+        if used is None:
+            return
+        with self._cond:
+            self.tokens.give_back(reserved - used)
+            self._cond.notify_all()
+
+    def refund(self, reserved, sent=True):
+        """
+        请求失败（或将要重试）时退还预留的 token；请求根本没发出（如熔断）时连请求次数一起退还
+        """
+        with self._cond:
+            self.tokens.give_back(reserved)
+            if not sent:
+                self.requests.give_back(1)
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                name: {
+                    "queued": self._depth[p],
+                    "max_queued": self._max_depth[p],
+                    "users_queued": len(self._queues[p]),
+                    "granted": self._granted[p],
+                    "timed_out": self._timed_out[p],
+                    "avg_wait_ms": round(self._wait_total[p] / self._granted[p] * 1000, 1) if self._granted[p] else 0.0,
+                    "max_wait_ms": round(self._wait_max[p] * 1000, 1),
+                }
+                for p, name in PRIORITY_NAMES.items()
+            }
+
+    def _enqueue(self, waiter):
+        self._queues[waiter.priority].setdefault(waiter.user, deque()).append(waiter)
+        self._depth[waiter.priority] += 1
+        self._max_depth[waiter.priority] = max(self._max_depth[waiter.priority], self._depth[waiter.priority])
+
+    def _dequeue(self, waiter):
+        users = self._queues[waiter.priority]
+        pending = users.get(waiter.user)
+        if not pending or waiter not in pending:
+            return
+        was_first = pending[0] is waiter
+        pending.remove(waiter)
+        self._depth[waiter.priority] -= 1
+        if not pending:
+            del users[waiter.user]
+        elif was_first:
+            # 该用户刚放行了一个请求，排到本优先级的队尾，让其他用户先走
+            users.move_to_end(waiter.user)
+
+    def _head(self):
+        """
+        下一个该放行的请求：最高优先级里，轮转顺序排第一的用户最早的请求
+        """
+        for p in sorted(self._queues):
+            users = self._queues[p]
+            if users:
+                return next(iter(users.values()))[0]
+        return None
+
+    def _record_grant(self, waiter):
+        waited = time.monotonic() - waiter.enqueued
+        self._granted[waiter.priority] += 1
+        self._wait_total[waiter.priority] += waited
+        self._wait_max[waiter.priority] = max(self._wait_max[waiter.priority], waited)
+
+
+scheduler = LLMScheduler()
+
+_local = threading.local()
+
+
+def current_requester():
+    """
+    当前 AI 请求归属的用户：请求上下文里取登录用户，
+    后台线程取 on_behalf_of 绑定的用户，都没有时为 system
+    """
+    bound = getattr(_local, "user", None)
+    if bound:
+        return bound
+    try:
+        from flask import has_request_context
+        from flask_login import current_user
+        if has_request_context() and current_user.is_authenticated:
+            return f"user:{current_user.id}"
+    except ImportError:
+        pass
+    return SYSTEM_USER
+
+
+@contextmanager
+def on_behalf_of(user):
+    previous = getattr(_local, "user", None)
+    _local.user = user
+    try:
+        yield
+    finally:
+        _local.user = previous
+
+
+def bound_to_requester(fn):
+    """
+    线程池里的任务拿不到请求上下文，提交前用它包一层，沿用提交者的用户身份
+    """
+    user = current_requester()
+
+    def run(*args, **kwargs):
+        with on_behalf_of(user):
+            return fn(*args, **kwargs)
+    return run
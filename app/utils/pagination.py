@@ -0,0 +1,100 @@
+import base64
+import json
+import os
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+# 列表页的游标（keyset）分页：按 (时间, id) 倒序，下一页从上一页最后一行之后接着取，
+# 用 WHERE 条件定位而不是 OFFSET，翻到多深都只读一页的行
+
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", 50))
+MAX_PAGE_SIZE = 500
+
+
+class Page:
+    def __init__(self, items, next_cursor, per_page):
+        self.items = items
+        self.next_cursor = next_cursor  # 没有下一页时为 None
+        self.per_page = per_page
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def encode_cursor(sort_value, row_id):
+    payload = json.dumps([sort_value.isoformat() if sort_value is not None else None, row_id])
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    返回 (时间, id)；游标无效时返回 None（从第一页开始）
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+        return (datetime.fromisoformat(sort_value) if sort_value is not None else None), int(row_id)
+    except (ValueError, TypeError):
+        return None
+
+
+def page_size(value):
+    try:
+        return max(1, min(int(value), MAX_PAGE_SIZE))
+    except (TypeError, ValueError):
+        return PAGE_SIZE
+
+
+def _null_rows(query, sort_column, id_column, before_id, limit):
+    """
+    sort_column 为空值的行，按 id 倒序，从 before_id 之前开始（为 None 时从头开始）
+    """
+    query = query.filter(sort_column.is_(None))
+    if before_id is not None:
+        query = query.filter(id_column < before_id)
+    return query.order_by(id_column.desc()).limit(limit)
+
+
+def keyset_query(query, sort_column, id_column, cursor=None, per_page=None):
+    """
+    keyset_page 执行的查询（多取一行用来判断有没有下一页），只构造不执行；
+    `flask perf explain` 和执行计划测试用它检查分页查询是否走索引
+    """
+    per_page = per_page or PAGE_SIZE
+    position = decode_cursor(cursor) if cursor else None
+    if position is not None:
+        sort_value, row_id = position
+        if sort_value is None:
+            return _null_rows(query, sort_column, id_column, row_id, per_page + 1)
+        # 直接比较列本身（不套函数、不带 OR 空值），在 (过滤列, 时间) 索引上定位到游标处开始读。
+        # sqlite 按字符串存时间，要求各行与绑定参数格式一致（都带微秒，见 CourseMaterial.stored_now）
+        query = query.filter(sort_column <= sort_value,
+                             or_(sort_column < sort_value, id_column < row_id))
+    return query.order_by(sort_column.desc(), id_column.desc()).limit(per_page + 1)
+
+
+def keyset_page(query, sort_column, id_column, cursor=None, per_page=None, key=None):
+    """
+    取一页：按 sort_column、id_column 倒序，从 cursor 之后开始。
+    sort_column 为空值的行排在最后（与 MySQL / sqlite 倒序时 NULL 在后一致）：
+    时间非空的行取完、这一页还没取满时，再查一次空值的行补上
+    key 从结果行取 (时间, id) 用于生成下一页游标，默认取行上同名的属性
+    """
+    per_page = per_page or PAGE_SIZE
+    rows = keyset_query(query, sort_column, id_column, cursor, per_page).all()
+    position = decode_cursor(cursor) if cursor else None
+    if len(rows) <= per_page and position is not None and position[0] is not None:
+        rows += _null_rows(query, sort_column, id_column, None, per_page + 1 - len(rows)).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        if key is None:
+            sort_value, row_id = getattr(last, sort_column.key), getattr(last, id_column.key)
+        else:
+            sort_value, row_id = key(last)
+        next_cursor = encode_cursor(sort_value, row_id)
+    return Page(rows, next_cursor, per_page)
@@ -0,0 +1,67 @@
+import time
+
+from flask import g, has_app_context, current_app, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# 统计每个请求执行的 SQL 条数和耗时，通过响应头返回：
+#   X-DB-Queries / X-DB-Time-ms，以及浏览器开发者工具能直接显示的 Server-Timing
+# 路由可用 @query_budget(n) 声明 SQL 条数上限（含加载登录用户的一条），超出时打印警告；
+# tests/test_query_budget.py 逐个请求带上限的路由检查，N+1 回归在测试里失败
+
+
+def query_budget(limit):
+    """
+    路由装饰器（写在 @route 的下一行）：本路由每个请求最多执行 limit 条 SQL
+    """
+    def decorator(f):
+        f.query_budget = limit
+        return f
+    return decorator
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context():
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("query_started")
+    if not has_app_context() or not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    g.db_queries = g.get("db_queries", 0) + 1
+    g.db_seconds = g.get("db_seconds", 0.0) + elapsed
+
+
+def query_cost():
+    """
+    当前请求（应用上下文）到目前为止的 (SQL 条数, 总耗时秒)
+    """
+    return g.get("db_queries", 0), g.get("db_seconds", 0.0)
+
+
+def init_app(app):
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+    @app.before_request
+    def _reset_query_cost():
+        # 已有应用上下文时（如测试里在 app_context 中发请求）请求会沿用它，计数从本请求开始
+        g.db_queries, g.db_seconds = 0, 0.0
+
+    @app.after_request
+    def _report_query_cost(response):
+        count, seconds = query_cost()
+        response.headers["X-DB-Queries"] = str(count)
+        response.headers["X-DB-Time-ms"] = f"{seconds * 1000:.1f}"
+        response.headers.add("Server-Timing", f'db;dur={seconds * 1000:.1f};desc="{count} queries"')
+
+        view = current_app.view_functions.get(request.endpoint)
+        limit = getattr(view, "query_budget", None)
+        if limit is not None:
+            response.headers["X-DB-Query-Budget"] = str(limit)
+            if count > limit:
+                print(f"[DEBUG] {request.endpoint} 执行了 {count} 条 SQL，超过上限 {limit}")
+        return response
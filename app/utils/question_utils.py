@@ -0,0 +1,108 @@
+import re
+
+# 题目分隔标记、选项行、答案行（模块加载时编译一次）
+QUESTION_MARKER = re.compile(r"(?:题目\d*[:：]|Question\s*\d*[:：])")
+OPTION_LINE = re.compile(r"[A-Da-d][\.\、，：:]")  # 匹配 A. A、 A:
+# 答案行：行内任意位置出现答案标记即算（如 "正确答案：B"、"**Answer:** b"），有多条时取最后一条
+ANSWER_MARK = re.compile(r"正确答案|答案|Answer")
+
+
+def _build_question(lines):
+    question_text = []
+    options = []
+    answer = ""
+    for line in lines:
+        if OPTION_LINE.match(line):
+            options.append(line)
+        elif ANSWER_MARK.search(line):
+            answer = line
+        else:
+            question_text.append(line)
+    return {
+        "question": " ".join(question_text),
+        "options": options,
+        "answer": answer
+    }
+
+
+def parse_questions(raw_text):
+    raw_questions = QUESTION_MARKER.split(raw_text)[1:]
+    return [_build_question([line.strip() for line in q.strip().split("\n")]) for q in raw_questions]
+
+
+class QuestionStreamParser:
+    """
+    增量解析流式返回的出题文本：feed() 接收文本片段，返回其中新完成的题目。
+    一道题在选项之后的答案行收完整（遇到换行）时就产出，不必等整段输出结束；
+    产出之后、下一个题目标记之前又收到的行（如解析、更正的答案）仍按 parse_questions 的规则
+    并入这道题（原地更新已产出的 dict），输出结束后 questions 与 parse_questions 的结果一致
+    """
+
+    def __init__(self):
+        self._pending = ""     # 尚未凑成完整一行的文本
+        self._lines = None     # 当前题目已收到的行，遇到第一个题目标记之前为 None
+        self._has_options = False
+        self._question = None  # 当前题目已产出的 dict，未产出时为 None
+        self.questions = []
+
+    def feed(self, chunk):
+        self._pending += chunk
+        if "\n" not in self._pending:
+            return []
+        complete, self._pending = self._pending.rsplit("\n", 1)
+        emitted = []
+        for line in complete.split("\n"):
+            self._consume_line(line, emitted)
+        return emitted
+
+    def close(self):
+        """
+        输出结束：处理最后不带换行的一行，并产出最后一道还没有答案行的题
+        """
+        emitted = []
+        if self._pending:
+            self._consume_line(self._pending, emitted)
+            self._pending = ""
+        self._finish_current(emitted)
+        return emitted
+
+    def _consume_line(self, line, emitted):
+        # 一行里可能夹着下一题的标记，按标记切开，后面的片段各自开始新题
+        segments = QUESTION_MARKER.split(line)
+        self._add_line(segments[0], emitted)
+        for segment in segments[1:]:
+            self._finish_current(emitted)
+            self._lines = []
+            self._has_options = False
+            self._question = None
+            self._add_line(segment, emitted)
+
+    def _add_line(self, line, emitted):
+        if self._lines is None:
+            return
+        line = line.strip()
+        if not line and not self._lines:
+            return  # 与 parse_questions 的 q.strip() 一致，跳过题目开头的空行
+        self._lines.append(line)
+        if self._question is not None:
+            self._question.update(_build_question(self._lines))
+        elif OPTION_LINE.match(line):
+            self._has_options = True
+        elif self._has_options and ANSWER_MARK.search(line):
+            self._emit(emitted)
+
+    def _finish_current(self, emitted):
+        if self._lines is None:
+            return
+        # 去掉结尾空行，与 parse_questions 的 q.strip() 一致
+        while self._lines and not self._lines[-1]:
+            self._lines.pop()
+        if self._question is not None:
+            self._question.update(_build_question(self._lines))
+        else:
+            self._emit(emitted)
+
+    def _emit(self, emitted):
+        self._question = _build_question(self._lines)
+        self.questions.append(self._question)
+        emitted.append(self._question)
@@ -0,0 +1,185 @@
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+
+import numpy as np
+
+# 资料分块检索：入库时把全文切成有重叠的文本块，建立 BM25 倒排索引（NumPy 数组，存为 .npz），
+# 问答时只把和问题最相关的几块放进 prompt
+
+INDEX_DIR = os.getenv("CHUNK_INDEX_DIR", os.path.join(os.getcwd(), "cache", "index"))
+CHUNK_SIZE = 400
+CHUNK_OVERLAP = 80
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_WORD = re.compile(r"[a-z0-9]+")
+_CJK_RUN = re.compile(r"[一-鿿]+")
+
+
+def tokenize(text):
+    """
+    英文/数字按单词切分；中文没有空格，按相邻两字（bigram）切分，单字的片段保留单字
+    """
+    text = text.lower()
+    tokens = _WORD.findall(text)
+    for run in _CJK_RUN.findall(text):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def chunk_text(text, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    chunks = []
+    step = size - overlap
+    for start in range(0, max(len(text) - overlap, 1), step):
+        chunk = text[start:start + size].strip()
+        if chunk:
+            chunks.append(chunk)
+    return chunks
+
+
+class ChunkIndex:
+    """
+    按词组织的倒排表：terms[i] 的文档列表为 doc_ids[offsets[i]:offsets[i+1]]，对应词频 tfs
+    """
+
+    def __init__(self, chunks, terms, offsets, doc_ids, tfs, doc_lens):
+        self.chunks = chunks
+        self.terms = terms
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_lens = doc_lens
+        self._term_ids = {term: i for i, term in enumerate(terms.tolist())}
+        n_docs = len(chunks)
+        df = np.diff(offsets).astype(np.float32)
+        self.idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        avg_len = float(doc_lens.mean()) if n_docs else 1.0
+        self.len_norm = (BM25_K1 * (1 - BM25_B + BM25_B * doc_lens / max(avg_len, 1.0))).astype(np.float32)
+
+    @classmethod
+    def build(cls, text):
+        chunks = chunk_text(text or "")
+        postings = {}
+        doc_lens = []
+        for doc_id, chunk in enumerate(chunks):
+            counts = Counter(tokenize(chunk))
+            doc_lens.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((doc_id, tf))
+
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        doc_ids, tfs = [], []
+        for i, term in enumerate(terms):
+            for doc_id, tf in postings[term]:
+                doc_ids.append(doc_id)
+                tfs.append(tf)
+            offsets[i + 1] = len(doc_ids)
+
+        return cls(np.array(chunks, dtype=str),
+                   np.array(terms, dtype=str),
+                   offsets,
+                   np.array(doc_ids, dtype=np.int32),
+                   np.array(tfs, dtype=np.float32),
+                   np.array(doc_lens, dtype=np.float32))
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(tmp_path, chunks=self.chunks, terms=self.terms, offsets=self.offsets,
+                            doc_ids=self.doc_ids, tfs=self.tfs, doc_lens=self.doc_lens)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["chunks"], data["terms"], data["offsets"],
+                       data["doc_ids"], data["tfs"], data["doc_lens"])
+
+    def search(self, query, k=5):
+        """
+        返回 BM25 得分最高的 k 个文本块编号（按得分降序），没有任何匹配时返回空列表
+        """
+        scores = np.zeros(len(self.chunks), dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self._term_ids.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs = self.doc_ids[start:end]
+            tf = self.tfs[start:end]
+            scores[docs] += self.idf[term_id] * tf * (BM25_K1 + 1) / (tf + self.len_norm[docs])
+
+        k = min(k, int(np.count_nonzero(scores)))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top])].tolist()
+
+    def context_for(self, question, budget_chars):
+        """
+        按相关度挑选文本块直到填满字数预算，再按原文顺序拼接；
+        问题和资料没有任何词重合时退回资料开头
+        """
+        picked = []
+        used = 0
+        for doc_id in self.search(question, k=len(self.chunks)):
+            size = len(self.chunks[doc_id])
+            if used + size > budget_chars and picked:
+                break
+            picked.append(doc_id)
+            used += size
+        if not picked:
+            picked = list(range(min(len(self.chunks), max(1, budget_chars // CHUNK_SIZE))))
+        return "\n...\n".join(str(self.chunks[i]) for i in sorted(picked))[:budget_chars]
+
+
+_loaded = OrderedDict()
+_loaded_lock = threading.Lock()
+_MAX_LOADED = 32
+
+
+def _index_path(content_hash):
+    return os.path.join(INDEX_DIR, f"{content_hash}.npz")
+
+
+def build_chunk_index(content_hash, text):
+    """
+    入库时调用：为资料全文建立分块索引并按内容哈希存盘
+    """
+    index = ChunkIndex.build(text)
+    if content_hash:
+        index.save(_index_path(content_hash))
+        _remember(content_hash, index)
+    return index
+
+
+def load_chunk_index(content_hash):
+    """
+    读取已建立的分块索引（进程内缓存最近使用的若干个），不存在时返回 None
+    """
+    if not content_hash:
+        return None
+    with _loaded_lock:
+        if content_hash in _loaded:
+            _loaded.move_to_end(content_hash)
+            return _loaded[content_hash]
+    path = _index_path(content_hash)
+    if not os.path.exists(path):
+        return None
+    index = ChunkIndex.load(path)
+    _remember(content_hash, index)
+    return index
+
+
+def _remember(content_hash, index):
+    with _loaded_lock:
+        _loaded[content_hash] = index
+        _loaded.move_to_end(content_hash)
+        while len(_loaded) > _MAX_LOADED:
+            _loaded.popitem(last=False)
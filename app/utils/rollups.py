@@ -0,0 +1,113 @@
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from app.models import db, StudentAnswerRecord
+from app.models import StudentDayStat, StudentTagStat, MaterialStudentStat, QuestionStat
+from app.models.rollup import ScoreStats
+
+# 汇总表的维护：提交答卷时 apply() 把新记录计入各表（与插入记录同一事务），
+# rebuild() 从答题记录全量重建（`flask rollup rebuild`）
+
+R = StudentAnswerRecord
+
+# 每张汇总表：(模型, 分组列名, 从一条记录（列名 → 值）取分组键, 重建时的分组表达式, 重建时的过滤条件)
+ROLLUPS = [
+    (StudentDayStat, ("student_id", "day"),
+     lambda r: (r["student_id"], r["timestamp"].date()) if r.get("timestamp") else None,
+     (R.student_id, func.date(R.timestamp)),
+     (R.student_id.isnot(None), R.timestamp.isnot(None))),
+    (StudentTagStat, ("student_id", "knowledge_tag"),
+     lambda r: (r["student_id"], r["knowledge_tag"]) if r.get("knowledge_tag") else None,
+     (R.student_id, R.knowledge_tag),
+     (R.student_id.isnot(None), R.knowledge_tag.isnot(None), R.knowledge_tag != '')),
+    (MaterialStudentStat, ("material_id", "student_id"),
+     lambda r: (r["material_id"], r["student_id"]),
+     (R.material_id, R.student_id),
+     (R.material_id.isnot(None), R.student_id.isnot(None))),
+    (QuestionStat, ("question_id",),
+     lambda r: (r["question_id"],) if r.get("question_id") else None,
+     (R.question_id,),
+     (R.question_id.isnot(None),)),
+]
+
+
+def _upsert(model, rows):
+    """
+    按主键插入，已存在的组累加次数、得分和、平方和（first_at 保持最早的值）
+    """
+    table = model.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "mysql":
+        stmt = mysql.insert(table)
+        stmt = stmt.on_duplicate_key_update({c: table.c[c] + stmt.inserted[c] for c in ScoreStats.STAT_COLUMNS})
+    elif dialect in ("sqlite", "postgresql"):
+        stmt = (sqlite if dialect == "sqlite" else postgresql).insert(table)
+        stmt = stmt.on_conflict_do_update(index_elements=[c.name for c in table.primary_key],
+                                          set_={c: table.c[c] + stmt.excluded[c] for c in ScoreStats.STAT_COLUMNS})
+    else:
+        _upsert_portable(table, rows)
+        return
+    db.session.execute(stmt, rows)
+
+
+def _upsert_portable(table, rows):
+    """
+    没有 upsert 语法的数据库：逐组先按主键累加，没有这一组（更新 0 行）再插入；
+    并发提交同时插入同一组时主键冲突，回滚这次插入（savepoint）改为累加
+    """
+    keys = [c.name for c in table.primary_key]
+    for row in rows:
+        increment = table.update() \
+            .where(*(table.c[k] == row[k] for k in keys)) \
+            .values({c: table.c[c] + row[c] for c in ScoreStats.STAT_COLUMNS})
+        if db.session.execute(increment).rowcount:
+            continue
+        try:
+            with db.session.begin_nested():
+                db.session.execute(table.insert().values(row))
+        except IntegrityError:
+            db.session.execute(increment)
+
+
+def apply(records):
+    """
+    把一批新插入的答题记录（列名 → 值的 dict）计入各汇总表；调用方负责提交事务
+    """
+    for model, columns, key_of, _, _ in ROLLUPS:
+        groups = {}
+        for record in records:
+            key = key_of(record)
+            if key is None or None in key:
+                continue
+            score = record.get("score") or 0
+            stats = groups.setdefault(key, {"answer_count": 0, "score_sum": 0, "score_sumsq": 0,
+                                            "first_at": record.get("created_at")})
+            stats["answer_count"] += 1
+            stats["score_sum"] += score
+            stats["score_sumsq"] += score * score
+        if groups:
+            _upsert(model, [dict(zip(columns, key), **stats) for key, stats in groups.items()])
+
+
+def rebuild():
+    """
+    清空并从答题记录全量重建各汇总表（在数据库里 GROUP BY），返回 {表名: 行数}
+    """
+    score = func.coalesce(R.score, 0)
+    counts = {}
+    for model, columns, _, group_by, where in ROLLUPS:
+        table = model.__table__
+        select = db.select(*group_by,
+                           func.count(R.id),
+                           func.coalesce(func.sum(score), 0),
+                           func.coalesce(func.sum(score * score), 0),
+                           func.min(R.created_at)) \
+            .where(*where) \
+            .group_by(*group_by)
+        db.session.execute(table.delete())
+        db.session.execute(table.insert().from_select(list(columns) + list(ScoreStats.STAT_COLUMNS) + ["first_at"],
+                                                      select))
+        counts[table.name] = db.session.query(func.count()).select_from(table).scalar()
+    db.session.commit()
+    return counts
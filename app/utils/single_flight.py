@@ -0,0 +1,201 @@
+import hashlib
+import os
+import threading
+import time
+
+# 相同的耗时操作（同一 prompt 的 AI 调用、同一文件的文本提取）同时只执行一次：
+# 进程内后到的请求直接等待进行中的那次并共享结果；
+# 跨进程（多个 worker）用 cache/locks 下的锁文件互斥，等到锁的进程先查一遍共享存储（AI 缓存 / 文本存档），
+# 已有结果就直接用，不再重复计算
+
+LOCK_DIR = os.getenv("SINGLE_FLIGHT_LOCK_DIR", os.path.join(os.getcwd(), "cache", "locks"))
+LOCK_STALE_SECONDS = 300  # 持有者崩溃留下的锁文件，超过这个时间视为失效
+LOCK_WAIT_SECONDS = 180   # 最多等其他进程这么久，之后不再等待、自己执行
+LOCK_POLL_SECONDS = 0.2
+
+
+class _FileLock:
+    """
+    基于 O_CREAT | O_EXCL 建文件的跨进程锁（各平台都可用）。
+    waited 表示是否等过其他进程释放锁
+    """
+
+    def __init__(self, key):
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        self.path = os.path.join(LOCK_DIR, f"{name}.lock")
+        self.waited = False
+        self._held = False
+
+    def __enter__(self):
+        os.makedirs(LOCK_DIR, exist_ok=True)
+        deadline = time.monotonic() + LOCK_WAIT_SECONDS
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                self._remove_if_stale()
+                if time.monotonic() >= deadline:
+                    print(f"[DEBUG] single-flight lock wait timed out: {self.path}")
+                    return self
+                self.waited = True
+                time.sleep(LOCK_POLL_SECONDS)
+                continue
+            except OSError:
+                # 锁目录不可写时退化为只在进程内合并
+                return self
+            with os.fdopen(fd, "w") as f:
+                f.write(str(os.getpid()))
+            self._held = True
+            return self
+
+    def __exit__(self, *exc):
+        if self._held:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+        return False
+
+    def _remove_if_stale(self):
+        try:
+            if time.time() - os.path.getmtime(self.path) > LOCK_STALE_SECONDS:
+                os.remove(self.path)
+        except OSError:
+            pass
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _StreamFlight:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.chunks = []
+        self.finished = False
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._streams = {}
+        self._leaders = 0
+        self._coalesced = 0
+
+    def do(self, key, fn, recheck=None, cross_process=False):
+        """
+        执行 fn() 并返回结果；同一 key 正在执行时等待并共享那次的结果（或异常）。
+        cross_process=True 时再用锁文件和其他进程互斥，等过锁的话先调用 recheck()，
+        返回值不为 None 就直接用它
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self._leaders += 1
+            else:
+                self._coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = self._run(key, fn, recheck, cross_process)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def stream(self, key, start, recheck=None, cross_process=False):
+        """
+        流式版本：start() 返回文本片段的迭代器。同一 key 的并发调用共享一个后台线程拉取的片段，
+        每个调用方都从第一段开始读到最后；调用方中途断开不影响其他人。
+        recheck 命中时一次性产出它的返回值
+        """
+        with self._lock:
+            flight = self._streams.get(key)
+            if flight is None:
+                flight = self._streams[key] = _StreamFlight()
+                self._leaders += 1
+                threading.Thread(target=self._pump, args=(key, flight, start, recheck, cross_process),
+                                 name="single-flight-stream", daemon=True).start()
+            else:
+                self._coalesced += 1
+        return self._follow(flight)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "leaders": self._leaders,
+                "coalesced": self._coalesced,
+                "in_flight": len(self._flights) + len(self._streams),
+            }
+
+    def _run(self, key, fn, recheck, cross_process):
+        if not cross_process:
+            return fn()
+        with _FileLock(key) as lock:
+            if lock.waited and recheck is not None:
+                cached = recheck()
+                if cached is not None:
+                    return cached
+            return fn()
+
+    def _pump(self, key, flight, start, recheck, cross_process):
+        def publish(chunk):
+            with flight.cond:
+                flight.chunks.append(chunk)
+                flight.cond.notify_all()
+
+        try:
+            if cross_process:
+                with _FileLock(key) as lock:
+                    cached = recheck() if lock.waited and recheck is not None else None
+                    if cached is not None:
+                        publish(cached)
+                    else:
+                        for chunk in start():
+                            publish(chunk)
+            else:
+                for chunk in start():
+                    publish(chunk)
+        except Exception as e:
+            flight.error = e
+        finally:
+            with self._lock:
+                del self._streams[key]
+            with flight.cond:
+                flight.finished = True
+                flight.cond.notify_all()
+
+    @staticmethod
+    def _follow(flight):
+        sent = 0
+        while True:
+            with flight.cond:
+                while sent >= len(flight.chunks) and not flight.finished:
+                    flight.cond.wait()
+                chunks = flight.chunks[sent:]
+                finished = flight.finished
+            sent += len(chunks)
+            yield from chunks
+            if finished:
+                if flight.error is not None:
+                    raise flight.error
+                return
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,105 @@
+import time
+import uuid
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError
+
+from app.models import db, Submission, StudentAnswerRecord
+from app.utils import rollups
+
+# 整卷提交的保存：先登记表头（提交 id 唯一，重复提交不会再次批改），
+# 批改完成后全部答题记录一次批量插入，和表头的总分、状态、各汇总表在同一个事务里提交
+
+MAX_DURATION_SECONDS = 24 * 3600  # 超过一天的用时视为无效（页面开着过夜）
+
+
+def form_fields():
+    """
+    答题页面表单的隐藏字段：本次作答的提交 id、打开页面的时间
+    """
+    return {"submission_id": str(uuid.uuid4()), "started_at": int(time.time())}
+
+
+def _duration(started_at):
+    try:
+        seconds = int(time.time()) - int(started_at)
+    except (TypeError, ValueError):
+        return None
+    return seconds if 0 <= seconds <= MAX_DURATION_SECONDS else None
+
+
+def begin(token, student_id, material_id, question_count, started_at=None):
+    """
+    登记一次提交，返回 (submission, created)。
+    created 为 False 表示这个提交 id 已经登记过（双击、刷新重发），调用方不应再批改
+    """
+    # 旧页面没有提交 id 时按新提交处理
+    token = (token or "").strip()[:36] or str(uuid.uuid4())
+    submission = Submission(token=token,
+                            student_id=student_id,
+                            material_id=material_id,
+                            question_count=question_count,
+                            duration_seconds=_duration(started_at))
+    db.session.add(submission)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return Submission.query.filter_by(token=token).one(), False
+    return submission, True
+
+
+def _int_score(score):
+    # score 列是整数：汇总表的得分和、表头总分都按存进去的整数分累加，与记录一致
+    return None if score is None else int(round(score))
+
+
+def save(submission, questions, answers, feedback):
+    """
+    批量插入本次提交的答题记录（AI 没能评分的题目不保存，避免记成 0 分），并更新表头和汇总表
+    """
+    now = datetime.utcnow()
+    rows = []
+    for i, q in enumerate(questions):
+        if feedback["degraded"][i]:
+            continue
+        rows.append({
+            "student_id": submission.student_id,
+            "material_id": submission.material_id,
+            "submission_id": submission.id,
+            "question_id": q.get("id"),
+            "question": q["question"],
+            "student_answer": answers[i],
+            "score": _int_score(feedback["scores"][i]),
+            "comment": feedback["comments"][i],
+            "recommendation": feedback["recommendations"][i],
+            "timestamp": now,
+            "created_at": now,
+        })
+    if rows:
+        db.session.execute(StudentAnswerRecord.__table__.insert(), rows)
+        rollups.apply(rows)
+
+    submission.graded_count = len(rows)
+    submission.total_score = sum(row["score"] or 0 for row in rows)
+    submission.status = Submission.DONE
+    submission.finished_at = now
+    db.session.commit()
+
+
+def abandon(submission):
+    """
+    批改出错时删除登记的表头，学生重新提交时可以再次批改
+    """
+    db.session.rollback()
+    Submission.query.filter_by(id=submission.id).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def result_rows(submission):
+    """
+    已保存提交的 (题目, 答案, 得分, 点评, 建议)，与批改后直接展示的格式相同
+    """
+    records = StudentAnswerRecord.query.filter_by(submission_id=submission.id) \
+        .order_by(StudentAnswerRecord.id).all()
+    return [({"question": r.question}, r.student_answer, r.score, r.comment, r.recommendation) for r in records]
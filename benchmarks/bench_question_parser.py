@@ -0,0 +1,86 @@
+"""
+出题结果解析基准：对比 parse_questions（整段到齐后解析）和 QuestionStreamParser（边收边解析）。
+
+语料为录制下来的模型出题输出（benchmarks/corpus/question_outputs/*.txt），按固定字数切片模拟流式返回。
+报告每份语料的解析耗时、第一道题在收到多少比例的输出后产出，以及两种解析结果是否一致。
+
+用法（在项目根目录）：
+    python benchmarks/bench_question_parser.py
+    python benchmarks/bench_question_parser.py --chunk-size 4 --repeat 500
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.question_utils import parse_questions, QuestionStreamParser  # noqa: E402
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus", "question_outputs")
+
+
+def _chunks(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def _stream_parse(chunks):
+    """
+    返回 (全部题目, 第一道题产出时已收到的字符数)
+    """
+    parser = QuestionStreamParser()
+    received = 0
+    first_at = None
+    for chunk in chunks:
+        received += len(chunk)
+        if parser.feed(chunk) and first_at is None:
+            first_at = received
+    if parser.close() and first_at is None:
+        first_at = received
+    return parser.questions, first_at
+
+
+def _time_per_call(fn, repeat):
+    began = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - began) / repeat * 1e6
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--chunk-size", type=int, default=8, help="每个流式片段的字符数（约等于一个 token）")
+    arg_parser.add_argument("--repeat", type=int, default=200, help="每份语料重复解析的次数")
+    args = arg_parser.parse_args()
+
+    files = sorted(glob.glob(os.path.join(CORPUS_DIR, "*.txt")))
+    if not files:
+        print(f"语料目录为空：{CORPUS_DIR}")
+        return 1
+
+    print(f"{'corpus':36} {'chars':>6} {'qs':>3} {'full µs':>9} {'stream µs':>10} {'first q at':>11} {'same':>5}")
+    mismatches = 0
+    for path in files:
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+        chunks = _chunks(text, args.chunk_size)
+
+        expected = parse_questions(text)
+        streamed, first_at = _stream_parse(chunks)
+        same = streamed == expected
+        mismatches += not same
+
+        full_us = _time_per_call(lambda: parse_questions(text), args.repeat)
+        stream_us = _time_per_call(lambda: _stream_parse(chunks), args.repeat)
+        first = f"{first_at / len(text):.0%}" if first_at else "-"
+        print(f"{os.path.basename(path):36} {len(text):>6} {len(streamed):>3} "
+              f"{full_us:>9.1f} {stream_us:>10.1f} {first:>11} {'yes' if same else 'no':>5}")
+
+    # 两种解析的判定规则相同，不一致说明 QuestionStreamParser 的切行 / 题目边界处理有问题
+    print(f"\n{len(files)} corpora, {mismatches} differ from parse_questions, chunk size {args.chunk_size}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,267 @@
+"""
+本地假 OpenRouter：模拟 /api/v1/chat/completions，压测和离线开发时不花钱、不依赖外网。
+
+按 prompt 内容返回对应格式的固定回复（出题、整卷批改、单题批改、选择题点评、问答、总结、报告），
+支持 stream=true 的 SSE 输出。延迟 = 首字延迟（对数正态分布）+ 按输出长度计的生成时间，
+并可按比例返回 429/5xx 错误。
+
+用法（在项目根目录）：
+    python benchmarks/fake_openrouter.py --port 8765 --latency-median 0.8 --error-rate 0.02
+    OPENROUTER_API_URL=http://127.0.0.1:8765/api/v1/chat/completions flask run
+
+GET /stats 返回各类请求数和错误数。
+"""
+import argparse
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+QUIZ_TOPICS = ["牛顿第二定律", "光合作用", "二分查找", "勾股定理", "供需关系", "细胞分裂", "TCP 三次握手", "氧化还原反应"]
+
+SUMMARY_TEXT = """一、核心知识点
+1. 本资料围绕基本概念、推导过程和典型应用展开。
+2. 重点掌握定义之间的联系，以及各公式的适用条件。
+
+二、重要定义
+- 概念 A：描述研究对象的基本性质。
+- 概念 B：在一定条件下 A 的推广形式。
+
+三、常用公式
+- F = ma
+- a² + b² = c²
+
+四、高频关键词
+变量、条件、推导、边界情况、单位换算
+
+五、典型例题
+已知直角三角形两直角边为 3 和 4，求斜边。解：由勾股定理得斜边为 5。
+"""
+
+CHAT_TEXT = "根据资料内容，这个问题的关键在于理解定义成立的前提条件。资料第二部分给出了推导过程，" \
+            "可以先回顾其中的例题，再尝试用自己的话复述结论。如果资料中没有明确说明，建议查阅教材相应章节。"
+
+REPORT_TEXT = """1. 整体表现：大部分学生能够掌握基础概念，平均得分处于中等水平。
+2. 共性弱项：涉及公式适用条件和多步推导的题目得分明显偏低。
+3. 教学建议：课堂上增加推导过程的板书演示，并布置针对性的分层练习。"""
+
+PATH_TEXT = """步骤 1：复习基础定义 —— 原因：多道题目对概念理解有偏差；方式：阅读教材并整理笔记。
+步骤 2：公式推导练习 —— 原因：推导题得分偏低；方式：完成 5 道推导练习题。
+步骤 3：综合应用 —— 原因：巩固知识迁移能力；方式：观看例题讲解视频后独立完成综合题。"""
+
+
+class FakeBackend:
+    def __init__(self, latency_median, latency_sigma, tokens_per_second, error_rate, error_codes, seed=None):
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.error_codes = error_codes
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = Counter()
+        self.errors = Counter()
+
+    def first_token_delay(self):
+        with self._lock:
+            return self._random.lognormvariate(math.log(self.latency_median), self.latency_sigma)
+
+    def pick_error(self):
+        with self._lock:
+            if self._random.random() < self.error_rate:
+                return self._random.choice(self.error_codes)
+        return None
+
+    def generation_seconds(self, text):
+        # 中文约 1 字 1 token
+        return len(text) / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def reply(self, prompt):
+        """
+        返回 (请求类型, 回复文本)
+        """
+        if "选择题" in prompt and "生成" in prompt:
+            match = re.search(r"生成(\d+)道", prompt)
+            return "questions", _quiz(int(match.group(1)) if match else 5)
+        if "Evaluate each of the student's answers" in prompt:
+            count = len(re.findall(r"^\[\d+\]$", prompt, re.M))
+            return "grade_batch", json.dumps([_grade(i) for i in range(1, count + 1)], ensure_ascii=False)
+        if "Evaluate the student's answer" in prompt:
+            grade = _grade(1)
+            grade.pop("index")
+            return "grade_one", json.dumps(grade, ensure_ascii=False)
+        if "multiple-choice question" in prompt:
+            return "explain_choice", json.dumps({
+                "comment": "The key point is to check which option satisfies every condition in the stem.",
+                "recommendation": "Review the definition and redo similar multiple-choice questions."
+            })
+        if "智能学习助手" in prompt:
+            return "chat", CHAT_TEXT
+        if "一页纸总结" in prompt:
+            return "summary", SUMMARY_TEXT
+        if "教学分析" in prompt:
+            return "teacher_report", REPORT_TEXT
+        if "学习路径" in prompt:
+            return "learning_path", PATH_TEXT
+        return "other", "好的。"
+
+
+def _quiz(count):
+    blocks = []
+    for i in range(1, count + 1):
+        topic = QUIZ_TOPICS[(i - 1) % len(QUIZ_TOPICS)]
+        blocks.append(f"题目{i}：下列关于{topic}的说法，哪一项是正确的？\n"
+                      f"A. {topic}只在理想条件下成立\n"
+                      f"B. {topic}描述了资料中的核心规律\n"
+                      f"C. {topic}与本章内容无关\n"
+                      f"D. 以上说法都不对\n"
+                      f"正确答案：B")
+    return "\n\n".join(blocks)
+
+
+def _grade(index):
+    score = 4 + (index * 3) % 7
+    return {
+        "index": index,
+        "score": score,
+        "comment": "思路基本正确，但关键步骤的说明不够完整。" if score < 8 else "回答准确，条理清晰。",
+        "recommendation": "复习本题涉及的定义，并完成两道同类练习。"
+    }
+
+
+def _chunks(text, size=4):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def make_handler(backend):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path != "/stats":
+                self._send_json(404, {"error": "not found"})
+                return
+            self._send_json(200, {"requests": dict(backend.requests), "errors": dict(backend.errors)})
+
+        def do_POST(self):
+            if not self.path.endswith("/chat/completions"):
+                self._send_json(404, {"error": "not found"})
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            prompt = (body.get("messages") or [{}])[-1].get("content", "")
+            kind, text = backend.reply(prompt)
+            backend.requests[kind] += 1
+
+            time.sleep(backend.first_token_delay())
+            status = backend.pick_error()
+            if status:
+                backend.errors[status] += 1
+                headers = {"Retry-After": "1"} if status == 429 else {}
+                self._send_json(status, {"error": {"code": status, "message": "simulated upstream error"}}, headers)
+                return
+
+            usage = {"prompt_tokens": len(prompt), "completion_tokens": len(text),
+                     "total_tokens": len(prompt) + len(text)}
+            if body.get("stream"):
+                self._stream(body.get("model"), text)
+            else:
+                time.sleep(backend.generation_seconds(text))
+                self._send_json(200, {
+                    "id": "fake-completion",
+                    "model": body.get("model"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": text},
+                                 "finish_reason": "stop"}],
+                    "usage": usage
+                })
+
+        def _stream(self, model, text):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            pieces = _chunks(text)
+            delay = backend.generation_seconds(text) / max(len(pieces), 1)
+            try:
+                self.wfile.write(b": OPENROUTER PROCESSING\n\n")
+                for piece in pieces:
+                    chunk = {"id": "fake-completion", "model": model,
+                             "choices": [{"index": 0, "delta": {"content": piece}}]}
+                    self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                    time.sleep(delay)
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def _send_json(self, status, data, headers=None):
+            payload = json.dumps(data, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+    return Handler
+
+
+def serve(host="127.0.0.1", port=8765, **backend_options):
+    """
+    启动假服务并返回 (server, backend)；server.serve_forever() 需由调用方在线程中运行
+    """
+    backend = FakeBackend(**backend_options)
+    server = ThreadingHTTPServer((host, port), make_handler(backend))
+    server.daemon_threads = True
+    return server, backend
+
+
+def add_backend_arguments(parser):
+    parser.add_argument("--latency-median", type=float, default=0.8, help="首字延迟中位数（秒）")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="首字延迟对数正态分布的 sigma")
+    parser.add_argument("--tokens-per-second", type=float, default=80, help="生成速度，0 表示瞬间返回全文")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回错误的比例（0~1）")
+    parser.add_argument("--error-codes", default="429,500,503", help="随机选用的错误状态码")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def backend_options(args):
+    return {
+        "latency_median": args.latency_median,
+        "latency_sigma": args.latency_sigma,
+        "tokens_per_second": args.tokens_per_second,
+        "error_rate": args.error_rate,
+        "error_codes": [int(code) for code in args.error_codes.split(",") if code],
+        "seed": args.seed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_backend_arguments(parser)
+    args = parser.parse_args()
+
+    server, _ = serve(args.host, args.port, **backend_options(args))
+    print(f"fake OpenRouter listening on http://{args.host}:{args.port}/api/v1/chat/completions")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,359 @@
+"""
+端到端压测：在本进程内启动假 OpenRouter（fake_openrouter.py）和本应用，
+用 sqlite 临时库造好教师、学生、标准题库和答题记录，再按路由逐个施压，
+报告每个路由的吞吐量和 p50/p95/p99 延迟。
+
+用法（在项目根目录）：
+    python benchmarks/load_test.py
+    python benchmarks/load_test.py --concurrency 16 --requests 200 --routes submit_answers,chat_material
+    python benchmarks/load_test.py --error-rate 0.05 --json results.json
+
+--db-url 可换成 MySQL 等其他数据库（会在其中建表并写入压测数据）。
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import requests  # noqa: E402
+
+import fake_openrouter  # noqa: E402
+
+PASSWORD = "bench"
+TAGS = ["数学", "物理", "编程", "英语词汇", "化学"]
+QUESTIONS = [
+    {"question": "Which law relates force, mass and acceleration?",
+     "options": ["A. Newton's second law", "B. Hooke's law", "C. Ohm's law", "D. Boyle's law"],
+     "answer": "正确答案：A"},
+    {"question": "What is the time complexity of binary search?",
+     "options": ["A. O(n)", "B. O(log n)", "C. O(n log n)", "D. O(1)"],
+     "answer": "正确答案：B"},
+    {"question": "Which gas do plants absorb during photosynthesis?",
+     "options": ["A. Oxygen", "B. Nitrogen", "C. Carbon dioxide", "D. Hydrogen"],
+     "answer": "正确答案：C"},
+    {"question": "Explain in your own words why the sky appears blue.",
+     "options": [], "answer": ""},
+    {"question": "Describe the steps of the TCP three-way handshake.",
+     "options": [], "answer": ""},
+]
+CHOICE_ANSWERS = ["A", "B", "C", "D"]
+OPEN_ANSWERS = [
+    "Because shorter wavelengths are scattered more by air molecules.",
+    "Blue light is scattered more than red light in the atmosphere.",
+    "SYN, then SYN-ACK, then ACK.",
+    "The client sends SYN, the server replies SYN-ACK and the client acknowledges.",
+]
+CHAT_QUESTIONS = ["牛顿第二定律的适用条件是什么？", "What is binary search?", "光合作用需要哪些条件？",
+                  "How does the TCP handshake work?", "这份资料的重点是什么？"]
+
+
+def make_pdf(path, pages=3):
+    import fitz
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        text = (f"Chapter {i + 1}. Newton's second law states that force equals mass times acceleration. "
+                "Binary search halves the search interval each step. Photosynthesis turns carbon dioxide "
+                "and water into glucose using light energy. The TCP handshake uses SYN, SYN-ACK and ACK. ")
+        page.insert_textbox(fitz.Rect(50, 50, 550, 800), text * 6, fontsize=10)
+    doc.save(path)
+    doc.close()
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+class Bench:
+    def __init__(self, args, workdir):
+        self.args = args
+        self.workdir = workdir
+        self.base = f"http://127.0.0.1:{args.port}"
+        self.ids = {}
+
+    # ---------- 准备 ----------
+
+    def seed(self, app):
+        from app.models import db, Teacher, Student, CourseMaterial, MaterialJob, StudentAnswerRecord
+        from app.utils.file_utils import load_extracted_text
+        from app.utils.retrieval import build_chunk_index
+        from app.utils import rollups
+
+        with app.app_context():
+            db.create_all()
+            teacher = Teacher(name="bench_teacher", password=PASSWORD)
+            students = [Student(name=f"bench_student_{i}", password=PASSWORD)
+                        for i in range(self.args.students)]
+            db.session.add(teacher)
+            db.session.add_all(students)
+            db.session.flush()
+
+            uploads = os.path.join(self.workdir, "uploads")
+            standard_path = os.path.join(uploads, "bench_standard.pdf")
+            make_pdf(standard_path)
+            standard = CourseMaterial(filename="bench_standard.pdf", filepath=standard_path, teacher_id=teacher.id,
+                                      is_standard=True)
+            own = []
+            for student in students:
+                path = os.path.join(uploads, f"bench_{student.name}.pdf")
+                shutil.copyfile(standard_path, path)
+                own.append(CourseMaterial(filename=os.path.basename(path), filepath=path, student_id=student.id))
+            for material in [standard] + own:
+                material.set_questions(QUESTIONS)
+            db.session.add(standard)
+            db.session.add_all(own)
+            db.session.flush()
+
+            # 资料的文本存档和检索索引按上传完成后的状态准备好
+            for material in [standard] + own:
+                text, content_hash = load_extracted_text(material.filepath)
+                material.content_hash = content_hash
+                build_chunk_index(content_hash, text)
+                db.session.add(MaterialJob(material=material, status="done", stage="parsed", progress=100))
+
+            # 历史答题记录，供教师统计路由使用
+            start = datetime.utcnow() - timedelta(days=self.args.history_days)
+            records = []
+            for s_idx, student in enumerate(students):
+                for n in range(self.args.history_per_student):
+                    q = standard.questions[n % len(QUESTIONS)]
+                    when = start + timedelta(days=n % self.args.history_days, minutes=s_idx)
+                    records.append(StudentAnswerRecord(
+                        student_id=student.id, material_id=standard.id, question=q.stem, question_id=q.id,
+                        student_answer=CHOICE_ANSWERS[(n + s_idx) % 4], score=(n * 7 + s_idx) % 11,
+                        comment="历史记录", recommendation="复习", knowledge_tag=TAGS[n % len(TAGS)],
+                        timestamp=when, created_at=when))
+            db.session.add_all(records)
+            db.session.commit()
+            rollups.rebuild()
+
+            self.ids = {
+                "teacher": teacher.name,
+                "students": [s.name for s in students],
+                "student_ids": [s.id for s in students],
+                "standard": standard.id,
+                "own": {s.name: m.id for s, m in zip(students, own)},
+            }
+        self.upload_pdf = os.path.join(uploads, "bench_upload_src.pdf")
+        make_pdf(self.upload_pdf, pages=2)
+
+    def login(self, name):
+        session = requests.Session()
+        response = session.post(f"{self.base}/auth/login_by_password",
+                                data={"name": name, "password": PASSWORD}, allow_redirects=False)
+        if response.status_code != 302 or "login" in response.headers.get("Location", ""):
+            raise RuntimeError(f"登录失败：{name}")
+        return session
+
+    # ---------- 各路由的单次请求 ----------
+
+    def _answers(self, i):
+        data = {}
+        for idx, q in enumerate(QUESTIONS, start=1):
+            pool = CHOICE_ANSWERS if q["options"] else OPEN_ANSWERS
+            data[f"answer_{idx}"] = pool[(i + idx) % len(pool)] + ("" if q["options"] else f" (#{i})")
+        return data
+
+    def submit_answers(self, session, name, i):
+        return session.post(f"{self.base}/submit_answers/{self.ids['own'][name]}", data=self._answers(i))
+
+    def answer_standard(self, session, name, i):
+        return session.post(f"{self.base}/answer_standard/{self.ids['standard']}", data=self._answers(i))
+
+    def upload_material(self, session, name, i):
+        with open(self.upload_pdf, "rb") as f:
+            return session.post(f"{self.base}/student/upload_material",
+                                files={"material": (f"upload_{name}_{i}.pdf", f, "application/pdf")},
+                                allow_redirects=False)
+
+    def chat_material(self, session, name, i):
+        question = f"{CHAT_QUESTIONS[i % len(CHAT_QUESTIONS)]} ({i})"
+        return session.post(f"{self.base}/chat_material/{self.ids['own'][name]}", data={"question": question})
+
+    def chat_material_stream(self, session, name, i):
+        question = f"{CHAT_QUESTIONS[i % len(CHAT_QUESTIONS)]} ({i})"
+        response = session.get(f"{self.base}/chat_material/{self.ids['own'][name]}/stream",
+                               params={"question": question}, stream=True)
+        # 读完整个事件流才算一次请求结束
+        for _ in response.iter_content(chunk_size=None):
+            pass
+        return response
+
+    def material_stats(self, session, name, i):
+        return session.get(f"{self.base}/teacher/material_stats/{self.ids['standard']}")
+
+    def material_difficulty(self, session, name, i):
+        return session.get(f"{self.base}/teacher/material_difficulty/{self.ids['standard']}")
+
+    def material_report(self, session, name, i):
+        return session.get(f"{self.base}/teacher/material_report/{self.ids['standard']}")
+
+    def material_records(self, session, name, i):
+        return session.get(f"{self.base}/teacher/material_records/{self.ids['standard']}")
+
+    def material_export(self, session, name, i):
+        fmt = "csv" if i % 2 == 0 else "ndjson"
+        return session.get(f"{self.base}/teacher/material_records/{self.ids['standard']}/export", params={"format": fmt})
+
+    def student_progress(self, session, name, i):
+        student_id = self.ids["student_ids"][i % len(self.ids["student_ids"])]
+        return session.post(f"{self.base}/teacher/student_progress", data={"student_id": student_id})
+
+    def radar_chart(self, session, name, i):
+        return session.get(f"{self.base}/radar_chart")
+
+    STUDENT_ROUTES = ["submit_answers", "answer_standard", "upload_material", "chat_material",
+                      "chat_material_stream", "radar_chart"]
+    TEACHER_ROUTES = ["material_stats", "material_difficulty", "material_report", "material_records",
+                      "material_export", "student_progress"]
+
+    # ---------- 施压 ----------
+
+    def run_route(self, route):
+        names = [self.ids["teacher"]] if route in self.TEACHER_ROUTES else self.ids["students"]
+        sessions = {name: self.login(name) for name in names}
+        action = getattr(self, route)
+        latencies = []
+        failures = {}
+        lock = threading.Lock()
+
+        def one(i):
+            name = names[i % len(names)]
+            began = time.perf_counter()
+            try:
+                response = action(sessions[name], name, i)
+                status = response.status_code
+                response.close()
+            except requests.RequestException as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - began
+            with lock:
+                if status in (200, 302):
+                    latencies.append(elapsed)
+                else:
+                    failures[status] = failures.get(status, 0) + 1
+
+        began = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.args.concurrency) as pool:
+            list(pool.map(one, range(self.args.requests)))
+        wall = time.perf_counter() - began
+
+        latencies.sort()
+        return {
+            "route": route,
+            "requests": self.args.requests,
+            "ok": len(latencies),
+            "failures": failures,
+            "throughput": round(len(latencies) / wall, 2) if wall else 0.0,
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+            "max_ms": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--routes", default=",".join(Bench.STUDENT_ROUTES + Bench.TEACHER_ROUTES),
+                        help="逗号分隔的路由名")
+    parser.add_argument("--requests", type=int, default=50, help="每个路由的请求数")
+    parser.add_argument("--concurrency", type=int, default=8, help="并发请求数")
+    parser.add_argument("--students", type=int, default=20)
+    parser.add_argument("--history-per-student", type=int, default=50, help="每个学生预置的答题记录数")
+    parser.add_argument("--history-days", type=int, default=30)
+    parser.add_argument("--port", type=int, default=5055, help="应用监听端口")
+    parser.add_argument("--fake-port", type=int, default=8765, help="假 OpenRouter 监听端口")
+    parser.add_argument("--db-url", default=None, help="默认在临时目录建 sqlite 库")
+    parser.add_argument("--ai-cache", action="store_true", help="开启 AI 回复缓存（默认关闭，每次都打到假服务）")
+    parser.add_argument("--ai-rpm", type=int, default=0, help="本地限流：每分钟请求数（默认 0 不限，只测应用本身）")
+    parser.add_argument("--ai-tpm", type=int, default=0, help="本地限流：每分钟 token 数（默认 0 不限）")
+    parser.add_argument("--json", dest="json_path", default=None, help="结果另存为 JSON，便于对比回归")
+    parser.add_argument("--keep", action="store_true", help="保留临时目录")
+    fake_openrouter.add_backend_arguments(parser)
+    args = parser.parse_args()
+
+    routes = [r for r in args.routes.split(",") if r]
+    unknown = [r for r in routes if r not in Bench.STUDENT_ROUTES + Bench.TEACHER_ROUTES]
+    if unknown:
+        parser.error(f"未知路由：{', '.join(unknown)}")
+
+    workdir = tempfile.mkdtemp(prefix="load_test_")
+    os.makedirs(os.path.join(workdir, "uploads"))
+    # 应用的配置在导入时读取环境变量，必须先设置好再导入 app
+    os.environ.update({
+        "OPENROUTER_API_URL": f"http://127.0.0.1:{args.fake_port}/api/v1/chat/completions",
+        "OPENROUTER_API_KEY": "fake-key",
+        "DATABASE_URL": args.db_url or f"sqlite:///{os.path.join(workdir, 'bench.sqlite3')}",
+        "AI_CACHE_ENABLED": "1" if args.ai_cache else "0",
+        "AI_RATE_REQUESTS_PER_MINUTE": str(args.ai_rpm),
+        "AI_RATE_TOKENS_PER_MINUTE": str(args.ai_tpm),
+        "AI_CACHE_PATH": os.path.join(workdir, "cache", "llm_cache.sqlite3"),
+        "TEXT_STORE_DIR": os.path.join(workdir, "cache", "text"),
+        "CHUNK_INDEX_DIR": os.path.join(workdir, "cache", "index"),
+        "SINGLE_FLIGHT_LOCK_DIR": os.path.join(workdir, "cache", "locks"),
+    })
+    os.chdir(workdir)  # 教师上传使用相对路径 uploads/
+
+    fake_server, backend = fake_openrouter.serve("127.0.0.1", args.fake_port, **fake_openrouter.backend_options(args))
+    threading.Thread(target=fake_server.serve_forever, daemon=True).start()
+
+    from werkzeug.serving import make_server, WSGIRequestHandler
+    from app import create_app
+
+    app = create_app()
+    bench = Bench(args, workdir)
+    print(f"seeding {args.students} students, {args.students * args.history_per_student} answer records ...")
+    bench.seed(app)
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server("127.0.0.1", args.port, app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    results = []
+    print(f"\n{'route':24} {'ok':>5} {'fail':>5} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    try:
+        for route in routes:
+            result = bench.run_route(route)
+            results.append(result)
+            print(f"{route:24} {result['ok']:>5} {sum(result['failures'].values()):>5} {result['throughput']:>8.2f} "
+                  f"{result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} {result['p99_ms']:>9.1f} {result['max_ms']:>9.1f}")
+            if result["failures"]:
+                print(f"{'':24} failures: {result['failures']}")
+    finally:
+        server.shutdown()
+        # 上传任务的 worker 还在往临时库里写，先等它们停下（假服务还在，进行中的任务能正常做完），再删库
+        from app.utils.job_queue import job_queue
+        job_queue.stop()
+        fake_server.shutdown()
+
+    print(f"\nfake OpenRouter: {dict(backend.requests)}, errors {dict(backend.errors)}")
+    if args.json_path:
+        with open(os.path.join(ROOT, args.json_path) if not os.path.isabs(args.json_path) else args.json_path,
+                  "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+    if not args.keep:
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+    else:
+        print(f"workdir kept at {workdir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,11 +9,19 @@ DATABASE = "database_learn"
 
 class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY", "root")
-    SQLALCHEMY_DATABASE_URI = (
+    # DATABASE_URL 可指向其他数据库（如压测用的 sqlite），默认本机 MySQL
+    SQLALCHEMY_DATABASE_URI = os.environ.get(
+        "DATABASE_URL",
         f"mysql+pymysql://{USERNAME}:{PASSWORD}@{HOSTNAME}:{PORT}/{DATABASE}?charset=utf8mb4"
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     UPLOAD_FOLDER = os.path.join(os.getcwd(), "uploads")
 
+    # 上传后台处理（提取文本 + AI 出题）
+    JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 2))
+    JOB_QUEUE_SIZE = int(os.environ.get("JOB_QUEUE_SIZE", 20))  # 队列满时拒绝新上传
+    # 处理中的任务持有租约，执行期间定期续租；租约过期（进程退出 / worker 卡死）的任务由定期巡检重新入队
+    JOB_LEASE_SECONDS = int(os.environ.get("JOB_LEASE_SECONDS", 60))
+    JOB_SWEEP_SECONDS = int(os.environ.get("JOB_SWEEP_SECONDS", 30))
 
 
@@ -0,0 +1,155 @@
+"""Add question table, backfill from CourseMaterial.ai_generated_questions
+
+Revision ID: d6f40b2e7a19
+Revises: a3e8f15c92d7
+Create Date: 2026-10-18 22:58:16.447092
+
+"""
+import hashlib
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd6f40b2e7a19'
+down_revision = 'a3e8f15c92d7'
+branch_labels = None
+depends_on = None
+
+# 数据迁移用的表结构，只包含用到的列（不依赖 app.models，模型以后变化不影响本迁移）
+course_material = sa.table('course_material',
+                           sa.column('id', sa.Integer),
+                           sa.column('ai_generated_questions', sa.Text))
+question = sa.table('question',
+                    sa.column('id', sa.Integer),
+                    sa.column('material_id', sa.Integer),
+                    sa.column('position', sa.Integer),
+                    sa.column('stem', sa.Text),
+                    sa.column('options', sa.JSON),
+                    sa.column('answer', sa.Text),
+                    sa.column('content_hash', sa.String),
+                    sa.column('created_at', sa.DateTime))
+answer_record = sa.table('student_answer_record',
+                         sa.column('id', sa.Integer),
+                         sa.column('material_id', sa.Integer),
+                         sa.column('question', sa.Text),
+                         sa.column('question_id', sa.Integer))
+
+
+def _hash_content(stem, options, answer):
+    # 与 Question.hash_content 相同
+    payload = json.dumps([stem, list(options), answer], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _load_questions(raw):
+    try:
+        questions = json.loads(raw or "[]")
+    except ValueError:
+        return []
+    return [q for q in questions if isinstance(q, dict)] if isinstance(questions, list) else []
+
+
+def _backfill(bind):
+    """
+    把每份资料的 JSON 题目拆成 question 行，再按题干（去掉首尾空白）把已有答题记录关联到题目
+    """
+    now = sa.func.now()
+    materials = bind.execute(sa.select(course_material.c.id, course_material.c.ai_generated_questions)).all()
+    for material_id, raw in materials:
+        questions = _load_questions(raw)
+        if not questions:
+            continue
+        rows = []
+        for position, q in enumerate(questions, start=1):
+            stem = q.get("question") or ""
+            options = list(q.get("options") or [])
+            answer = q.get("answer") or ""
+            rows.append({"material_id": material_id, "position": position, "stem": stem, "options": options,
+                         "answer": answer, "content_hash": _hash_content(stem, options, answer)})
+        bind.execute(question.insert().values(created_at=now), rows)
+
+        # 同一题干出现多次时关联到题号最小的一题
+        question_ids = {}
+        for question_id, stem in bind.execute(
+                sa.select(question.c.id, question.c.stem)
+                .where(question.c.material_id == material_id)
+                .order_by(question.c.position.desc())).all():
+            question_ids[stem.strip()] = question_id
+
+        updates = []
+        for record_id, text in bind.execute(
+                sa.select(answer_record.c.id, answer_record.c.question)
+                .where(answer_record.c.material_id == material_id)).all():
+            question_id = question_ids.get((text or "").strip())
+            if question_id:
+                updates.append({"record_id": record_id, "qid": question_id})
+        if updates:
+            bind.execute(answer_record.update()
+                         .where(answer_record.c.id == sa.bindparam("record_id"))
+                         .values(question_id=sa.bindparam("qid")), updates)
+
+
+def _restore_json(bind):
+    rows = bind.execute(sa.select(question.c.material_id, question.c.stem, question.c.options, question.c.answer)
+                        .order_by(question.c.material_id, question.c.position)).all()
+    by_material = {}
+    for material_id, stem, options, answer in rows:
+        by_material.setdefault(material_id, []).append({"question": stem, "options": list(options or []),
+                                                        "answer": answer})
+    for material_id, questions in by_material.items():
+        bind.execute(course_material.update()
+                     .where(course_material.c.id == material_id)
+                     .values(ai_generated_questions=json.dumps(questions, ensure_ascii=False)))
+
+
+def upgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_table('question',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('material_id', sa.Integer(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('stem', sa.Text(), nullable=False),
+    sa.Column('options', sa.JSON(), nullable=False),
+    sa.Column('answer', sa.Text(), nullable=False),
+    sa.Column('content_hash', sa.String(length=64), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['material_id'], ['course_material.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('material_id', 'position', name='uq_question_material_position')
+    )
+    with op.batch_alter_table('question', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_question_content_hash'), ['content_hash'], unique=False)
+
+    with op.batch_alter_table('student_answer_record', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('question_id', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_student_answer_record_question_id'), ['question_id'], unique=False)
+        batch_op.create_foreign_key('fk_student_answer_record_question_id', 'question', ['question_id'], ['id'])
+
+    # ### end Alembic commands ###
+
+    _backfill(op.get_bind())
+
+    with op.batch_alter_table('course_material', schema=None) as batch_op:
+        batch_op.drop_column('ai_generated_questions')
+
+
+def downgrade():
+    with op.batch_alter_table('course_material', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('ai_generated_questions', sa.Text(), nullable=True))
+
+    _restore_json(op.get_bind())
+
+    # ### commands auto generated by Alembic - please adjust! ###
+    with op.batch_alter_table('student_answer_record', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_student_answer_record_question_id', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_student_answer_record_question_id'))
+        batch_op.drop_column('question_id')
+
+    with op.batch_alter_table('question', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_question_content_hash'))
+
+    op.drop_table('question')
+    # ### end Alembic commands ###
@@ -0,0 +1,31 @@
+"""Normalize course_material.created_at storage format on sqlite
+
+Revision ID: e3b7d1a9c042
+Revises: c4a9e7d2b615
+Create Date: 2026-10-19 14:26:40.372815
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3b7d1a9c042'
+down_revision = 'c4a9e7d2b615'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # sqlite 按字符串存时间：以前用 func.now() 写入的是 "YYYY-MM-DD HH:MM:SS"，
+    # Python 写入的带微秒。补齐成带微秒的格式，游标分页直接比较列值时顺序才一致；
+    # 新行的默认值改用 CourseMaterial.stored_now，同样带微秒。其他数据库不受影响
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        op.execute(sa.text("UPDATE course_material SET created_at = created_at || '.000000' "
+                           "WHERE length(created_at) = 19"))
+
+
+def downgrade():
+    # 带微秒的格式旧代码也能读，无需还原
+    pass
@@ -0,0 +1,80 @@
+import os
+import tempfile
+import time
+
+import pytest
+
+# 测试用独立的 sqlite 库，AI 请求指向本机不可用的端口（误调用时立即失败，不会打到 OpenRouter）。
+# 这些配置在模块导入时读取，必须在导入 app 之前设置
+_DB_DIR = tempfile.mkdtemp(prefix="fyp-test-")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(_DB_DIR, "test.db")
+os.environ["OPENROUTER_API_URL"] = "http://127.0.0.1:9/api/v1/chat/completions"
+os.environ["AI_CACHE_ENABLED"] = "0"
+
+from app import create_app  # noqa: E402
+from app.models import db, User, StudentAnswerRecord  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def app():
+    from app.utils.job_queue import job_queue
+
+    app = create_app()
+    app.config.update(TESTING=True)
+    yield app
+    # 第一个请求会启动上传任务的后台线程，删除测试库之前先停掉
+    job_queue.stop()
+
+
+@pytest.fixture
+def database(app):
+    """
+    每个测试一个空库
+    """
+    with app.app_context():
+        db.create_all()
+        yield db
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def tripped_breaker(monkeypatch):
+    """
+    处于熔断状态的断路器，替换 llm_client 用的全局实例：AI 请求都会被拒绝（AIDegraded）
+    """
+    from app.utils import llm_client
+    from app.utils.llm_breaker import CircuitBreaker
+
+    tripped = CircuitBreaker()
+    tripped._open(time.monotonic())
+    monkeypatch.setattr(llm_client, "breaker", tripped)
+    return tripped
+
+
+@pytest.fixture
+def seeded(app, database):
+    """
+    用 `flask synth generate` 造一份小数据（含汇总表），返回第一条答题记录的资料 id、学生 id 和学生用户名
+    """
+    result = app.test_cli_runner().invoke(args=[
+        "synth", "generate", "--teachers", "1", "--students", "5", "--materials", "2", "--questions", "5",
+        "--records", "300", "--days", "10", "--batch-size", "100"])
+    assert result.exit_code == 0, result.output
+    first = StudentAnswerRecord.query.order_by(StudentAnswerRecord.id).first()
+    return {"material_id": first.material_id, "student_id": first.student_id,
+            "student": db.session.get(User, first.student_id).name, "teacher": "synth_teacher_0"}
+
+
+def login(client, name, password="123456"):
+    response = client.post("/auth/login_by_password", data={"name": name, "password": password})
+    assert response.status_code == 302, response.data
+    return client
+
+
+@pytest.fixture
+def teacher_client(app, seeded):
+    """
+    以 seeded 数据里的教师登录的测试客户端
+    """
+    return login(app.test_client(), seeded["teacher"])
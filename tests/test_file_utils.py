@@ -0,0 +1,32 @@
+import os
+
+import fitz
+
+from app.utils import file_utils
+
+
+def _pdf(path, pages):
+    doc = fitz.open()
+    for i in range(pages):
+        doc.new_page().insert_text((72, 72), f"page {i} " + "x" * 60)
+    doc.save(path)
+    return path
+
+
+def test_max_chars_on_a_store_miss_parses_only_the_head(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_utils, "TEXT_STORE_DIR", str(tmp_path / "text"))
+    opened = []
+    iter_pages = file_utils.iter_pages
+    monkeypatch.setattr(file_utils, "iter_pages", lambda *args, **kwargs: (
+        opened.append(page.index) or page for page in iter_pages(*args, **kwargs)))
+    path = _pdf(str(tmp_path / "a.pdf"), 50)
+
+    text, content_hash = file_utils.load_extracted_text(path, max_chars=100)
+
+    assert len(text) == 100
+    assert opened == [0, 1]  # 凑够字数就不再打开后面的页
+    assert not os.path.exists(file_utils._text_store_path(content_hash))  # 只有开头，不存档
+
+    full, _ = file_utils.load_extracted_text(path)
+    assert full.startswith(text) and "page 49" in full
+    assert file_utils.load_extracted_text(path, content_hash, max_chars=100)[0] == text
@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from app.models import db, Submission, StudentAnswerRecord, MaterialStudentStat
+from app.utils import ai_utils, submissions
+
+# 主观题的 AI 评分：模型回的分数先校验、取整再保存（字符串分数曾导致保存汇总表时 TypeError）
+
+OPEN_QUESTION = {"id": None, "question": "Explain Newton's second law.", "options": [], "answer": ""}
+
+
+def _reply(score):
+    return json.dumps({"score": score, "comment": "ok", "recommendation": "review"})
+
+
+@pytest.mark.parametrize("mode", ["batch", "per_question"])
+@pytest.mark.parametrize("score, expected", [("7", 7), (" 7.6 ", 8), (6.4, 6), (9, 9)])
+def test_numeric_scores_become_int(monkeypatch, mode, score, expected):
+    batch = json.dumps([{"index": 1, "score": score, "comment": "ok", "recommendation": "review"}])
+    monkeypatch.setattr(ai_utils, "_ask", lambda prompt, namespace, use_cache=True:
+                        batch if "JSON array" in prompt else _reply(score))
+    feedback = ai_utils.evaluate_student_answers([OPEN_QUESTION], ["F = ma"], mode=mode)
+    assert feedback["scores"] == [expected]
+    assert type(feedback["scores"][0]) is int
+    assert feedback["degraded"] == [False]
+
+
+@pytest.mark.parametrize("score", ["seven", "", None, True, 11, -1, "nan", [7]])
+def test_invalid_score_is_parse_failed(monkeypatch, score):
+    invalidated = []
+    monkeypatch.setattr(ai_utils, "_ask", lambda prompt, namespace, use_cache=True: _reply(score))
+    monkeypatch.setattr(ai_utils, "invalidate_cached", invalidated.append)
+    feedback = ai_utils.evaluate_student_answers([OPEN_QUESTION], ["F = ma"], mode="per_question")
+    assert feedback["degraded"] == [True]
+    assert feedback["comments"] == [ai_utils.PARSE_FAILED.reason]
+    assert invalidated  # 不合法的回复不留在缓存里
+
+
+def test_save_rounds_scores_before_totals_and_rollups(seeded):
+    submission, _ = submissions.begin(None, seeded["student_id"], seeded["material_id"], 2)
+    before = db.session.get(MaterialStudentStat, (seeded["material_id"], seeded["student_id"])).score_sum
+    feedback = {"scores": [7.6, 2], "comments": ["a", "b"], "recommendations": ["c", "d"],
+                "degraded": [False, False]}
+    submissions.save(submission, [OPEN_QUESTION, OPEN_QUESTION], ["x", "y"], feedback)
+
+    scores = [r.score for r in StudentAnswerRecord.query.filter_by(submission_id=submission.id)]
+    assert scores == [8, 2]
+    assert db.session.get(Submission, submission.id).total_score == 10
+    stat = db.session.get(MaterialStudentStat, (seeded["material_id"], seeded["student_id"]))
+    assert stat.score_sum - before == 10
+
+
+@pytest.mark.parametrize("mode", ["batch", "per_question"])
+def test_prompt_has_no_answer_key_or_id(monkeypatch, mode):
+    prompts = []
+    batch = json.dumps([{"index": 1, "score": 5, "comment": "ok", "recommendation": "review"}])
+    monkeypatch.setattr(ai_utils, "_ask", lambda prompt, namespace, use_cache=True:
+                        prompts.append(prompt) or (batch if "JSON array" in prompt else _reply(5)))
+    question = {"id": 41, "question": "Which law is F = ma?", "options": ["A. Newton's second law", "B. Ohm's law"],
+                "answer": "正确答案：SECRET"}
+    for question_id in (41, 42):
+        # 作答里认不出选项字母，本地无法判分，交给 AI 评分
+        ai_utils.evaluate_student_answers([dict(question, id=question_id)], ["the second one"], mode=mode)
+
+    assert len(prompts) == 2 and prompts[0] == prompts[1]  # 只有 id 不同的题目 prompt 相同，共用缓存
+    assert "SECRET" not in prompts[0] and "41" not in prompts[0]
+    assert "Which law is F = ma?" in prompts[0] and "Newton's second law" in prompts[0]
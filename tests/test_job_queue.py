@@ -0,0 +1,158 @@
+import io
+import queue
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import CourseMaterial, MaterialJob
+from app.utils import ai_utils, job_queue
+from app.utils.ai_utils import QUESTION_CONTEXT_CHARS
+from app.utils.job_queue import JobQueue, QueueFull, run_material_job
+
+
+def _job(database, status, lease_expires_at=None):
+    material = CourseMaterial(filename="a.pdf", filepath="uploads/a.pdf")
+    job = MaterialJob(material=material, status=status, stage='saved', progress=5,
+                      lease_expires_at=lease_expires_at)
+    database.session.add(job)
+    database.session.commit()
+    return job.id
+
+
+def _queue(app):
+    jobs = JobQueue()
+    jobs.app = app
+    jobs._queue = queue.Queue(maxsize=10)
+    return jobs
+
+
+def _fake_text(monkeypatch, text, full_parse=None):
+    """
+    替换文件提取：给了 max_chars 只返回开头；全文解析时先调用 full_parse（可在其中等待）
+    """
+    def load(filepath, content_hash=None, max_chars=None, store=True):
+        if max_chars is not None:
+            return text[:max_chars], "hash"
+        if full_parse:
+            full_parse()
+        return text, "hash"
+    monkeypatch.setattr(job_queue, "load_extracted_text", load)
+
+
+def _questions(prefix, count):
+    return "\n\n".join(f"题目{i}：{prefix} question number {i}?\nA. a\nB. b\nC. c\nD. d\n正确答案：A"
+                       for i in range(1, count + 1))
+
+
+def _drain(jobs):
+    ids = []
+    while not jobs._queue.empty():
+        ids.append(jobs._queue.get_nowait())
+    return ids
+
+
+def test_running_job_is_not_claimed_again(database):
+    lease = datetime.utcnow() + timedelta(seconds=60)
+    job_id = _job(database, 'running', lease)
+
+    run_material_job(job_id)
+
+    job = database.session.get(MaterialJob, job_id)
+    database.session.refresh(job)
+    assert (job.status, job.stage, job.lease_expires_at) == ('running', 'saved', lease)
+
+
+def test_sweep_requeues_only_expired_leases(app, database):
+    now = datetime.utcnow()
+    expired = _job(database, 'running', now - timedelta(seconds=1))
+    alive = _job(database, 'running', now + timedelta(seconds=60))
+    queued = _job(database, 'queued')
+    done = _job(database, 'done')
+
+    jobs = _queue(app)
+    jobs.sweep()
+
+    assert _drain(jobs) == [expired, queued]
+    statuses = dict(database.session.query(MaterialJob.id, MaterialJob.status))
+    assert statuses == {expired: 'queued', alive: 'running', queued: 'queued', done: 'done'}
+
+
+def test_sweep_does_not_resubmit_pending_jobs(app, database):
+    job_id = _job(database, 'queued')
+    jobs = _queue(app)
+
+    jobs.sweep()
+    jobs.sweep()
+
+    assert _drain(jobs) == [job_id]
+
+
+@pytest.mark.parametrize("length", [100, QUESTION_CONTEXT_CHARS * 3], ids=["single_section", "map_reduce"])
+def test_breaker_rejection_fails_the_job(app, database, tripped_breaker, monkeypatch, length):
+    _fake_text(monkeypatch, "资料内容" * length)
+    job_id = _job(database, 'queued')
+
+    run_material_job(job_id)
+
+    database.session.expire_all()
+    job = database.session.get(MaterialJob, job_id)
+    assert job.status == 'failed'
+    assert "AI 服务暂时不可用" in job.error
+    assert job.material.questions == []
+
+
+def test_first_section_streams_before_the_full_parse(app, database, monkeypatch):
+    first_streamed = threading.Event()
+    prompts = []
+
+    def full_parse():
+        # 整份文件解析得很慢：第一段必须在它完成之前开始出题
+        assert first_streamed.wait(5), "第一段出题在等全文解析"
+
+    def stream(content):
+        prompts.append(content)
+        first_streamed.set()
+        yield _questions("head", 5)
+
+    _fake_text(monkeypatch, "资料内容" * QUESTION_CONTEXT_CHARS * 2, full_parse)
+    monkeypatch.setattr(job_queue, "stream_questions_with_ai", stream)
+    monkeypatch.setattr(ai_utils, "generate_questions_with_ai",
+                        lambda section, use_cache=True, count=5: prompts.append(section) or _questions(f"s{len(prompts)}", count))
+    monkeypatch.setattr(job_queue, "build_chunk_index", lambda content_hash, text: None)
+    job_id = _job(database, 'queued')
+
+    run_material_job(job_id)
+
+    database.session.expire_all()
+    job = database.session.get(MaterialJob, job_id)
+    assert job.status == 'done', job.error
+    assert prompts[0] == "资料内容" * (QUESTION_CONTEXT_CHARS // 4)  # 第一段只用开头
+    assert len(prompts) == ai_utils.GENERATION_MAX_SECTIONS  # 第一段不重复请求
+    assert len(job.material.questions) == ai_utils.QUESTION_COUNT
+
+
+def test_stop_joins_workers_and_sweeper(app, database):
+    jobs = _queue(app)
+    jobs.start()
+
+    assert jobs.stop(timeout=5)
+    assert not any(t.is_alive() for t in jobs._workers + [jobs._sweeper_thread])
+    with pytest.raises(QueueFull):
+        jobs.submit(_job(database, 'queued'))
+
+
+def test_teacher_upload_shows_job_progress(teacher_client, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "uploads").mkdir()
+    monkeypatch.setattr(job_queue.job_queue, "submit", lambda job_id: None)  # 任务留在排队状态
+
+    response = teacher_client.post("/teacher/upload_standard",
+                                   data={"material": (io.BytesIO(b"%PDF-1.4"), "new.pdf")})
+    assert response.status_code == 302
+    assert response.headers["Location"] == "/teacher/materials"
+
+    job = MaterialJob.query.order_by(MaterialJob.id.desc()).first()
+    page = teacher_client.get(response.headers["Location"]).get_data(as_text=True)
+    assert f"/job_status/{job.id}" in page
+    assert page.count('class="job-progress"') == 1  # 只有新上传的资料还在处理
@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+from app.utils import llm_client
+from app.utils.llm_client import AIDegraded, LLMError, chat_completion, stream_chat_completion
+from app.utils.llm_scheduler import LLMScheduler
+
+TOKENS_PER_MINUTE = 100000
+REQUESTS_PER_MINUTE = 60
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None, lines=()):
+        self.status_code = status_code
+        self.headers = {}
+        self._body = body
+        self._lines = list(lines)
+        self.text = json.dumps(body) if body is not None else ""
+
+    def json(self):
+        return self._body
+
+    def iter_lines(self, decode_unicode=False):
+        return iter(self._lines)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    scheduler = LLMScheduler(REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE)
+    # 令牌桶不随时间补充，剩余令牌只反映扣除和退还（每毫秒补充约 1.7 个，否则结果与测试快慢有关）
+    for bucket in (scheduler.tokens, scheduler.requests):
+        monkeypatch.setattr(bucket, "_refill", lambda: None)
+    monkeypatch.setattr(llm_client, "scheduler", scheduler)
+    monkeypatch.setattr(llm_client, "_retry_delay", lambda attempt, retry_after=None: 0)
+    return scheduler
+
+
+@pytest.fixture
+def responses(monkeypatch):
+    queue = []
+    monkeypatch.setattr(llm_client._session, "post", lambda *args, **kwargs: queue.pop(0))
+    return queue
+
+
+def _spent(scheduler):
+    return round(TOKENS_PER_MINUTE - scheduler.tokens.tokens), round(REQUESTS_PER_MINUTE - scheduler.requests.tokens)
+
+
+def test_breaker_rejection_refunds_reservation(scheduler, tripped_breaker):
+    with pytest.raises(AIDegraded):
+        chat_completion("hello")
+    assert _spent(scheduler) == (0, 0)
+
+
+def test_failed_attempts_are_refunded_and_success_is_settled(scheduler, responses):
+    responses += [FakeResponse(503), FakeResponse(502),
+                  FakeResponse(200, {"choices": [{"message": {"content": "ok"}}], "usage": {"total_tokens": 120}})]
+    assert chat_completion("hello") == "ok"
+    # 三次尝试都占了请求次数，token 只按成功那次的实际用量扣
+    assert _spent(scheduler) == (120, 3)
+
+
+def test_final_failure_refunds_tokens(scheduler, responses):
+    responses += [FakeResponse(400)]
+    with pytest.raises(LLMError):
+        chat_completion("hello")
+    assert _spent(scheduler) == (0, 1)
+
+
+def _sse(*chunks):
+    return [f"data: {json.dumps(chunk)}" for chunk in chunks] + ["data: [DONE]"]
+
+
+def test_stream_settles_with_reported_usage(scheduler, responses):
+    responses += [FakeResponse(200, lines=_sse({"choices": [{"delta": {"content": "he"}}]},
+                                               {"choices": [{"delta": {"content": "llo"}}],
+                                                "usage": {"total_tokens": 42}}))]
+    assert "".join(stream_chat_completion("hi")) == "hello"
+    assert _spent(scheduler) == (42, 1)
+
+
+def test_abandoned_stream_settles_with_estimate(scheduler, responses):
+    responses += [FakeResponse(200, lines=_sse({"choices": [{"delta": {"content": "abcd"}}]},
+                                               {"choices": [{"delta": {"content": "efgh"}}]}))]
+    # 直接用上游生成器（stream_chat_completion 外层的合并会把上游读完）
+    stream = llm_client._stream_completion("hi", llm_client.MODEL, None, 0, None, None, None, "default")
+    assert next(stream) == "abcd"
+    stream.close()
+    # 没有 usage：按 prompt 和已收到的内容估算（"hi" + "abcd"，每 2 字一个 token）
+    assert _spent(scheduler) == (3, 1)
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import db, CourseMaterial
+from app.utils import analytics
+from app.utils.pagination import encode_cursor, keyset_page, keyset_query
+
+M = CourseMaterial
+
+
+def _materials(database):
+    # 时间有并列、有整秒（微秒为 0）、有空值
+    base = datetime(2026, 1, 1, 8, 0, 0)
+    times = [base, base, base + timedelta(microseconds=500), base + timedelta(seconds=1), None,
+             base + timedelta(seconds=1), base - timedelta(days=1), None, base]
+    materials = [M(filename=f"{i}.pdf", filepath="", is_standard=True, created_at=t) for i, t in enumerate(times)]
+    materials.append(M(filename="default.pdf", filepath="", is_standard=True))
+    database.session.add_all(materials)
+    database.session.commit()
+    return materials
+
+
+@pytest.mark.parametrize("per_page", [1, 2, 3, 4, 20])
+def test_walks_every_row_once_in_order(database, per_page):
+    materials = _materials(database)
+    expected = sorted(materials, key=lambda m: (m.created_at is not None, m.created_at or datetime.min, m.id),
+                      reverse=True)
+
+    seen, cursor = [], None
+    while True:
+        page = keyset_page(M.query.filter_by(is_standard=True), M.created_at, M.id, cursor, per_page=per_page)
+        seen += page.items
+        if not page.has_next:
+            break
+        cursor = page.next_cursor
+    assert [m.id for m in seen] == [m.id for m in expected]
+
+
+@pytest.mark.parametrize("sort_value, seek", [(datetime(2026, 1, 1, 8, 0, 0), "created_at<?"),
+                                               (None, "created_at=?")])
+def test_next_page_seeks_in_the_list_index(database, sort_value, seek):
+    _materials(database)
+    cursor = encode_cursor(sort_value, 5)
+    lines, _ = analytics.explain(keyset_query(M.query.filter_by(is_standard=True), M.created_at, M.id, cursor))
+    # 在索引上直接定位到游标处，按索引顺序读，不需要另外排序
+    assert any(f"USING INDEX ix_course_material_standard_created (is_standard=? AND {seek}" in line
+               for line in lines), lines
+    assert not any("TEMP B-TREE" in line for line in lines), lines
+
+
+def test_default_time_is_stored_with_microseconds(database):
+    # 默认值由数据库取当前时间（同 func.now()），sqlite 上存的格式要与 Python 写入的一致
+    database.session.add_all([M(filename="default.pdf", filepath="", is_standard=True),
+                              M(filename="python.pdf", filepath="", is_standard=True,
+                                created_at=datetime(2026, 1, 1, 8, 0, 0))])
+    database.session.commit()
+    stored = database.session.execute(database.text("SELECT created_at FROM course_material ORDER BY id")).scalars().all()
+    assert [len(value) for value in stored] == [26, 26]
+    assert isinstance(M.query.filter_by(filename="default.pdf").one().created_at, datetime)
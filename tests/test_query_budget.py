@@ -0,0 +1,32 @@
+import inspect
+
+import pytest
+
+from app.routes import teacher
+
+# 带 @query_budget 的教师路由逐个请求一次，SQL 条数（X-DB-Queries，含加载登录用户的一条）不得超过声明的上限
+
+# 路由 → 要发的请求 [(方法, 表单)]（d 为 seeded 返回的数据）；没列出的按 GET 请求一次
+REQUESTS = {
+    "teacher.student_progress": lambda d: [("GET", None), ("POST", {"student_id": d["student_id"]})],
+}
+
+
+BUDGETED = sorted(f"teacher.{name}" for name, view in vars(teacher).items()
+                  if inspect.isfunction(view) and getattr(view, "query_budget", None) is not None)
+
+
+@pytest.mark.parametrize("endpoint", BUDGETED)
+def test_teacher_route_within_query_budget(app, seeded, teacher_client, endpoint):
+    budget = app.view_functions[endpoint].query_budget
+    rule, = app.url_map.iter_rules(endpoint)
+    url = rule.rule.replace("<int:material_id>", str(seeded["material_id"]))
+    assert "<" not in url, f"{endpoint} 的 URL 参数没有测试数据：{rule}"
+
+    for method, form in REQUESTS.get(endpoint, lambda d: [("GET", None)])(seeded):
+        response = teacher_client.open(url, method=method, data=form)
+        # 流式响应（导出）的响应头在输出前写好，计数不含输出时逐批读取的那条查询
+        response.get_data()
+        assert response.status_code == 200, f"{method} {url}"
+        assert int(response.headers["X-DB-Queries"]) <= budget, \
+            f"{method} {url} 执行了 {response.headers['X-DB-Queries']} 条 SQL，上限 {budget}"
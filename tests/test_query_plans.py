@@ -0,0 +1,90 @@
+import re
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytest
+from flask import url_for
+from sqlalchemy import LABEL_STYLE_TABLENAME_PLUS_COL, event
+
+from app.models import db
+from app.utils import ai_utils, analytics
+from app.utils.pagination import encode_cursor
+from tests.conftest import login
+
+# 统计页面的查询必须走索引：对 analytics.ROUTE_QUERIES 的每条查询执行 EXPLAIN，
+# 并核对路由实际执行的、涉及答题记录 / 汇总表的 SQL 都在 ROUTE_QUERIES 里（两边不会各改各的）
+
+# 路由 → (登录身份, 请求方法, url_for 参数, 表单)；d 为 seeded 返回的数据
+ROUTE_REQUESTS = {
+    "teacher.view_material_records": lambda d: [
+        ("teacher", "GET", {"material_id": d["material_id"]}, None),
+        ("teacher", "GET", {"material_id": d["material_id"], "cursor": encode_cursor(datetime.utcnow(), 0)}, None),
+    ],
+    "teacher.export_material_records": lambda d: [("teacher", "GET", {"material_id": d["material_id"]}, None)],
+    "teacher.material_stats": lambda d: [("teacher", "GET", {"material_id": d["material_id"]}, None)],
+    "teacher.material_difficulty": lambda d: [("teacher", "GET", {"material_id": d["material_id"]}, None)],
+    "teacher.material_report": lambda d: [("teacher", "GET", {"material_id": d["material_id"]}, None)],
+    "teacher.student_progress": lambda d: [("teacher", "POST", {}, {"student_id": d["student_id"]})],
+    "student.radar_chart": lambda d: [("student", "GET", {}, None)],
+    "student.learning_path": lambda d: [("student", "GET", {}, None)],
+}
+
+_TABLE = re.compile(r"\b(?:FROM|JOIN)\s+\"?(\w+)", re.I)
+
+
+def _normalize(sql):
+    return " ".join(sql.split())
+
+
+def _compiled(query):
+    # Query 执行时列名带表名前缀（table_column），query.statement 默认不带，按执行时的方式编译
+    statement = query.statement.set_label_style(LABEL_STYLE_TABLENAME_PLUS_COL)
+    return _normalize(str(statement.compile(dialect=db.engine.dialect)))
+
+
+@contextmanager
+def _captured_statements():
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(_normalize(statement))
+
+    event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record)
+
+
+def test_every_statistics_route_is_checked():
+    assert set(ROUTE_REQUESTS) == set(analytics.ROUTE_QUERIES)
+
+
+@pytest.mark.parametrize("route", sorted(analytics.ROUTE_QUERIES))
+def test_route_queries_use_an_index(seeded, route):
+    for i, query in enumerate(analytics.ROUTE_QUERIES[route](seeded["material_id"], seeded["student_id"]), 1):
+        lines, scans = analytics.explain(query)
+        assert not scans, f"{route}#{i} 全表扫描：{lines}"
+
+
+@pytest.mark.parametrize("route", sorted(analytics.ROUTE_QUERIES))
+def test_route_runs_the_checked_queries(app, seeded, monkeypatch, route):
+    monkeypatch.setattr(ai_utils, "generate_teacher_feedback_summary", lambda records: "AI 报告")
+    monkeypatch.setattr(ai_utils, "recommend_learning_path", lambda records: "学习路径")
+    expected = {_compiled(q) for q in analytics.ROUTE_QUERIES[route](seeded["material_id"], seeded["student_id"])}
+
+    executed = set()
+    users = {"teacher": seeded["teacher"], "student": seeded["student"]}
+    for role, method, args, form in ROUTE_REQUESTS[route](seeded):
+        with app.test_request_context():
+            url = url_for(route, **args)
+        client = login(app.test_client(), users[role])
+        with _captured_statements() as statements:
+            response = client.open(url, method=method, data=form)
+            response.get_data()  # 导出是流式响应，读完才执行查询
+        assert response.status_code == 200, route
+        executed |= {sql for sql in statements
+                     if any(table in analytics.CHECKED_TABLES for table in _TABLE.findall(sql))}
+
+    assert executed - expected == set(), "路由执行了 ROUTE_QUERIES 里没有的查询"
+    assert expected - executed == set(), "ROUTE_QUERIES 里的查询路由没有执行"
@@ -0,0 +1,125 @@
+import glob
+import os
+import re
+
+import pytest
+
+from app.utils.question_utils import parse_questions, QuestionStreamParser
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          "benchmarks", "corpus", "question_outputs")
+
+STEM_MENTIONS_ANSWER = """题目1：下列关于"标准答案"的说法，哪一项正确？
+A. 标准答案只能有一个
+B. 标准答案由教师给出
+C. 标准答案不能修改
+D. 以上都不对
+正确答案：B
+解析：答案以教师发布的为准。
+
+Question 2: Answer the following: which layer does TCP belong to?
+A. Network
+B. Transport
+C. Session
+D. Application
+**Answer:** B
+"""
+
+
+# 改成增量解析之前的 parse_questions（原样保留），已保存的出题文本按新代码重新解析结果必须不变
+def _baseline_parse_questions(raw_text):
+    raw_questions = re.split(r"(?:题目\d*[:：]|Question\s*\d*[:：])", raw_text)[1:]
+    parsed = []
+    for q in raw_questions:
+        lines = q.strip().split("\n")
+        question_text = []
+        options = []
+        answer = ""
+        for line in lines:
+            line = line.strip()
+            if re.match(r"[A-Da-d][\.\、，：:]", line):  # 匹配 A. A、 A:
+                options.append(line)
+            elif "正确答案" in line or "答案" in line or "Answer" in line:
+                answer = line
+            else:
+                question_text.append(line)
+        parsed.append({
+            "question": " ".join(question_text),
+            "options": options,
+            "answer": answer
+        })
+    return parsed
+
+
+# 答案行之后还有内容、答案标记不在行首
+AFTER_ANSWER = """题目1：牛顿第二定律的表达式是？
+A. F=ma
+B. E=mc^2
+C. PV=nRT
+D. V=IR
+正确答案：A
+解析：力等于质量乘以加速度。
+Question 2: Which protocol is connectionless?
+A. TCP
+B. UDP
+C. HTTP
+D. FTP
+The correct Answer is B
+It does not set up a connection first.
+
+"""
+
+
+def _stream(text, size):
+    parser = QuestionStreamParser()
+    streamed = []
+    for i in range(0, len(text), size):
+        streamed += parser.feed(text[i:i + size])
+    streamed += parser.close()
+    assert streamed == parser.questions
+    return streamed
+
+
+def _corpus():
+    texts = []
+    for path in sorted(glob.glob(os.path.join(CORPUS_DIR, "*.txt"))):
+        with open(path, encoding="utf-8") as f:
+            texts.append(pytest.param(f.read(), id=os.path.basename(path)))
+    return texts + [pytest.param(STEM_MENTIONS_ANSWER, id="stem_mentions_answer"),
+                    pytest.param(AFTER_ANSWER, id="after_answer")]
+
+
+@pytest.mark.parametrize("text", _corpus())
+@pytest.mark.parametrize("size", [1, 3, 8, 64, 100000])
+def test_stream_matches_parse_questions(text, size):
+    assert _stream(text, size) == parse_questions(text)
+
+
+@pytest.mark.parametrize("text", _corpus())
+def test_parse_questions_matches_baseline(text):
+    assert parse_questions(text) == _baseline_parse_questions(text)
+
+
+def test_lines_after_the_answer_stay_in_the_question():
+    first, second = parse_questions(AFTER_ANSWER)
+    assert first["question"] == "牛顿第二定律的表达式是？ 解析：力等于质量乘以加速度。"
+    assert first["answer"] == "正确答案：A"
+    assert second["answer"] == "The correct Answer is B"
+    assert second["question"] == "Which protocol is connectionless? It does not set up a connection first."
+
+
+def test_question_is_emitted_at_its_answer_line():
+    parser = QuestionStreamParser()
+    head, rest = STEM_MENTIONS_ANSWER.split("解析", 1)
+    emitted = parser.feed(head)
+    assert [q["answer"] for q in emitted] == ["正确答案：B"]
+
+
+def test_emitted_question_takes_in_later_lines():
+    parser = QuestionStreamParser()
+    head, rest = AFTER_ANSWER.split("解析", 1)
+    first, = parser.feed(head)
+    assert first["question"] == "牛顿第二定律的表达式是？"
+    parser.feed("解析" + rest)
+    parser.close()
+    assert first == parse_questions(AFTER_ANSWER)[0]
@@ -0,0 +1,61 @@
+import pytest
+
+from app.models import db, CourseMaterial, QuestionStat, StudentAnswerRecord
+from app.models.rollup import ScoreStats
+from app.utils import analytics, rollups
+
+
+def _rollup_rows():
+    """
+    各汇总表的 (分组键 + 次数 / 得分和 / 平方和)，按主键排序
+    """
+    tables = {}
+    for model, columns, _, _, _ in rollups.ROLLUPS:
+        table = model.__table__
+        select = db.select(*(table.c[c] for c in columns + ScoreStats.STAT_COLUMNS)).order_by(*table.primary_key)
+        tables[table.name] = [tuple(row) for row in db.session.execute(select)]
+    return tables
+
+
+@pytest.mark.parametrize("dialect", ["sqlite", "mssql"])
+def test_apply_matches_rebuild(seeded, monkeypatch, dialect):
+    # mssql 没有 upsert 分支，走逐组累加 / 插入的通用实现
+    expected = _rollup_rows()
+    records = [dict(row._mapping) for row in
+               db.session.execute(db.select(StudentAnswerRecord.__table__).order_by(StudentAnswerRecord.id))]
+    for model, _, _, _, _ in rollups.ROLLUPS:
+        db.session.execute(model.__table__.delete())
+
+    monkeypatch.setattr(db.session.get_bind().dialect, "name", dialect)
+    # 分两批计入：第二批的组大多已存在，覆盖插入和累加两条路径
+    half = len(records) // 2
+    rollups.apply(records[:half])
+    rollups.apply(records[half:])
+    db.session.commit()
+
+    assert _rollup_rows() == expected
+
+
+def test_editing_a_question_resets_its_stats(seeded):
+    material = db.session.get(CourseMaterial, seeded["material_id"])
+    edited, answer_fixed = material.questions[0], material.questions[1]
+    edited_id, answer_fixed_id = edited.id, answer_fixed.id
+    stat_before = db.session.get(QuestionStat, answer_fixed_id).answer_count
+    assert db.session.get(QuestionStat, edited_id).answer_count
+
+    questions = material.question_list()
+    questions[0] = dict(questions[0], question="A completely different question?")
+    questions[1] = dict(questions[1], answer="正确答案：D")
+    material.set_questions(questions)
+    db.session.commit()
+
+    # 题干改了：统计清零，旧记录不再关联；只改答案：统计保留
+    assert db.session.get(QuestionStat, edited_id) is None
+    assert StudentAnswerRecord.query.filter_by(question_id=edited_id).count() == 0
+    assert db.session.get(QuestionStat, answer_fixed_id).answer_count == stat_before
+    assert analytics.material_question_scores(material.id).first() == ("A completely different question?", 0, 0)
+
+    # 与从答题记录全量重建的结果一致
+    expected = _rollup_rows()
+    rollups.rebuild()
+    assert _rollup_rows() == expected